@@ -0,0 +1,332 @@
+"""
+Cache katalogu komponentów w pamięci procesu (electric_components, fuse_types)
+
+Katalog zmienia się rzadko, a przy wycenie jest czytany bez przerwy.
+ComponentCatalog ładuje obie tabele do pamięci i buduje indeksy pomocnicze
+(kategoria, podkategoria, liczba pól, zakres cen, prefiks nazwy), więc
+wyszukiwanie trwa mikrosekundy zamiast zapytania do PostgreSQL.
+
+Unieważnianie przez LISTEN/NOTIFY:
+- install_catalog_triggers() zakłada triggery, które po każdej zmianie
+  tabeli wysyłają NOTIFY na kanale volt_catalog_changed (payload = nazwa tabeli)
+- cache nasłuchuje na osobnym połączeniu i przed każdym odczytem odbiera
+  oczekujące powiadomienia (poll() bez czekania), a zmienioną tabelę
+  ładuje ponownie przy pierwszym odczycie
+- tabela bez triggera jest czytana z bazy przy każdym odczycie (nigdy nieaktualne dane)
+
+    from catalog_cache import ComponentCatalog
+
+    catalog = ComponentCatalog()
+    catalog.components_by_fields(2, 2)
+    catalog.fuse_types('1φ')
+
+Zwracane słowniki są współdzielone z cache - nie należy ich modyfikować.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import psycopg2
+from psycopg2 import sql
+
+from db_config import db_connection, get_dedicated_connection
+
+CATALOG_CHANNEL = 'volt_catalog_changed'
+CATALOG_TABLES = ('electric_components', 'fuse_types')
+
+COMPONENT_COLUMNS = ('id', 'name', 'fields', 'description', 'price', 'image', 'category', 'subcategory')
+
+# Kolejność jak w VoltComponentsManager.get_components_by_category / get_fuse_types
+CATALOG_QUERIES = {
+    'electric_components': f"""
+        SELECT {', '.join(COMPONENT_COLUMNS)}
+        FROM electric_components
+        ORDER BY fields, price, id
+    """,
+    'fuse_types': """
+        SELECT fuse_type, phase_type, rated_current
+        FROM fuse_types
+        ORDER BY phase_type, rated_current
+    """,
+}
+
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_catalog_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('{CATALOG_CHANNEL}', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+"""
+
+
+def _trigger_name(table):
+    return f"notify_{table}_change"
+
+
+def install_catalog_triggers(cur, tables=CATALOG_TABLES):
+    """Triggery NOTIFY dla tabel katalogu (pomija tabele, które jeszcze nie istnieją)
+
+    Trigger jest na poziomie instrukcji (FOR EACH STATEMENT), więc wsadowy
+    UPSERT wysyła jedno powiadomienie, a nie jedno na wiersz.
+
+    Returns:
+        list: tabele, dla których trigger został utworzony
+    """
+    cur.execute(NOTIFY_FUNCTION_SQL)
+    installed = []
+    for table in tables:
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0] is None:
+            continue
+        trigger = sql.Identifier(_trigger_name(table))
+        cur.execute(sql.SQL("""
+            DROP TRIGGER IF EXISTS {trigger} ON {table};
+            CREATE TRIGGER {trigger}
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_change();
+        """).format(trigger=trigger, table=sql.Identifier(table)))
+        installed.append(table)
+    return installed
+
+
+class _ComponentIndex:
+    """Niezmienny zestaw indeksów dla jednej wersji electric_components"""
+
+    def __init__(self, rows):
+        # Wiersze przychodzą posortowane po (fields, price, id)
+        self.components = [dict(zip(COMPONENT_COLUMNS, row)) for row in rows]
+        self.by_id = {}
+        self.by_category = {}
+        self.by_subcategory = {}
+        self.by_fields = {}
+        for comp in self.components:
+            self.by_id[comp['id']] = comp
+            self.by_category.setdefault(comp['category'], []).append(comp)
+            self.by_subcategory.setdefault(comp['subcategory'], []).append(comp)
+            self.by_fields.setdefault(comp['fields'], []).append(comp)
+        self.field_keys = sorted(self.by_fields)
+
+        self.by_price = sorted(self.components, key=lambda comp: comp['price'])
+        self.prices = [comp['price'] for comp in self.by_price]
+
+        by_name = sorted(self.components, key=lambda comp: comp['name'].lower())
+        self.names = [comp['name'].lower() for comp in by_name]
+        self.by_name = by_name
+
+
+class _FuseTypeIndex:
+    """Typy bezpieczników pogrupowane po typie fazy (kolejność jak w get_fuse_types)"""
+
+    def __init__(self, rows):
+        self.fuse_types = [
+            {'fuse_type': fuse_type, 'phase_type': phase_type, 'rated_current': rated_current}
+            for fuse_type, phase_type, rated_current in rows
+        ]
+        self.by_phase = {}
+        for fuse in self.fuse_types:
+            self.by_phase.setdefault(fuse['phase_type'], []).append(fuse)
+
+
+_INDEX_BUILDERS = {
+    'electric_components': _ComponentIndex,
+    'fuse_types': _FuseTypeIndex,
+}
+
+
+class ComponentCatalog:
+    """Read-through cache katalogu z unieważnianiem przez LISTEN/NOTIFY (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._listener = None
+        self._listener_pid = None
+        # Tabele z triggerem NOTIFY - tylko je można trzymać w cache
+        self._watched = set()
+        self._stale = set(CATALOG_TABLES)
+        self._indexes = {}
+        self.reloads = dict.fromkeys(CATALOG_TABLES, 0)
+
+    # --- nasłuchiwanie ---
+
+    def _start_listener(self):
+        conn = get_dedicated_connection(autocommit=True)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(CATALOG_CHANNEL)))
+                cur.execute("""
+                    SELECT c.relname
+                    FROM pg_trigger t
+                    JOIN pg_class c ON c.oid = t.tgrelid
+                    WHERE t.tgname = ANY(%s) AND NOT t.tgisinternal
+                """, ([_trigger_name(table) for table in CATALOG_TABLES],))
+                watched = {row[0] for row in cur.fetchall()}
+        except psycopg2.Error:
+            conn.close()
+            raise
+
+        for table in CATALOG_TABLES:
+            if table not in watched:
+                print(f"[WARNING] Brak triggera {_trigger_name(table)} - {table} bedzie czytana z bazy przy kazdym odczycie")
+
+        self._listener = conn
+        self._listener_pid = os.getpid()
+        self._watched = watched
+        # Powiadomienia sprzed LISTEN nie dotarły - wszystko ładujemy od nowa
+        self._stale.update(CATALOG_TABLES)
+
+    def _close_listener(self):
+        if self._listener is not None and self._listener_pid == os.getpid():
+            try:
+                self._listener.close()
+            except psycopg2.Error:
+                pass
+        self._listener = None
+
+    def _poll(self):
+        """Odbierz oczekujące powiadomienia i oznacz zmienione tabele jako nieaktualne"""
+        if self._listener is None or self._listener_pid != os.getpid():
+            # Po fork() połączenie rodzica nie może być używane
+            self._listener = None
+            self._start_listener()
+            return
+
+        try:
+            self._listener.poll()
+        except psycopg2.Error:
+            # Utracone połączenie - powiadomienia mogły przepaść
+            self._close_listener()
+            self._start_listener()
+            return
+
+        notifies = self._listener.notifies
+        while notifies:
+            table = notifies.pop(0).payload
+            if table in _INDEX_BUILDERS:
+                self._stale.add(table)
+
+    def _load(self, table):
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CATALOG_QUERIES[table])
+                rows = cur.fetchall()
+        index = _INDEX_BUILDERS[table](rows)
+        self.reloads[table] += 1
+        return index
+
+    def _index(self, table):
+        with self._lock:
+            self._poll()
+            if table not in self._watched:
+                return self._load(table)
+            if table in self._stale:
+                # Zdejmujemy flagę przed ładowaniem - NOTIFY w trakcie ładowania ustawi ją ponownie
+                self._stale.discard(table)
+                try:
+                    self._indexes[table] = self._load(table)
+                except Exception:
+                    self._stale.add(table)
+                    raise
+            return self._indexes[table]
+
+    def invalidate(self, table=None):
+        """Wymuś ponowne załadowanie tabeli (lub całego katalogu) przy następnym odczycie"""
+        with self._lock:
+            self._stale.update([table] if table else CATALOG_TABLES)
+
+    def close(self):
+        """Zamknij połączenie nasłuchujące i wyczyść cache"""
+        with self._lock:
+            self._close_listener()
+            self._indexes = {}
+            self._stale.update(CATALOG_TABLES)
+
+    # --- electric_components ---
+
+    def get_component(self, component_id):
+        """Komponent po id (None, jeśli nie istnieje)"""
+        return self._index('electric_components').by_id.get(component_id)
+
+    def all_components(self):
+        """Wszystkie komponenty posortowane po (fields, price)"""
+        return list(self._index('electric_components').components)
+
+    def components_by_category(self, category):
+        return list(self._index('electric_components').by_category.get(category, ()))
+
+    def components_by_subcategory(self, subcategory):
+        return list(self._index('electric_components').by_subcategory.get(subcategory, ()))
+
+    def components_by_fields(self, min_fields=None, max_fields=None):
+        """Komponenty z liczbą pól w zakresie [min_fields, max_fields], posortowane po (fields, price)"""
+        index = self._index('electric_components')
+        keys = index.field_keys
+        start = 0 if min_fields is None else bisect_left(keys, min_fields)
+        end = len(keys) if max_fields is None else bisect_right(keys, max_fields)
+        result = []
+        for fields in keys[start:end]:
+            result.extend(index.by_fields[fields])
+        return result
+
+    def components_by_price(self, min_price=None, max_price=None):
+        """Komponenty z ceną w zakresie [min_price, max_price], posortowane po cenie"""
+        index = self._index('electric_components')
+        start = 0 if min_price is None else bisect_left(index.prices, min_price)
+        end = len(index.prices) if max_price is None else bisect_right(index.prices, max_price)
+        return index.by_price[start:end]
+
+    def components_by_name_prefix(self, prefix, limit=None):
+        """Komponenty, których nazwa zaczyna się od prefix (bez rozróżniania wielkości liter)"""
+        index = self._index('electric_components')
+        prefix = prefix.lower()
+        result = []
+        for position in range(bisect_left(index.names, prefix), len(index.names)):
+            if not index.names[position].startswith(prefix) or (limit is not None and len(result) >= limit):
+                break
+            result.append(index.by_name[position])
+        return result
+
+    # --- fuse_types ---
+
+    def fuse_types(self, phase_type=None):
+        """Typy bezpieczników, opcjonalnie tylko dla danego typu fazy"""
+        index = self._index('fuse_types')
+        if phase_type:
+            return list(index.by_phase.get(phase_type, ()))
+        return list(index.fuse_types)
+
+
+def benchmark_catalog_lookups(iterations=10000):
+    """Porównanie: zapytanie SQL vs odczyt z cache (wymaga bazy z danymi katalogu)"""
+    catalog = ComponentCatalog()
+    catalog.components_by_fields(2, 2)
+    catalog.fuse_types()
+
+    start = time.perf_counter()
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            for _ in range(iterations):
+                cur.execute("""
+                    SELECT id, name, fields, price
+                    FROM electric_components
+                    WHERE fields BETWEEN %s AND %s
+                    ORDER BY fields, price
+                """, (2, 2))
+                cur.fetchall()
+    sql_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        catalog.components_by_fields(2, 2)
+    cache_time = time.perf_counter() - start
+
+    print(f"[BENCHMARK] {iterations} odczytow komponentow 2-polowych")
+    print(f"   SQL:   {sql_time / iterations * 1e6:8.1f} us/odczyt")
+    print(f"   cache: {cache_time / iterations * 1e6:8.1f} us/odczyt  (przeladowania: {catalog.reloads})")
+    catalog.close()
+
+
+if __name__ == "__main__":
+    benchmark_catalog_lookups()
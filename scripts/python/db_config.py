@@ -0,0 +1,273 @@
+"""
+Konfiguracja połączenia z PostgreSQL dla skryptów Volt
+Wspólna, thread-safe pula połączeń używana przez week2, week4 i DAG Airflow
+
+Zamiast otwierać nowe połączenie psycopg2 w każdej funkcji (TLS handshake
+do RDS trwa dłużej niż same zapytania), skrypty pobierają połączenie z puli
+i oddają je po użyciu:
+
+    from db_config import db_connection
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+
+Zmienne środowiskowe (.env):
+- POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD
+- POSTGRES_SSLMODE - tryb SSL (domyślnie prefer)
+- POSTGRES_POOL_MIN / POSTGRES_POOL_MAX - rozmiar puli (domyślnie 1 / 10)
+- POSTGRES_STATEMENT_TIMEOUT_MS - limit czasu zapytania (domyślnie 60000)
+- POSTGRES_CONNECT_TIMEOUT - limit czasu nawiązania połączenia w sekundach (domyślnie 10)
+- POSTGRES_HEALTH_CHECK_INTERVAL - po ilu sekundach bezczynności sprawdzić połączenie (domyślnie 30)
+"""
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+
+# Załaduj zmienne środowiskowe
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': os.getenv('POSTGRES_PORT', '5432'),
+    'database': os.getenv('POSTGRES_DB', 'postgres'),
+    'user': os.getenv('POSTGRES_USER', 'postgres'),
+    'password': os.getenv('POSTGRES_PASSWORD', '')
+}
+
+POOL_MIN_CONNECTIONS = int(os.getenv('POSTGRES_POOL_MIN', '1'))
+POOL_MAX_CONNECTIONS = int(os.getenv('POSTGRES_POOL_MAX', '10'))
+STATEMENT_TIMEOUT_MS = int(os.getenv('POSTGRES_STATEMENT_TIMEOUT_MS', '60000'))
+CONNECT_TIMEOUT = int(os.getenv('POSTGRES_CONNECT_TIMEOUT', '10'))
+HEALTH_CHECK_INTERVAL = float(os.getenv('POSTGRES_HEALTH_CHECK_INTERVAL', '30'))
+
+
+class PostgresPool:
+    """Thread-safe pula połączeń PostgreSQL z kontrolą stanu połączeń
+
+    Bezczynne połączenia (do maxconn) zostają w puli i są ponownie używane,
+    a gdy wszystkie są zajęte, getconn() czeka na zwolnienie (acquire_timeout).
+    """
+
+    def __init__(self, minconn=POOL_MIN_CONNECTIONS, maxconn=POOL_MAX_CONNECTIONS,
+                 statement_timeout_ms=STATEMENT_TIMEOUT_MS, health_check_interval=HEALTH_CHECK_INTERVAL,
+                 acquire_timeout=30, **overrides):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.statement_timeout_ms = statement_timeout_ms
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = self._build_connect_kwargs(overrides)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._idle = []
+        # id(conn) -> czas ostatniego zwrotu do puli
+        self._last_used = {}
+        self._in_use = set()
+        self._pid = os.getpid()
+        self._prewarmed = False
+
+    def _build_connect_kwargs(self, overrides):
+        """Parametry psycopg2.connect: timeouty, keepalive i SSL"""
+        kwargs = dict(DB_CONFIG)
+        kwargs.update({
+            'connect_timeout': CONNECT_TIMEOUT,
+            'sslmode': os.getenv('POSTGRES_SSLMODE', 'prefer'),
+            'application_name': os.getenv('POSTGRES_APPLICATION_NAME', 'volt_scripts'),
+            # Keepalive - RDS/NAT potrafią po cichu zerwać bezczynne połączenia TCP
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 5,
+        })
+        if self.statement_timeout_ms:
+            kwargs['options'] = f"-c statement_timeout={self.statement_timeout_ms}"
+        kwargs.update(overrides)
+        return kwargs
+
+    def _connect(self):
+        return psycopg2.connect(**self.connect_kwargs)
+
+    def _check_fork(self):
+        """Po fork() (np. worker Airflow) nie wolno używać połączeń rodzica"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = []
+                self._last_used = {}
+                self._in_use = set()
+                self._slots = threading.BoundedSemaphore(self.maxconn)
+                self._pid = os.getpid()
+                self._prewarmed = False
+
+    def _prewarm(self):
+        """Otwórz minconn połączeń przy pierwszym użyciu puli"""
+        with self._lock:
+            if self._prewarmed:
+                return
+            self._prewarmed = True
+            missing = max(0, self.minconn - len(self._idle) - len(self._in_use) - 1)
+        for _ in range(missing):
+            conn = self._connect()
+            with self._lock:
+                self._idle.append(conn)
+                self._last_used[id(conn)] = time.monotonic()
+
+    def _is_healthy(self, conn):
+        """Sprawdź czy połączenie nadaje się do ponownego użycia"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        # SELECT 1 tylko dla połączeń bezczynnych dłużej niż health_check_interval
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        if not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def getconn(self):
+        """Pobierz sprawne połączenie z puli (czeka, gdy wszystkie są zajęte)"""
+        self._check_fork()
+        if not self._prewarmed:
+            self._prewarm()
+
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise psycopg2.OperationalError(
+                f"Pula połączeń wyczerpana ({self.maxconn}) - brak wolnego połączenia po {self.acquire_timeout}s")
+
+        try:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    conn = self._connect()
+                    break
+                if self._is_healthy(conn):
+                    break
+                # Uszkodzone połączenie jest zamykane i zastępowane kolejnym
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use.add(id(conn))
+        return conn
+
+    def putconn(self, conn):
+        """Zwróć połączenie do puli (niezatwierdzona transakcja jest wycofywana)"""
+        if conn is None:
+            return
+        with self._lock:
+            if id(conn) not in self._in_use:
+                # Połączenie spoza puli (lub sprzed fork()) - tylko je zamknij
+                foreign = True
+            else:
+                self._in_use.discard(id(conn))
+                foreign = False
+        if foreign:
+            self._discard(conn)
+            return
+
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        if keep:
+            with self._lock:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+        else:
+            self._discard(conn)
+        self._slots.release()
+
+    def closeall(self):
+        """Zamknij wszystkie bezczynne połączenia w puli"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._prewarmed = False
+        if self._pid != os.getpid():
+            return
+        for conn in idle:
+            self._discard(conn)
+
+
+# Singleton instance (połączenia powstają dopiero przy pierwszym get_connection)
+postgres_pool = PostgresPool()
+atexit.register(postgres_pool.closeall)
+
+
+def get_connection():
+    """Helper function - pobierz połączenie z puli (oddaj przez release_connection)"""
+    return postgres_pool.getconn()
+
+
+def release_connection(conn):
+    """Helper function - zwróć połączenie do puli"""
+    postgres_pool.putconn(conn)
+
+
+@contextmanager
+def db_connection():
+    """Context manager: połączenie z puli, rollback przy wyjątku, zwrot do puli na końcu"""
+    conn = get_connection()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
+
+
+def get_dedicated_connection(autocommit=True):
+    """Osobne połączenie poza pulą (np. LISTEN) - te same parametry co pula, zamknij przez close()"""
+    conn = postgres_pool._connect()
+    conn.autocommit = autocommit
+    return conn
+
+
+def close_pool():
+    """Zamknij pulę połączeń (np. na koniec skryptu)"""
+    postgres_pool.closeall()
+
+
+if __name__ == "__main__":
+    # Test konfiguracji
+    print("Testowanie puli połączeń PostgreSQL...")
+    try:
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SHOW statement_timeout")
+            print(f"✅ Połączono z {DB_CONFIG['database']}@{DB_CONFIG['host']} "
+                  f"(statement_timeout={cur.fetchone()[0]})")
+            cur.close()
+    except psycopg2.Error as e:
+        print(f"❌ Błąd połączenia z PostgreSQL: {e}")
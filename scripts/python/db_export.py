@@ -0,0 +1,109 @@
+"""
+Strumieniowy eksport wyników zapytań PostgreSQL do JSON / NDJSON
+
+Wiersze są czytane przez kursor po stronie serwera (named cursor) partiami
+po `itersize` i od razu zapisywane do pliku, więc zużycie pamięci nie zależy
+od rozmiaru tabeli.
+
+Formaty:
+- json   - tablica JSON; pretty=True daje identyczny wynik jak json.dump(lista, indent=2)
+- ndjson - jeden obiekt JSON w każdej linii
+"""
+import json
+import os
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+DEFAULT_ITERSIZE = int(os.getenv('POSTGRES_EXPORT_ITERSIZE', '2000'))
+EXPORT_FORMATS = ('json', 'ndjson')
+
+
+def iter_query_rows(conn, query, params=None, itersize=DEFAULT_ITERSIZE):
+    """Zwraca kolejne wiersze zapytania jako słowniki (kursor po stronie serwera)
+
+    Kursor działa w bieżącej transakcji połączenia (named cursor wymaga
+    transakcji, więc połączenie nie może być w trybie autocommit).
+    """
+    cursor = conn.cursor(name=f"volt_export_{uuid.uuid4().hex[:12]}")
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        columns = None
+        for row in cursor:
+            if columns is None:
+                columns = [desc[0] for desc in cursor.description]
+            yield dict(zip(columns, row))
+    finally:
+        cursor.close()
+
+
+def json_default(value):
+    """Serializacja typów zwracanych przez psycopg2, których nie obsługuje json"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_json_stream(records, sink, fmt='json', pretty=True):
+    """Zapisuje rekordy przyrostowo do pliku (ścieżka) lub obiektu z metodą write()
+
+    Returns:
+        int: liczba zapisanych rekordów
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Nieznany format eksportu: {fmt} (dostępne: {', '.join(EXPORT_FORMATS)})")
+
+    if not hasattr(sink, 'write'):
+        with open(sink, 'w', encoding='utf-8') as f:
+            return write_json_stream(records, f, fmt, pretty)
+
+    count = 0
+    if fmt == 'ndjson':
+        for record in records:
+            sink.write(json.dumps(record, ensure_ascii=False, default=json_default))
+            sink.write('\n')
+            count += 1
+        return count
+
+    # Tablica JSON - elementy zapisywane pojedynczo, wcięte jak w json.dump(indent=2)
+    for record in records:
+        if pretty:
+            item = json.dumps(record, indent=2, ensure_ascii=False, default=json_default)
+            sink.write('[\n' if count == 0 else ',\n')
+            sink.write('\n'.join('  ' + line for line in item.split('\n')))
+        else:
+            sink.write('[' if count == 0 else ', ')
+            sink.write(json.dumps(record, ensure_ascii=False, default=json_default))
+        count += 1
+
+    if count == 0:
+        sink.write('[]')
+    else:
+        sink.write('\n]' if pretty else ']')
+    return count
+
+
+def export_query_to_json(conn, query, sink, params=None, fmt='json', pretty=True,
+                         itersize=DEFAULT_ITERSIZE, transform=None):
+    """Eksport wyniku zapytania do JSON/NDJSON bez ładowania całej tabeli do pamięci
+
+    Args:
+        conn: połączenie psycopg2
+        query (str): zapytanie SELECT
+        sink: ścieżka pliku lub obiekt z metodą write()
+        params: parametry zapytania
+        fmt (str): 'json' lub 'ndjson'
+        pretty (bool): wcięcia jak json.dump(indent=2) (tylko dla 'json')
+        itersize (int): liczba wierszy pobieranych z serwera w jednej partii
+        transform (callable): opcjonalna konwersja słownika wiersza przed zapisem
+
+    Returns:
+        int: liczba wyeksportowanych rekordów
+    """
+    records = iter_query_rows(conn, query, params, itersize)
+    if transform is not None:
+        records = (transform(record) for record in records)
+    return write_json_stream(records, sink, fmt, pretty)
@@ -0,0 +1,392 @@
+"""
+Kompakcja małych plików w partycjach data lake (raw/ i staging/)
+
+Codzienne zrzuty volt_data_to_s3 (raw/components/components_YYYYMMDD_HHMMSS.json,
+bez --partition-date) i Lambda CSV -> Parquet (staging/components/dt=.../*.parquet)
+zostawiają w partycjach wiele małych plików. Każdy plik to osobne otwarcie / GET w S3,
+więc skan zbioru zwalnia z każdym dniem. Kompakcja:
+
+1. w każdej partycji wybiera małe pliki (mniejsze niż SMALL_FILE_FRACTION
+   rozmiaru docelowego) i dzieli je na grupy o łącznym rozmiarze zbliżonym
+   do docelowego (LAKE_COMPACTION_TARGET_MB, domyślnie 128 MB)
+2. scala każdą grupę w jeden plik posortowany po wybranym kluczu:
+   Parquet -> Parquet (zstd, statystyki min/max), JSON (lista rekordów) i
+   NDJSON -> NDJSON gzip/zstd (lake_ndjson); grupą jest encja z nazwy pliku
+   bez daty/znacznika czasu (components_20241218_101500.json i
+   components_20241219_101500.json to encja 'components'), CSV i dokumenty z wieloma encjami ({"users": [...],
+   "orders": [...]}) zostają bez zmian; rekordy przechodzą strumieniowo - przy
+   sortowaniu w pamięci jest najwyżej LAKE_COMPACTION_SORT_ROWS rekordów,
+   większe grupy są sortowane przez scalanie posortowanych serii z dysku
+3. podmienia pliki atomowo: nowe pliki są zapisywane pod nowymi nazwami
+   (niewidoczne dla czytników, bo nie ma ich w manifeście), potem jeden
+   warunkowy zapis manifestu partycji dodaje nowe i usuwa stare wpisy, a na
+   końcu stare pliki są kasowane; grupa, w której plik został nadpisany od
+   odczytu (inny sha256 w manifeście, np. ponowna konwersja przez Lambdę),
+   jest pomijana - nowy plik zostaje, a scalony jest usuwany
+
+Kompakcja nie przekracza granic partycji - partycja dt=... z jednym plikiem
+components.json zostaje bez zmian (scalanie dni zniszczyłoby przycinanie po dacie).
+
+Działa dla lokalnego data-lake/ i S3 (lake_storage); zbiór musi mieć
+manifesty (python lake_manifest.py <lokalizacja> <zbiór> --rebuild).
+
+Użycie:
+    python lake_compact.py week3/data-lake raw/components --sort-by id
+    python lake_compact.py s3://voltappbucket staging/components --target-mb 256 --dry-run
+    python lake_compact.py --self-check
+"""
+import heapq
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from itertools import chain
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from lake_manifest import (dataset_index_key, load_dataset_index, load_partition_manifest, make_file_entry,
+                           partition_key, replace_partition_files, sha256_hex, verify_checksum)
+from lake_ndjson import (COMPRESSION_SUFFIXES, ENTITY_DATE_COLUMNS, NDJSON_COMPRESSION, is_ndjson_format,
+                         iter_ndjson_records, ndjson_entity, write_ndjson_file)
+from lake_parquet import PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE
+from lake_storage import open_lake_storage
+
+COMPACTION_TARGET_SIZE = int(os.getenv('LAKE_COMPACTION_TARGET_MB', '128')) * 1024 * 1024
+# Plik mniejszy niż ta część rozmiaru docelowego jest "mały" i podlega kompakcji
+SMALL_FILE_FRACTION = float(os.getenv('LAKE_COMPACTION_SMALL_FRACTION', '0.5'))
+# Rekordy sortowane naraz w pamięci; dłuższe serie trafiają posortowane do plików tymczasowych
+SORT_BUFFER_ROWS = int(os.getenv('LAKE_COMPACTION_SORT_ROWS', '100000'))
+
+
+class _MultiEntityDocument(Exception):
+    """Plik JSON grupy nie jest listą rekordów - grupa nie jest scalana"""
+
+
+def _compaction_group(scan_file):
+    """Grupa plików, które można scalić razem: ('parquet', None) albo ('records', encja);
+    None - plik nie podlega kompakcji"""
+    fmt = scan_file['format']
+    if fmt == 'parquet':
+        return 'parquet', None
+    if fmt == 'json' or is_ndjson_format(fmt):
+        return 'records', ndjson_entity(scan_file['name'])
+    return None
+
+
+def plan_partition_compaction(files, target_size=COMPACTION_TARGET_SIZE):
+    """Grupy plików partycji do scalenia
+
+    Args:
+        files (list): wpisy manifestu partycji (posortowane po nazwie)
+
+    Returns:
+        list: [(grupa, [wpisy plików])] - każda lista ma co najmniej dwa pliki
+    """
+    small_limit = target_size * SMALL_FILE_FRACTION
+    candidates = {}
+    for entry in files:
+        group = _compaction_group(entry)
+        if group is not None and entry['size'] < small_limit:
+            candidates.setdefault(group, []).append(entry)
+
+    bins = []
+    for group, entries in candidates.items():
+        current, current_size = [], 0
+        for entry in entries:
+            if current and current_size + entry['size'] > target_size:
+                bins.append((group, current))
+                current, current_size = [], 0
+            current.append(entry)
+            current_size += entry['size']
+        bins.append((group, current))
+    return [(group, entries) for group, entries in bins if len(entries) > 1]
+
+
+def _iter_records(storage, scan_file):
+    """Rekordy pliku NDJSON (strumieniowo) albo małego pliku JSON z listą rekordów"""
+    if is_ndjson_format(scan_file['format']):
+        yield from iter_ndjson_records(storage, scan_file)
+        return
+    document = json.loads(verify_checksum(scan_file, storage.read_bytes(scan_file['key'])))
+    if not isinstance(document, list):
+        raise _MultiEntityDocument(scan_file['key'])
+    yield from document
+
+
+def _spill_run(records, directory):
+    """Zapisuje posortowaną serię rekordów do pliku tymczasowego NDJSON"""
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.ndjson')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return path
+
+
+def _read_run(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _sort_records(records, sort_by, directory, buffer_rows=SORT_BUFFER_ROWS):
+    """Rekordy posortowane po kluczu (stabilnie); rekordy bez klucza na końcu
+
+    W pamięci jest najwyżej buffer_rows rekordów: pełny bufor jest sortowany
+    i zapisywany jako seria w `directory`, a serie są scalane (heapq.merge).
+    """
+    def key(record):
+        return record[sort_by]
+
+    runs, buffer = [], []
+    missing_path = os.path.join(directory, 'missing.ndjson')
+    with open(missing_path, 'w', encoding='utf-8') as missing:
+        for record in records:
+            if record.get(sort_by) is None:
+                missing.write(json.dumps(record, ensure_ascii=False) + '\n')
+                continue
+            buffer.append(record)
+            if len(buffer) >= buffer_rows:
+                runs.append(_spill_run(sorted(buffer, key=key), directory))
+                buffer = []
+    buffer.sort(key=key)
+    yield from heapq.merge(*[_read_run(path) for path in runs], buffer, key=key)
+    yield from _read_run(missing_path)
+
+
+def _compact_records(storage, dataset, partition, name, scan_files, sort_by, compression,
+                     sort_buffer_rows=SORT_BUFFER_ROWS):
+    """Scala pliki rekordów grupy w jeden plik NDJSON - strumieniowo
+
+    Returns:
+        dict: wpis scalonego pliku; None - plik JSON grupy nie jest listą rekordów
+    """
+    entity = ndjson_entity(scan_files[0]['name'])
+    records = chain.from_iterable(_iter_records(storage, scan_file) for scan_file in scan_files)
+    try:
+        with tempfile.TemporaryDirectory(prefix='lake-compact-') as directory:
+            if sort_by:
+                records = _sort_records(records, sort_by, directory, sort_buffer_rows)
+            # Wyjątek w trakcie zapisu usuwa plik tymczasowy - nic nie trafia do storage
+            return write_ndjson_file(storage, dataset, partition,
+                                     name + '.ndjson' + COMPRESSION_SUFFIXES[compression], records,
+                                     ENTITY_DATE_COLUMNS.get(entity), register=False)
+    except _MultiEntityDocument:
+        return None
+
+
+def _compact_parquet(storage, dataset, partition, name, scan_files, sort_by, row_group_size):
+    tables = []
+    for scan_file in scan_files:
+        data = verify_checksum(scan_file, storage.read_bytes(scan_file['key']))
+        tables.append(pq.read_table(pa.BufferReader(data)).replace_schema_metadata(None))
+    table = pa.concat_tables(tables, promote_options='default')
+    stats = None
+    if sort_by and sort_by in table.column_names:
+        table = table.sort_by(sort_by)
+        if table.num_rows:
+            bounds = pc.min_max(table[sort_by])
+            stats = {sort_by: [str(bounds['min'].as_py()), str(bounds['max'].as_py())]}
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size, compression=PARQUET_COMPRESSION,
+                   write_statistics=True)
+    data = buffer.getvalue()
+    name = name + '.parquet'
+    storage.write_bytes(partition_key(dataset, partition, name), data, content_type='application/vnd.apache.parquet')
+    return make_file_entry(name, len(data), sha256_hex(data), table.num_rows, 'parquet', stats)
+
+
+def compact_partition(storage, dataset, partition, target_size=COMPACTION_TARGET_SIZE, sort_by=None,
+                      compression=NDJSON_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE, dry_run=False,
+                      sort_buffer_rows=SORT_BUFFER_ROWS):
+    """Scala małe pliki partycji i podmienia je jednym zapisem manifestu
+
+    Returns:
+        dict: {'partition', 'files_before', 'files_after', 'bytes_before', 'bytes_after', 'merged',
+               'written', 'skipped' (grupy pominięte - plik nadpisany w trakcie kompakcji)}
+    """
+    manifest = load_partition_manifest(storage, dataset, partition)
+    files = [dict(manifest['files'][name], key=partition_key(dataset, partition, name))
+             for name in sorted(manifest['files'])]
+    bins = plan_partition_compaction(files, target_size)
+    result = {
+        'partition': partition,
+        'files_before': len(files),
+        'files_after': len(files) - sum(len(entries) - 1 for _, entries in bins),
+        'bytes_before': sum(entry['size'] for entry in files),
+        'merged': sum(len(entries) for _, entries in bins),
+        'written': [],
+        'skipped': 0,
+    }
+    if dry_run or not bins:
+        result['bytes_after'] = result['bytes_before']
+        return result
+
+    run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+    replacements = []
+    for number, ((kind, entity), scan_files) in enumerate(bins):
+        if kind == 'parquet':
+            entry = _compact_parquet(storage, dataset, partition, f"compacted-{run_id}-{number:05d}",
+                                     scan_files, sort_by, row_group_size)
+        else:
+            entry = _compact_records(storage, dataset, partition, f"{entity}_compacted-{run_id}-{number:05d}",
+                                     scan_files, sort_by, compression, sort_buffer_rows)
+            if entry is None:
+                continue
+        replacements.append((entry, {scan_file['name']: scan_file['sha256'] for scan_file in scan_files}))
+
+    # Podmiana: jeden warunkowy zapis manifestu, dopiero potem kasowanie plików
+    manifest, applied = replace_partition_files(storage, dataset, partition, replacements)
+    replaced = [name for entry, sources in replacements if entry['name'] in applied for name in sources]
+    skipped = [entry['name'] for entry, _ in replacements if entry['name'] not in applied]
+    storage.delete(partition_key(dataset, partition, name) for name in replaced + skipped)
+
+    result['files_after'] = len(manifest['files'])
+    result['bytes_after'] = sum(entry['size'] for entry in manifest['files'].values())
+    result['merged'] = len(replaced)
+    result['written'] = list(applied)
+    result['skipped'] = len(skipped)
+    return result
+
+
+def compact_dataset(location, dataset, target_size=COMPACTION_TARGET_SIZE, sort_by=None,
+                    compression=NDJSON_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE, dry_run=False,
+                    sort_buffer_rows=SORT_BUFFER_ROWS):
+    """Kompakcja wszystkich partycji zbioru
+
+    Returns:
+        dict: {'partitions': [wyniki compact_partition], 'files_before', 'files_after'}
+    """
+    storage = open_lake_storage(location)
+    partitions = load_dataset_index(storage, dataset)
+    if partitions is None:
+        raise FileNotFoundError(
+            f"Brak indeksu partycji {storage.uri(dataset_index_key(dataset))} - "
+            f"uruchom: python lake_manifest.py <lokalizacja> {dataset} --rebuild")
+
+    results = [compact_partition(storage, dataset, partition, target_size, sort_by, compression, row_group_size,
+                                 dry_run, sort_buffer_rows)
+               for partition in sorted(partitions)]
+    return {
+        'partitions': results,
+        'files_before': sum(result['files_before'] for result in results),
+        'files_after': sum(result['files_after'] for result in results),
+    }
+
+
+def check_daily_exports_compaction():
+    """Sprawdzenie na tymczasowym data lake: trzy dzienne eksporty volt_data_to_s3
+    (components_YYYYMMDD_HHMMSS.json) scalają się w jeden plik, partycje dt=... zostają"""
+    import tempfile
+
+    from lake_manifest import plan_scan, write_partition_file
+
+    with tempfile.TemporaryDirectory() as base_path:
+        storage = open_lake_storage(base_path)
+        exports = {
+            'components_20241218_101500.json': [{'id': 3, 'name': 'MCB B16'}, {'id': 1, 'name': 'RCD 40A'}],
+            'components_20241219_101500.json': [{'id': 2, 'name': 'SPD T2'}],
+            'components_20241220_101500.json': [{'id': 5, 'name': 'MCB C10'}, {'id': 4, 'name': 'Kabel YDY'}],
+        }
+        for name, records in exports.items():
+            write_partition_file(storage, 'raw/components', '', name, json.dumps(records), rows=len(records))
+        for day in ('2024-12-21', '2024-12-22'):
+            write_partition_file(storage, 'raw/components', f'dt={day}', 'components.json',
+                                 json.dumps([{'id': 6, 'name': 'Stycznik'}]), rows=1)
+
+        # Bufor 2 rekordów - sortowanie przez scalanie serii z plików tymczasowych
+        summary = compact_dataset(storage, 'raw/components', sort_by='id', sort_buffer_rows=2)
+        assert (summary['files_before'], summary['files_after']) == (5, 3), summary
+        merged = [scan_file for scan_file in plan_scan(storage, 'raw/components') if scan_file['partition'] == '']
+        assert len(merged) == 1 and is_ndjson_format(merged[0]['format']), merged
+        assert [record['id'] for record in iter_ndjson_records(storage, merged[0])] == [1, 2, 3, 4, 5]
+        assert not any(name in storage.list_keys('raw/components') for name in exports)
+    print("[SUCCESS] 3 dzienne eksporty -> 1 plik, partycje dt=... bez zmian (pliki 5 -> 3)")
+
+
+def check_rewrite_during_compaction():
+    """Sprawdzenie na tymczasowym data lake: plik nadpisany pod tą samą nazwą
+    w trakcie kompakcji (jak ponowna konwersja przez Lambdę) zostaje, a jego
+    grupa nie jest podmieniana"""
+    import tempfile
+
+    from lake_manifest import plan_scan, write_partition_file
+
+    dataset, partition = 'staging/components', 'dt=2025-01-01'
+    first, second = 'components_20250101_101500.json', 'components_20250102_101500.json'
+    with tempfile.TemporaryDirectory() as base_path:
+        storage = open_lake_storage(base_path)
+        for name in (first, second):
+            write_partition_file(storage, dataset, partition, name, json.dumps([{'id': name, 'version': 1}]), rows=1)
+
+        read_bytes = storage.read_bytes
+
+        def read_then_rewrite(key):
+            data = read_bytes(key)
+            if key.endswith(second):
+                # Druga wersja pliku trafia do storage i manifestu po odczycie przez kompakcję
+                storage.read_bytes = read_bytes
+                write_partition_file(storage, dataset, partition, second,
+                                     json.dumps([{'id': second, 'version': 2}]), rows=1)
+            return data
+
+        storage.read_bytes = read_then_rewrite
+        result = compact_partition(storage, dataset, partition)
+        assert (result['skipped'], result['merged'], result['written']) == (1, 0, []), result
+        files = {scan_file['name']: scan_file for scan_file in plan_scan(storage, dataset)}
+        assert sorted(files) == [first, second], files
+        assert json.loads(storage.read_bytes(files[second]['key'])) == [{'id': second, 'version': 2}]
+        keys = sorted(storage.list_keys(partition_key(dataset, partition, '')))
+        assert keys == [partition_key(dataset, partition, name) for name in ('_manifest.json', first, second)], keys
+    print("[SUCCESS] Plik nadpisany w trakcie kompakcji zostaje, grupa pominięta, scalony plik usunięty")
+
+
+def main():
+    """Kompakcja małych plików zbioru data lake"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Kompakcja małych plików w partycjach data lake')
+    parser.add_argument('location', nargs='?',
+                        help='Katalog data lake (np. week3/data-lake) albo s3://bucket[/prefiks]')
+    parser.add_argument('dataset', nargs='?', help='Zbiór, np. raw/components, staging/components')
+    parser.add_argument('--target-mb', type=float, default=COMPACTION_TARGET_SIZE / (1024 * 1024),
+                        help=f'Docelowy rozmiar pliku w MB (domyślnie {COMPACTION_TARGET_SIZE // (1024 * 1024)})')
+    parser.add_argument('--sort-by', help='Kolumna sortowania rekordów w scalonych plikach')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_SUFFIXES), default=NDJSON_COMPRESSION,
+                        help=f'Kompresja scalonych plików NDJSON (domyślnie {NDJSON_COMPRESSION})')
+    parser.add_argument('--row-group-size', type=int, default=PARQUET_ROW_GROUP_SIZE,
+                        help=f'Liczba wierszy w grupie wierszy Parquet (domyślnie {PARQUET_ROW_GROUP_SIZE})')
+    parser.add_argument('--dry-run', action='store_true', help='Tylko plan - bez zapisu')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Sprawdź scalanie dziennych eksportów i nadpisanie pliku w trakcie kompakcji '
+                             'na tymczasowym data lake')
+    args = parser.parse_args()
+
+    if args.self_check:
+        check_daily_exports_compaction()
+        check_rewrite_during_compaction()
+        return
+    if not args.location or not args.dataset:
+        parser.error('podaj lokalizację i zbiór (albo --self-check)')
+
+    storage = open_lake_storage(args.location)
+    summary = compact_dataset(storage, args.dataset, int(args.target_mb * 1024 * 1024), args.sort_by,
+                              args.compression, args.row_group_size, args.dry_run)
+    for result in summary['partitions']:
+        if result['merged']:
+            print(f"  {storage.uri(partition_key(args.dataset, result['partition'], ''))}: "
+                  f"pliki {result['files_before']} -> {result['files_after']}, "
+                  f"{result['bytes_before']} B -> {result['bytes_after']} B")
+        if result['skipped']:
+            print(f"  ⚠️  {storage.uri(partition_key(args.dataset, result['partition'], ''))}: "
+                  f"pominięte grupy {result['skipped']} (pliki nadpisane w trakcie kompakcji)")
+    prefix = "[DRY RUN] " if args.dry_run else "[SUCCESS] "
+    print(f"{prefix}{storage.uri(args.dataset)}: partycje {len(summary['partitions'])}, "
+          f"pliki {summary['files_before']} -> {summary['files_after']}")
+
+
+if __name__ == "__main__":
+    main()
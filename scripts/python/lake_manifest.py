@@ -0,0 +1,458 @@
+"""
+Manifesty partycji data lake - planowanie odczytu bez listowania S3
+
+Każdy zapis do warstw raw/staging/mart aktualizuje dwa pliki JSON:
+
+    {dataset}/{partition}/_manifest.json   - pliki partycji: nazwa, rozmiar,
+                                             liczba rekordów, SHA-256, format
+    {dataset}/_partitions.json             - indeks partycji zbioru: wartości
+                                             partycji, liczba plików/rekordów/bajtów
+
+np. dataset 'raw/source1', partycja '2025/01' albo dataset 'raw/components',
+partycja 'dt=2024-12-20'. Czytnik planuje skan z samych manifestów
+(plan_scan): jeden GET indeksu + jeden GET na wybraną partycję, bez
+list_objects_v2 po tysiącach kluczy. Manifest jest jedynym źródłem prawdy
+o plikach partycji - plik, którego nie ma w manifeście, nie jest czytany,
+więc podmiana zestawu plików to jeden zapis manifestu.
+
+Działa tak samo dla lokalnego data-lake/ i S3 (lake_storage). Zbiór może
+mieć wielu równoległych piszących (np. kilka wywołań Lambdy naraz): manifest
+i indeks to read-modify-write z zapisem warunkowym (S3: If-Match na ETag),
+a przy konflikcie zmiana jest nakładana ponownie na świeży odczyt - żaden
+wpis nie ginie. Wyjątek: --rebuild nadpisuje manifesty bezwarunkowo
+(uruchamiać, gdy nikt inny nie pisze do zbioru).
+
+    from lake_manifest import plan_scan, write_partition_file
+
+    write_partition_file(storage, 'raw/source1', '2025/01', 'data_2025-01-01.json', data, rows=3)
+    files = plan_scan(storage, 'raw/source1', lambda values: values['month'] == '01')
+
+Uzupełnienie manifestów dla istniejących danych (jednorazowe listowanie):
+    python lake_manifest.py week3/data-lake raw/source1 --rebuild
+    python lake_manifest.py s3://voltappbucket raw/components --rebuild
+"""
+import hashlib
+import io
+import json
+import os
+import posixpath
+import random
+import time
+from datetime import datetime
+
+from lake_storage import WriteConflict, open_lake_storage
+
+MANIFEST_NAME = '_manifest.json'
+DATASET_INDEX_NAME = '_partitions.json'
+MANIFEST_VERSION = 1
+
+# Ponowienia zapisu warunkowego manifestu/indeksu przy równoległych piszących
+MANIFEST_COMMIT_RETRIES = int(os.getenv('LAKE_MANIFEST_RETRIES', '20'))
+MANIFEST_RETRY_DELAY = 0.05
+
+# Segmenty ścieżki raw/source1/YYYY/MM/DD bez nazw kolumn
+DATE_PARTITION_COLUMNS = ('year', 'month', 'day')
+
+
+def is_partition_segment(segment):
+    """Segment partycji: Hive (dt=2024-12-20) albo numeryczny (2025, 01)"""
+    return '=' in segment or segment.isdigit()
+
+
+def is_internal_file(name):
+    """Manifesty, pliki tymczasowe i pomocnicze (_*, .*) nie są danymi"""
+    return name.startswith('_') or name.startswith('.')
+
+
+def split_lake_key(key):
+    """Dzieli klucz na (dataset, partycja, nazwa pliku)
+
+    'raw/source1/2025/01/data_2025-01-01.json' -> ('raw/source1', '2025/01', 'data_2025-01-01.json')
+    'raw/components/components_20241220.json'  -> ('raw/components', '', 'components_20241220.json')
+    """
+    directory, name = posixpath.split(key)
+    segments = directory.split('/') if directory else []
+    boundary = len(segments)
+    while boundary > 0 and is_partition_segment(segments[boundary - 1]):
+        boundary -= 1
+    return '/'.join(segments[:boundary]), '/'.join(segments[boundary:]), name
+
+
+def parse_partition(partition):
+    """Wartości partycji ze ścieżki
+
+    '2025/01'       -> {'year': '2025', 'month': '01'}
+    'dt=2024-12-20' -> {'dt': '2024-12-20'}
+    """
+    values = {}
+    position = 0
+    for segment in partition.split('/'):
+        if not segment:
+            continue
+        if '=' in segment:
+            name, value = segment.split('=', 1)
+            values[name] = value
+        elif position < len(DATE_PARTITION_COLUMNS):
+            values[DATE_PARTITION_COLUMNS[position]] = segment
+            position += 1
+    return values
+
+
+def partition_key(dataset, partition, name):
+    """Klucz pliku w partycji"""
+    return '/'.join(part for part in (dataset, partition, name) if part)
+
+
+def manifest_key(dataset, partition):
+    return partition_key(dataset, partition, MANIFEST_NAME)
+
+
+def dataset_index_key(dataset):
+    return partition_key(dataset, '', DATASET_INDEX_NAME)
+
+
+def file_format(name):
+    """Format z rozszerzenia: 'data.json' -> 'json', 'orders.ndjson.gz' -> 'ndjson.gz'"""
+    return name.split('.', 1)[1] if '.' in name else ''
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_file_entry(name, size, sha256, rows=None, fmt=None, stats=None):
+    """Wpis pliku w manifeście partycji
+
+    Args:
+        stats (dict): opcjonalne statystyki kolumn, np. {'order_date': ['2025-01-01', '2025-01-31']}
+    """
+    entry = {
+        'name': name,
+        'size': size,
+        'rows': rows,
+        'sha256': sha256,
+        'format': fmt or file_format(name),
+        'written_at': datetime.now().isoformat(),
+    }
+    if stats:
+        entry['stats'] = stats
+    return entry
+
+
+def _read_json(storage, key):
+    try:
+        return json.loads(storage.read_bytes(key))
+    except FileNotFoundError:
+        return None
+
+
+def _json_body(document):
+    return json.dumps(document, indent=2, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def _write_json(storage, key, document):
+    storage.write_bytes(key, _json_body(document), content_type='application/json')
+
+
+def _update_json(storage, key, update):
+    """Read-modify-write dokumentu JSON z zapisem warunkowym
+
+    update(dokument albo None) zwraca nowy dokument; przy konflikcie (inny
+    piszący zmienił plik od odczytu) odczyt i update są powtarzane.
+    """
+    for attempt in range(MANIFEST_COMMIT_RETRIES):
+        try:
+            data, token = storage.read_versioned(key)
+            document = json.loads(data)
+        except FileNotFoundError:
+            document, token = None, None
+        document = update(document)
+        try:
+            storage.write_bytes_if(key, _json_body(document), token, content_type='application/json')
+            return document
+        except WriteConflict:
+            time.sleep(random.uniform(0, MANIFEST_RETRY_DELAY * 2 ** min(attempt, 5)))
+    raise WriteConflict(f"{storage.uri(key)}: {MANIFEST_COMMIT_RETRIES} konfliktów zapisu z rzędu")
+
+
+def load_partition_manifest(storage, dataset, partition):
+    """Manifest partycji (pusty, jeśli partycja nie ma jeszcze manifestu)
+
+    Returns:
+        dict: {'dataset', 'partition', 'values', 'files': {nazwa: wpis}, 'updated_at'}
+    """
+    return _manifest_from_document(_read_json(storage, manifest_key(dataset, partition)), dataset, partition)
+
+
+def _manifest_from_document(document, dataset, partition):
+    if document is None:
+        return {'dataset': dataset, 'partition': partition, 'values': parse_partition(partition),
+                'files': {}, 'updated_at': None}
+    document['files'] = {entry['name']: entry for entry in document['files']}
+    return document
+
+
+def load_dataset_index(storage, dataset):
+    """Indeks partycji zbioru: partycja -> podsumowanie (None, jeśli zbiór nie ma indeksu)"""
+    document = _read_json(storage, dataset_index_key(dataset))
+    if document is None:
+        return None
+    return document['partitions']
+
+
+def _partition_summary(manifest):
+    files = manifest['files'].values()
+    return {
+        'values': manifest['values'],
+        'files': len(manifest['files']),
+        'rows': sum(entry['rows'] or 0 for entry in files),
+        'bytes': sum(entry['size'] for entry in files),
+        'updated_at': manifest['updated_at'],
+    }
+
+
+def _manifest_document(manifest):
+    manifest['updated_at'] = datetime.now().isoformat()
+    return dict(manifest, version=MANIFEST_VERSION,
+                files=[manifest['files'][name] for name in sorted(manifest['files'])])
+
+
+def _index_document(dataset, partitions):
+    return {
+        'version': MANIFEST_VERSION,
+        'dataset': dataset,
+        'updated_at': datetime.now().isoformat(),
+        'partitions': partitions,
+    }
+
+
+def _save_partition_manifest(storage, manifest):
+    _write_json(storage, manifest_key(manifest['dataset'], manifest['partition']), _manifest_document(manifest))
+
+
+def _save_dataset_index(storage, dataset, partitions):
+    _write_json(storage, dataset_index_key(dataset), _index_document(dataset, partitions))
+
+
+def record_partition_files(storage, dataset, partition, entries=(), remove=()):
+    """Dodaje/aktualizuje wpisy plików partycji i usuwa wpisy `remove` - jednym zapisem manifestu
+
+    Po manifeście aktualizowany jest indeks partycji zbioru. Oba zapisy są
+    warunkowe (_update_json) - bezpieczne przy równoległych piszących.
+
+    Returns:
+        dict: zaktualizowany manifest partycji
+    """
+    entries, remove = list(entries), list(remove)
+
+    def apply_files(manifest):
+        for name in remove:
+            manifest['files'].pop(name, None)
+        for entry in entries:
+            manifest['files'][entry['name']] = entry
+
+    return _commit_partition(storage, dataset, partition, apply_files)
+
+
+def replace_partition_files(storage, dataset, partition, replacements):
+    """Podmienia grupy plików partycji na scalone pliki - jednym zapisem manifestu
+
+    Grupa jest podmieniana tylko wtedy, gdy każdy jej plik ma w manifeście nadal
+    ten sam sha256 co przy odczycie. Plik nadpisany w międzyczasie (np. ponowna
+    konwersja CSV przez Lambdę) zostaje w manifeście, a cała grupa jest pomijana.
+
+    Args:
+        replacements (list): [(wpis scalonego pliku, {nazwa pliku grupy: sha256 z odczytu})]
+
+    Returns:
+        tuple: (zaktualizowany manifest partycji, nazwy podmienionych scalonych plików)
+    """
+    replacements = list(replacements)
+    applied = []
+
+    def apply_files(manifest):
+        applied.clear()
+        files = manifest['files']
+        for entry, sources in replacements:
+            if all(name in files and files[name]['sha256'] == sha256 for name, sha256 in sources.items()):
+                for name in sources:
+                    del files[name]
+                files[entry['name']] = entry
+                applied.append(entry['name'])
+
+    manifest = _commit_partition(storage, dataset, partition, apply_files)
+    return manifest, list(applied)
+
+
+def _commit_partition(storage, dataset, partition, apply_files):
+    """Warunkowy zapis manifestu partycji (apply_files zmienia manifest w miejscu), potem indeksu"""
+
+    def update_manifest(document):
+        manifest = _manifest_from_document(document, dataset, partition)
+        apply_files(manifest)
+        return _manifest_document(manifest)
+
+    def apply_index(document):
+        partitions = document['partitions'] if document else {}
+        # Podsumowanie z bieżącego manifestu - inny piszący mógł go zmienić po naszym zapisie
+        latest = load_partition_manifest(storage, dataset, partition)
+        if latest['files']:
+            partitions[partition] = _partition_summary(latest)
+        else:
+            partitions.pop(partition, None)
+        return _index_document(dataset, partitions)
+
+    document = _update_json(storage, manifest_key(dataset, partition), update_manifest)
+    _update_json(storage, dataset_index_key(dataset), apply_index)
+    return _manifest_from_document(document, dataset, partition)
+
+
+def write_partition_file(storage, dataset, partition, name, data, rows=None, fmt=None, content_type=None,
+                         stats=None):
+    """Zapisuje plik partycji i rejestruje go w manifeście
+
+    Args:
+        data (bytes | str): zawartość pliku
+        rows (int): liczba rekordów w pliku
+
+    Returns:
+        dict: wpis pliku w manifeście
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    storage.write_bytes(partition_key(dataset, partition, name), data, content_type=content_type)
+    entry = make_file_entry(name, len(data), sha256_hex(data), rows, fmt, stats)
+    record_partition_files(storage, dataset, partition, [entry])
+    return entry
+
+
+def plan_scan(storage, dataset, partition_filter=None):
+    """Lista plików do odczytu - wyłącznie z manifestów (bez listowania)
+
+    Args:
+        partition_filter (callable): wartości partycji -> bool (np. lambda v: v['year'] == '2025')
+
+    Returns:
+        list: wpisy plików z dodatkowymi polami 'key', 'dataset', 'partition', 'partition_values'
+    """
+    partitions = load_dataset_index(storage, dataset)
+    if partitions is None:
+        raise FileNotFoundError(
+            f"Brak indeksu partycji {storage.uri(dataset_index_key(dataset))} - "
+            f"uruchom: python lake_manifest.py <lokalizacja> {dataset} --rebuild")
+
+    files = []
+    for partition in sorted(partitions):
+        values = partitions[partition]['values']
+        if partition_filter is not None and not partition_filter(values):
+            continue
+        manifest = load_partition_manifest(storage, dataset, partition)
+        for name in sorted(manifest['files']):
+            files.append(dict(manifest['files'][name], key=partition_key(dataset, partition, name),
+                              dataset=dataset, partition=partition, partition_values=values))
+    return files
+
+
+def summarize_scan(files):
+    """Podsumowanie planu skanu: liczba partycji, plików, rekordów i bajtów"""
+    return {
+        'partitions': len({scan_file['partition'] for scan_file in files}),
+        'files': len(files),
+        'rows': sum(scan_file['rows'] or 0 for scan_file in files),
+        'bytes': sum(scan_file['size'] for scan_file in files),
+    }
+
+
+def verify_checksum(scan_file, data):
+    """Sprawdza SHA-256 odczytanego pliku z manifestem (ValueError przy niezgodności)"""
+    if scan_file.get('sha256') and sha256_hex(data) != scan_file['sha256']:
+        raise ValueError(f"Suma kontrolna {scan_file['key']} nie zgadza się z manifestem")
+    return data
+
+
+def count_records(name, data):
+    """Liczba rekordów pliku (uzupełnianie manifestów dla istniejących danych)
+
+    JSON: długość tablicy albo suma długości list w dokumencie
+    ({"users": [...], "orders": [...]}); NDJSON (też .gz/.zst)/CSV: linie; Parquet: metadane.
+    """
+    from lake_ndjson import NDJSON_FORMATS, iter_ndjson_stream
+
+    fmt = file_format(name)
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(io.BytesIO(data)).metadata.num_rows
+        except Exception:
+            # Np. pliki-znaczniki zamiast prawdziwego Parquet
+            return None
+    if fmt == 'json':
+        document = json.loads(data)
+        if isinstance(document, list):
+            return len(document)
+        if isinstance(document, dict):
+            return sum(len(value) for value in document.values() if isinstance(value, list))
+        return None
+    if fmt in NDJSON_FORMATS:
+        return sum(1 for _ in iter_ndjson_stream(io.BytesIO(data), NDJSON_FORMATS[fmt]))
+    if fmt == 'csv':
+        return max(0, len(data.splitlines()) - 1)
+    return None
+
+
+def rebuild_manifests(storage, dataset):
+    """Buduje manifesty zbioru od zera z jednego listowania (dla danych sprzed manifestów)
+
+    Returns:
+        dict: indeks partycji zbioru
+    """
+    prefix = dataset + '/'
+    grouped = {}
+    for key in storage.list_keys(prefix):
+        partition, name = posixpath.split(key[len(prefix):])
+        if is_internal_file(name):
+            continue
+        grouped.setdefault(partition, []).append(name)
+
+    partitions = {}
+    for partition in sorted(grouped):
+        manifest = {'dataset': dataset, 'partition': partition, 'values': parse_partition(partition),
+                    'files': {}, 'updated_at': None}
+        for name in sorted(grouped[partition]):
+            data = storage.read_bytes(partition_key(dataset, partition, name))
+            manifest['files'][name] = make_file_entry(name, len(data), sha256_hex(data), count_records(name, data))
+        _save_partition_manifest(storage, manifest)
+        partitions[partition] = _partition_summary(manifest)
+
+    # Partycje, które zniknęły, znikają z indeksu razem z jego nadpisaniem
+    _save_dataset_index(storage, dataset, partitions)
+    return partitions
+
+
+def main():
+    """Podgląd planu skanu / uzupełnienie manifestów zbioru"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manifesty partycji data lake')
+    parser.add_argument('location', help='Katalog data lake (np. week3/data-lake) albo s3://bucket[/prefiks]')
+    parser.add_argument('dataset', help='Zbiór, np. raw/source1, raw/components, staging/orders')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Zbuduj manifesty z listowania istniejących plików')
+    args = parser.parse_args()
+
+    storage = open_lake_storage(args.location)
+    if args.rebuild:
+        partitions = rebuild_manifests(storage, args.dataset)
+        print(f"[SUCCESS] Manifesty {storage.uri(args.dataset)}: {len(partitions)} partycji")
+
+    files = plan_scan(storage, args.dataset)
+    for scan_file in files:
+        print(f"  {scan_file['key']}  {scan_file['size']:>10} B  rows={scan_file['rows']}  "
+              f"sha256={scan_file['sha256'][:12]}")
+    summary = summarize_scan(files)
+    print(f"Partycje: {summary['partitions']}, pliki: {summary['files']}, "
+          f"rekordy: {summary['rows']}, bajty: {summary['bytes']}")
+
+
+if __name__ == "__main__":
+    main()
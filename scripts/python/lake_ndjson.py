@@ -0,0 +1,261 @@
+"""
+Surowe dane w formacie NDJSON (JSON Lines) z kompresją gzip / zstd
+
+Dzienny dokument {"users": [...], "orders": [...]} trzeba wczytać w całości,
+żeby dostać się do pierwszego rekordu. W formacie NDJSON każdy rekord to jedna
+linia, a każdy plik zawiera jedną encję:
+
+    raw/source1/2025/01/orders_2025-01-01.ndjson.gz
+    raw/source1/2025/01/users_2025-01-01.ndjson.zst
+
+Zapis i odczyt są strumieniowe - zużycie pamięci nie zależy od rozmiaru pliku:
+- write_ndjson_file: rekordy z iteratora -> kompresja -> plik tymczasowy ->
+  storage.write_file (w S3 upload_file, multipart dla dużych plików);
+  SHA-256, liczba rekordów i zakres dat liczone w locie trafiają do manifestu
+- iter_ndjson_records: strumień obiektu (plik lokalny / StreamingBody S3) ->
+  dekompresja -> linie; suma kontrolna sprawdzana po ostatnim rekordzie
+- ingest_ndjson: import zrzutu z ERP (.ndjson, .ndjson.gz, .ndjson.zst)
+  do partycji raw bez wczytywania go do pamięci
+
+Kompresja zstd wymaga pakietu zstandard (importowany dopiero przy użyciu).
+
+Użycie:
+    python lake_ndjson.py week3/data-lake erp_orders.ndjson.gz --entity orders --date 2025-01-01
+    python lake_ndjson.py s3://voltappbucket erp_orders.ndjson --entity orders --date 2025-01-01 --compression zstd
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+
+from lake_manifest import file_format, make_file_entry, partition_key, record_partition_files
+from lake_storage import open_lake_storage
+
+NDJSON_COMPRESSION = os.getenv('LAKE_NDJSON_COMPRESSION', 'gzip')
+GZIP_LEVEL = int(os.getenv('LAKE_GZIP_LEVEL', '6'))
+ZSTD_LEVEL = int(os.getenv('LAKE_ZSTD_LEVEL', '3'))
+
+# Kompresja -> rozszerzenie pliku; format w manifeście to 'ndjson' + rozszerzenie
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+NDJSON_FORMATS = {'ndjson' + suffix: compression for compression, suffix in COMPRESSION_SUFFIXES.items()}
+CONTENT_TYPES = {'none': 'application/x-ndjson', 'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+
+# Kolumna daty rekordów raw per encja (statystyki manifestu, filtrowanie wierszy)
+ENTITY_DATE_COLUMNS = {'users': 'registration_date', 'orders': 'order_date'}
+
+# Rozmiar kawałka odczytu/zapisu strumieni
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Segmenty nazwy pliku za encją: data, znacznik czasu (20241218_101500), numer części kompakcji
+ENTITY_SUFFIX_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}|\d+|compacted-[\d-]+)$')
+
+
+def is_ndjson_format(fmt):
+    return fmt in NDJSON_FORMATS
+
+
+def ndjson_name(entity, day, compression=NDJSON_COMPRESSION):
+    """Nazwa pliku encji z jednego dnia, np. orders_2025-01-01.ndjson.gz"""
+    return f"{entity}_{day}.ndjson{COMPRESSION_SUFFIXES[compression]}"
+
+
+def ndjson_entity(name):
+    """Encja pliku NDJSON/JSON z nazwy - bez daty, znacznika czasu i numeru części
+
+    'orders_2025-01-01.ndjson.gz' -> 'orders', 'components_20241218_101500.json' -> 'components',
+    'components_compacted-20250101120000-00000.ndjson.gz' -> 'components'
+    """
+    segments = name.split('.', 1)[0].split('_')
+    while len(segments) > 1 and ENTITY_SUFFIX_PATTERN.match(segments[-1]):
+        segments.pop()
+    return '_'.join(segments)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Kompresja zstd wymaga pakietu zstandard: pip install zstandard")
+    return zstandard
+
+
+class _HashingWriter(io.RawIOBase):
+    """Zapis do pliku docelowego z liczeniem rozmiaru i SHA-256 (skompresowanych bajtów)"""
+
+    def __init__(self, target):
+        self.target = target
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.target.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+        return len(data)
+
+
+class _HashingReader(io.RawIOBase):
+    """Odczyt strumienia źródłowego z liczeniem SHA-256 (do weryfikacji z manifestem)"""
+
+    def __init__(self, source):
+        self.source = source
+        self.sha256 = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.source.read(len(buffer))
+        buffer[:len(data)] = data
+        self.sha256.update(data)
+        return len(data)
+
+
+def _compressed_writer(target, compression):
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=target, mode='wb', compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(target, closefd=False)
+    return io.BufferedWriter(target, STREAM_CHUNK_SIZE)
+
+
+def _decompressed_reader(source, compression):
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    if compression == 'zstd':
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(source, closefd=False),
+                                 STREAM_CHUNK_SIZE)
+    return io.BufferedReader(source, STREAM_CHUNK_SIZE)
+
+
+def iter_ndjson_stream(source, compression='none'):
+    """Rekordy ze strumienia NDJSON (puste linie są pomijane)"""
+    for line in _decompressed_reader(source, compression):
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_ndjson_records(storage, scan_file):
+    """Rekordy pliku NDJSON z data lake - strumieniowo, w stałej pamięci
+
+    Args:
+        scan_file (dict): wpis planu skanu ('key', 'format', opcjonalnie 'sha256')
+
+    Raises:
+        ValueError: SHA-256 pliku różni się od manifestu (po przeczytaniu całości)
+    """
+    stream = storage.open_read(scan_file['key'])
+    source = _HashingReader(stream)
+    try:
+        yield from iter_ndjson_stream(source, NDJSON_FORMATS[scan_file['format']])
+        # Reszta obiektu za ostatnią linią (np. stopka gzip) też wchodzi do sumy kontrolnej
+        while True:
+            data = stream.read(STREAM_CHUNK_SIZE)
+            if not data:
+                break
+            source.sha256.update(data)
+    finally:
+        stream.close()
+    if scan_file.get('sha256') and source.sha256.hexdigest() != scan_file['sha256']:
+        raise ValueError(f"Suma kontrolna {scan_file['key']} nie zgadza się z manifestem")
+
+
+def iter_local_ndjson(path):
+    """Rekordy lokalnego pliku .ndjson / .ndjson.gz / .ndjson.zst - strumieniowo"""
+    compression = {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(str(path))[1], 'none')
+    with open(path, 'rb') as f:
+        yield from iter_ndjson_stream(f, compression)
+
+
+def write_ndjson_file(storage, dataset, partition, name, records, date_column=None, register=True):
+    """Zapisuje rekordy jako plik NDJSON (kompresja wg rozszerzenia nazwy) i rejestruje go w manifeście
+
+    Args:
+        records: iterowalne słowniki - np. generator; rekordy nie są trzymane w pamięci
+        date_column (str): kolumna daty - jej zakres min/max trafia do statystyk manifestu
+        register (bool): False - plik nie trafia do manifestu (wpis rejestruje wywołujący,
+            np. kompakcja podmienia wiele plików jednym zapisem manifestu)
+
+    Returns:
+        dict: wpis pliku w manifeście
+    """
+    fmt = file_format(name)
+    compression = NDJSON_FORMATS[fmt]
+    rows, low, high = 0, None, None
+    fd, tmp_path = tempfile.mkstemp(prefix='lake-', suffix='.' + fmt)
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            output = _HashingWriter(target)
+            with _compressed_writer(output, compression) as writer:
+                chunk, chunk_size = [], 0
+                for record in records:
+                    line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+                    chunk.append(line)
+                    chunk_size += len(line)
+                    if chunk_size >= STREAM_CHUNK_SIZE:
+                        writer.write(b''.join(chunk))
+                        chunk, chunk_size = [], 0
+                    rows += 1
+                    value = record.get(date_column) if date_column else None
+                    if value:
+                        value = str(value)[:10]
+                        low = value if low is None or value < low else low
+                        high = value if high is None or value > high else high
+                writer.write(b''.join(chunk))
+
+        storage.write_file(partition_key(dataset, partition, name), tmp_path, content_type=CONTENT_TYPES[compression])
+    finally:
+        os.unlink(tmp_path)
+
+    entry = make_file_entry(name, output.size, output.sha256.hexdigest(), rows, fmt,
+                            {date_column: [low, high]} if low is not None else None)
+    if register:
+        record_partition_files(storage, dataset, partition, [entry])
+    return entry
+
+
+def ingest_ndjson(storage, source_path, dataset, partition, name, date_column=None):
+    """Import lokalnego zrzutu NDJSON (np. z ERP) do partycji data lake - strumieniowo
+
+    Plik źródłowy może być nieskompresowany albo .gz/.zst; kompresja pliku
+    docelowego wynika z `name` (np. orders_2025-01-01.ndjson.zst).
+    """
+    return write_ndjson_file(open_lake_storage(storage), dataset, partition, name,
+                             iter_local_ndjson(source_path), date_column)
+
+
+def main():
+    """Import zrzutu NDJSON do warstwy raw data lake"""
+    import argparse
+    from datetime import date
+
+    from lake_parquet import RAW_DATASET
+
+    parser = argparse.ArgumentParser(description='Import NDJSON do warstwy raw data lake')
+    parser.add_argument('location', help='Katalog data lake (np. week3/data-lake) albo s3://bucket[/prefiks]')
+    parser.add_argument('source', help='Plik źródłowy .ndjson / .ndjson.gz / .ndjson.zst')
+    parser.add_argument('--entity', required=True, help='Encja rekordów (np. orders, users)')
+    parser.add_argument('--date', required=True, help='Dzień danych (YYYY-MM-DD) - partycja YYYY/MM')
+    parser.add_argument('--dataset', default=RAW_DATASET, help=f'Zbiór raw (domyślnie {RAW_DATASET})')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_SUFFIXES), default=NDJSON_COMPRESSION,
+                        help=f'Kompresja pliku w data lake (domyślnie {NDJSON_COMPRESSION})')
+    args = parser.parse_args()
+
+    day = date.fromisoformat(args.date)
+    storage = open_lake_storage(args.location)
+    name = ndjson_name(args.entity, day, args.compression)
+    partition = f"{day:%Y/%m}"
+    entry = ingest_ndjson(storage, args.source, args.dataset, partition, name,
+                          ENTITY_DATE_COLUMNS.get(args.entity))
+    print(f"[SUCCESS] {storage.uri(partition_key(args.dataset, partition, name))}: "
+          f"{entry['rows']} rekordów, {entry['size']} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Warstwy staging i mart data lake w Parquet (pyarrow)
+
+Z surowych dokumentów raw/source1/YYYY/MM/data_YYYY-MM-DD.json
+({"users": [...], "orders": [...]}) albo plików NDJSON jednej encji
+(users_YYYY-MM-DD.ndjson.gz, orders_YYYY-MM-DD.ndjson.zst - lake_ndjson) budowane są:
+
+    staging/customers/customers_cleaned.parquet    - klienci po czyszczeniu (1 wiersz / user_id)
+    staging/orders/orders_staging.parquet          - zamówienia po czyszczeniu (1 wiersz / order_id)
+    mart/customer_summary/customer_metrics.parquet - metryki klienta (liczba zamówień, wydatki, daty)
+    mart/sales_dashboard/monthly_sales.parquet     - sprzedaż miesięczna per waluta
+
+Zapis (write_parquet_table):
+- jawne schematy (CUSTOMERS_SCHEMA, ...) - typy nie zależą od danych wejściowych
+- kodowanie słownikowe tylko dla kolumn o małej kardynalności (kraj, status, waluta)
+- statystyki min/max kolumn w każdej grupie wierszy; tabela jest sortowana po
+  kolumnie filtrowania (np. order_date), więc zakresy grup się nie nakładają
+  i predicate pushdown pomija całe grupy
+- rozmiar grupy wierszy: LAKE_PARQUET_ROW_GROUP_SIZE (domyślnie 131072 wierszy),
+  kompresja: LAKE_PARQUET_COMPRESSION (domyślnie zstd)
+- każdy plik trafia do manifestu partycji (lake_manifest) ze statystykami
+  min/max kolumny sortowania
+"""
+import io
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from lake_manifest import plan_scan, split_lake_key, verify_checksum, write_partition_file
+from lake_ndjson import is_ndjson_format, iter_ndjson_records, ndjson_entity
+
+PARQUET_ROW_GROUP_SIZE = int(os.getenv('LAKE_PARQUET_ROW_GROUP_SIZE', str(128 * 1024)))
+PARQUET_COMPRESSION = os.getenv('LAKE_PARQUET_COMPRESSION', 'zstd')
+
+RAW_DATASET = 'raw/source1'
+
+CUSTOMERS_KEY = 'staging/customers/customers_cleaned.parquet'
+ORDERS_KEY = 'staging/orders/orders_staging.parquet'
+CUSTOMER_METRICS_KEY = 'mart/customer_summary/customer_metrics.parquet'
+MONTHLY_SALES_KEY = 'mart/sales_dashboard/monthly_sales.parquet'
+
+# Rekordy raw per encja - typy kolumn przy odczycie (lake_reader); daty zostają
+# tekstem ISO jak w plikach, total_amount 100 i 125.5 to zawsze float64
+RAW_USERS_SCHEMA = pa.schema([
+    ('user_id', pa.string()),
+    ('name', pa.string()),
+    ('email', pa.string()),
+    ('registration_date', pa.string()),
+    ('country', pa.string()),
+    ('status', pa.string()),
+])
+
+RAW_ORDERS_SCHEMA = pa.schema([
+    ('order_id', pa.string()),
+    ('user_id', pa.string()),
+    ('order_date', pa.string()),
+    ('total_amount', pa.float64()),
+    ('currency', pa.string()),
+    ('status', pa.string()),
+    ('items', pa.list_(pa.struct([
+        ('product_id', pa.string()),
+        ('quantity', pa.int64()),
+        ('price', pa.float64()),
+    ]))),
+])
+
+RAW_ENTITY_SCHEMAS = {'users': RAW_USERS_SCHEMA, 'orders': RAW_ORDERS_SCHEMA}
+
+CUSTOMERS_SCHEMA = pa.schema([
+    ('user_id', pa.string()),
+    ('name', pa.string()),
+    ('email', pa.string()),
+    ('registration_date', pa.date32()),
+    ('country', pa.string()),
+    ('status', pa.string()),
+])
+
+ORDERS_SCHEMA = pa.schema([
+    ('order_id', pa.string()),
+    ('user_id', pa.string()),
+    ('order_date', pa.date32()),
+    ('order_month', pa.string()),
+    ('total_amount', pa.float64()),
+    ('currency', pa.string()),
+    ('status', pa.string()),
+    ('items_count', pa.int32()),
+    ('items_quantity', pa.int32()),
+])
+
+CUSTOMER_METRICS_SCHEMA = pa.schema([
+    ('user_id', pa.string()),
+    ('name', pa.string()),
+    ('country', pa.string()),
+    ('status', pa.string()),
+    ('registration_date', pa.date32()),
+    ('orders_count', pa.int64()),
+    ('completed_orders', pa.int64()),
+    ('total_spent', pa.float64()),
+    ('avg_order_value', pa.float64()),
+    ('first_order_date', pa.date32()),
+    ('last_order_date', pa.date32()),
+])
+
+MONTHLY_SALES_SCHEMA = pa.schema([
+    ('month', pa.string()),
+    ('currency', pa.string()),
+    ('orders_count', pa.int64()),
+    ('completed_orders', pa.int64()),
+    ('customers_count', pa.int64()),
+    ('revenue', pa.float64()),
+    ('avg_order_value', pa.float64()),
+])
+
+# Tabela -> (schemat, kolumny ze słownikiem, kolumny sortowania)
+TABLE_LAYOUTS = {
+    CUSTOMERS_KEY: (CUSTOMERS_SCHEMA, ['country', 'status'], ['registration_date', 'user_id']),
+    ORDERS_KEY: (ORDERS_SCHEMA, ['order_month', 'currency', 'status'], ['order_date', 'order_id']),
+    CUSTOMER_METRICS_KEY: (CUSTOMER_METRICS_SCHEMA, ['country', 'status'], ['user_id']),
+    MONTHLY_SALES_KEY: (MONTHLY_SALES_SCHEMA, ['currency'], ['month', 'currency']),
+}
+
+# Zamówienie wliczane do przychodu
+REVENUE_STATUS = 'completed'
+
+
+def _column_stats(table, column):
+    """Min/max kolumny jako tekst (statystyki pliku w manifeście)"""
+    if table.num_rows == 0:
+        return None
+    bounds = pc.min_max(table[column])
+    return [str(bounds['min'].as_py()), str(bounds['max'].as_py())]
+
+
+def write_parquet_table(storage, key, table, schema, dictionary_columns=(), sort_by=(),
+                        row_group_size=PARQUET_ROW_GROUP_SIZE, compression=PARQUET_COMPRESSION):
+    """Zapisuje tabelę jako Parquet i rejestruje plik w manifeście partycji
+
+    Args:
+        table (pa.Table): dane (kolumny rzutowane na schema)
+        schema (pa.Schema): jawny schemat pliku
+        dictionary_columns: kolumny kodowane słownikowo (pozostałe - bez słownika)
+        sort_by: kolumny sortowania; pierwsza trafia do statystyk manifestu
+        row_group_size (int): maksymalna liczba wierszy w grupie wierszy
+
+    Returns:
+        dict: wpis pliku w manifeście
+    """
+    table = table.select(schema.names).cast(schema)
+    if sort_by:
+        table = table.sort_by([(column, 'ascending') for column in sort_by])
+
+    buffer = io.BytesIO()
+    pq.write_table(
+        table,
+        buffer,
+        row_group_size=row_group_size,
+        compression=compression,
+        use_dictionary=list(dictionary_columns),
+        write_statistics=True,
+    )
+    stats = None
+    if sort_by and _column_stats(table, sort_by[0]):
+        stats = {sort_by[0]: _column_stats(table, sort_by[0])}
+
+    dataset, partition, name = split_lake_key(key)
+    return write_partition_file(storage, dataset, partition, name, buffer.getvalue(), rows=table.num_rows,
+                                fmt='parquet', content_type='application/vnd.apache.parquet', stats=stats)
+
+
+def write_layer_table(storage, key, table, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """write_parquet_table z układem (schemat, słownik, sortowanie) z TABLE_LAYOUTS"""
+    schema, dictionary_columns, sort_by = TABLE_LAYOUTS[key]
+    return write_parquet_table(storage, key, table, schema, dictionary_columns, sort_by, row_group_size)
+
+
+def read_raw_files(storage, files):
+    """Użytkownicy i zamówienia z podanych plików raw (wpisy planu skanu z 'key' i 'sha256')
+
+    Returns:
+        tuple: (users, orders) - listy słowników w kolejności plików
+    """
+    users, orders = [], []
+    for scan_file in files:
+        if is_ndjson_format(scan_file['format']):
+            records = {'users': users, 'orders': orders}.get(ndjson_entity(scan_file['name']))
+            if records is not None:
+                records.extend(iter_ndjson_records(storage, scan_file))
+            continue
+        document = json.loads(verify_checksum(scan_file, storage.read_bytes(scan_file['key'])))
+        users.extend(document.get('users', ()))
+        orders.extend(document.get('orders', ()))
+    return users, orders
+
+
+def load_raw_records(storage, dataset=RAW_DATASET, partition_filter=None):
+    """Użytkownicy i zamówienia ze wszystkich plików raw zbioru (plan z manifestów)"""
+    return read_raw_files(storage, plan_scan(storage, dataset, partition_filter))
+
+
+def _clean_text(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def build_customers_cleaned(users):
+    """Klienci po czyszczeniu: przycięte teksty, email i status małymi literami,
+    jeden wiersz na user_id (wygrywa ostatni rekord)"""
+    latest = {}
+    for user in users:
+        latest[user['user_id']] = user
+    rows = list(latest.values())
+    return pa.table({
+        'user_id': [user['user_id'] for user in rows],
+        'name': [_clean_text(user.get('name')) for user in rows],
+        'email': [(_clean_text(user.get('email')) or '').lower() or None for user in rows],
+        'registration_date': pa.array([user.get('registration_date') for user in rows], pa.string()).cast(pa.date32()),
+        'country': [_clean_text(user.get('country')) for user in rows],
+        'status': [(_clean_text(user.get('status')) or '').lower() or None for user in rows],
+    }).cast(CUSTOMERS_SCHEMA)
+
+
+def build_orders_staging(orders):
+    """Zamówienia po czyszczeniu: jeden wiersz na order_id, miesiąc zamówienia,
+    liczba pozycji i sztuk zamiast zagnieżdżonej listy items"""
+    latest = {}
+    for order in orders:
+        latest[order['order_id']] = order
+    rows = list(latest.values())
+    order_dates = pa.array([order.get('order_date') for order in rows], pa.string()).cast(pa.date32())
+    return pa.table({
+        'order_id': [order['order_id'] for order in rows],
+        'user_id': [order.get('user_id') for order in rows],
+        'order_date': order_dates,
+        'order_month': pc.strftime(order_dates, format='%Y-%m'),
+        'total_amount': pa.array([order.get('total_amount') for order in rows], pa.float64()),
+        'currency': [(_clean_text(order.get('currency')) or '').upper() or None for order in rows],
+        'status': [(_clean_text(order.get('status')) or '').lower() or None for order in rows],
+        'items_count': pa.array([len(order.get('items') or ()) for order in rows], pa.int32()),
+        'items_quantity': pa.array([sum(item.get('quantity', 0) for item in order.get('items') or ())
+                                    for order in rows], pa.int32()),
+    }).cast(ORDERS_SCHEMA)
+
+
+def _completed(orders_table):
+    return orders_table.filter(pc.equal(orders_table['status'], REVENUE_STATUS))
+
+
+def build_customer_metrics(customers_table, orders_table):
+    """Metryki klienta: wszyscy klienci ze staging (bez zamówień - zera i puste daty)"""
+    all_orders = orders_table.group_by('user_id').aggregate([
+        ('order_id', 'count'),
+        ('order_date', 'min'),
+        ('order_date', 'max'),
+    ])
+    completed = _completed(orders_table).group_by('user_id').aggregate([
+        ('order_id', 'count'),
+        ('total_amount', 'sum'),
+    ]).rename_columns(['user_id', 'completed_orders', 'total_spent'])
+
+    metrics = (customers_table
+               .join(all_orders, 'user_id', join_type='left outer')
+               .join(completed, 'user_id', join_type='left outer'))
+    orders_count = pc.fill_null(metrics['order_id_count'], 0)
+    completed_orders = pc.fill_null(metrics['completed_orders'], 0)
+    total_spent = pc.fill_null(metrics['total_spent'], 0.0)
+    avg_order_value = pc.if_else(pc.greater(completed_orders, 0),
+                                 pc.divide(total_spent, pc.cast(completed_orders, pa.float64())), 0.0)
+    return pa.table({
+        'user_id': metrics['user_id'],
+        'name': metrics['name'],
+        'country': metrics['country'],
+        'status': metrics['status'],
+        'registration_date': metrics['registration_date'],
+        'orders_count': orders_count,
+        'completed_orders': completed_orders,
+        'total_spent': total_spent,
+        'avg_order_value': avg_order_value,
+        'first_order_date': metrics['order_date_min'],
+        'last_order_date': metrics['order_date_max'],
+    })
+
+
+def build_monthly_sales(orders_table):
+    """Sprzedaż miesięczna per waluta: zamówienia, zrealizowane, klienci, przychód (completed)"""
+    all_orders = orders_table.group_by(['order_month', 'currency']).aggregate([
+        ('order_id', 'count'),
+        ('user_id', 'count_distinct'),
+    ])
+    completed = _completed(orders_table).group_by(['order_month', 'currency']).aggregate([
+        ('order_id', 'count'),
+        ('total_amount', 'sum'),
+    ]).rename_columns(['order_month', 'currency', 'completed_orders', 'revenue'])
+
+    sales = all_orders.join(completed, ['order_month', 'currency'], join_type='left outer')
+    completed_orders = pc.fill_null(sales['completed_orders'], 0)
+    revenue = pc.fill_null(sales['revenue'], 0.0)
+    return pa.table({
+        'month': sales['order_month'],
+        'currency': sales['currency'],
+        'orders_count': sales['order_id_count'],
+        'completed_orders': completed_orders,
+        'customers_count': sales['user_id_count_distinct'],
+        'revenue': revenue,
+        'avg_order_value': pc.if_else(pc.greater(completed_orders, 0),
+                                      pc.divide(revenue, pc.cast(completed_orders, pa.float64())), 0.0),
+    })
+
+
+def build_layer_tables(users, orders):
+    """Tabele staging i mart z surowych rekordów: klucz pliku -> pa.Table"""
+    customers = build_customers_cleaned(users)
+    orders_staging = build_orders_staging(orders)
+    return {
+        CUSTOMERS_KEY: customers,
+        ORDERS_KEY: orders_staging,
+        CUSTOMER_METRICS_KEY: build_customer_metrics(customers, orders_staging),
+        MONTHLY_SALES_KEY: build_monthly_sales(orders_staging),
+    }
+
+
+def build_parquet_layers(storage, raw_dataset=RAW_DATASET, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """Buduje staging i mart z surowych danych i zapisuje je jako Parquet
+
+    Returns:
+        dict: klucz pliku -> wpis manifestu (rozmiar, liczba wierszy, SHA-256)
+    """
+    tables = build_layer_tables(*load_raw_records(storage, raw_dataset))
+    return {key: write_layer_table(storage, key, table, row_group_size) for key, table in tables.items()}
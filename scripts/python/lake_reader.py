@@ -0,0 +1,391 @@
+"""
+Czytnik warstw raw/ i staging/ data lake z przycinaniem partycji po dacie
+
+Zapytanie o zakres dat nie musi otwierać wszystkich plików. Czytnik zna
+układ data lake:
+
+    raw/source1/YYYY/MM/data_YYYY-MM-DD.json   - partycja rok/miesiąc + data w nazwie pliku
+    raw/source1/YYYY/MM/orders_YYYY-MM-DD.ndjson.gz - jedna encja na plik (lake_ndjson)
+    raw/components/dt=YYYY-MM-DD/...           - partycje Hive (dt=, date=, year=/month=/day=)
+    staging/orders/orders_staging.parquet      - zakres dat z manifestu (statystyki min/max)
+
+i przycina odczyt na trzech poziomach:
+1. partycje - zakres dat wynikający ze ścieżki partycji
+2. pliki - data w nazwie pliku albo statystyki min/max z manifestu
+3. Parquet - grupy wierszy wg statystyk kolumny daty (predicate pushdown),
+   czytane są tylko wybrane kolumny (w S3 przez GET Range, bez pobierania pliku)
+
+Pliki NDJSON (.gz/.zst) są czytane strumieniowo, w stałej pamięci; przy
+podanej encji pliki innych encji w ogóle nie są otwierane.
+
+Rekordy encji users/orders dostają typy z lake_parquet.RAW_ENTITY_SCHEMAS,
+więc wszystkie batche mają ten sam schemat niezależnie od wartości w pliku
+(np. total_amount 100 w jednym pliku i 125.5 w drugim). Kolumny spoza
+schematu (i pliki bez encji, np. raw/components) mają typy wywnioskowane;
+read_table łączy je z promocją typów (int64 + float64 -> float64).
+
+Pliki są wybierane z manifestów partycji (lake_manifest) - bez listowania;
+zbiór bez manifestów jest raz listowany. To samo API działa dla lokalnego
+data-lake/ i S3:
+
+    from lake_reader import read_table, iter_batches
+
+    orders = read_table('week3/data-lake', 'raw/source1', entity='orders',
+                        start='2025-01-02', end='2025-01-31', columns=['order_id', 'total_amount'])
+    for batch in iter_batches('s3://voltappbucket', 'staging/orders', start='2025-01-01',
+                              end='2025-01-31', columns=['order_id', 'user_id']):
+        ...
+
+Użycie:
+    python lake_reader.py week3/data-lake raw/source1 --entity orders --start 2025-01-02 --end 2025-01-02
+    python lake_reader.py --self-check
+"""
+import io
+import json
+import posixpath
+import re
+from calendar import monthrange
+from datetime import date
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from lake_manifest import (file_format, is_internal_file, load_dataset_index, parse_partition, partition_key,
+                           plan_scan, verify_checksum)
+from lake_ndjson import ENTITY_DATE_COLUMNS, is_ndjson_format, iter_ndjson_records, ndjson_entity
+from lake_parquet import RAW_ENTITY_SCHEMAS
+from lake_storage import open_lake_storage
+
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+# Data w nazwie pliku: data_2025-01-01.json, orders_2025-01-01.ndjson.gz
+FILE_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def partition_date_range(values):
+    """Zakres dat partycji (od, do) z jej wartości; None - partycja bez daty"""
+    for name in ('dt', 'date'):
+        if name in values:
+            day = _as_date(values[name])
+            return day, day
+    if 'year' not in values:
+        return None
+    year = int(values['year'])
+    if 'month' not in values:
+        return date(year, 1, 1), date(year, 12, 31)
+    month = int(values['month'])
+    if 'day' not in values:
+        return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+    day = date(year, month, int(values['day']))
+    return day, day
+
+
+def file_date_range(scan_file):
+    """Zakres dat pliku: data w nazwie, a w drugiej kolejności statystyki z manifestu
+
+    Returns:
+        tuple: (od, do, kolumna daty ze statystyk albo None) lub None
+    """
+    match = FILE_DATE_PATTERN.search(scan_file['name'])
+    if match:
+        day = _as_date(match.group(1))
+        return day, day, None
+    for column, bounds in (scan_file.get('stats') or {}).items():
+        try:
+            return _as_date(bounds[0]), _as_date(bounds[1]), column
+        except ValueError:
+            continue
+    return None
+
+
+def _overlaps(date_range, start, end):
+    if date_range is None:
+        return True
+    low, high = date_range[0], date_range[1]
+    return (start is None or high >= start) and (end is None or low <= end)
+
+
+def _listed_scan(storage, dataset, partition_filter):
+    """Plan skanu z listowania - dla zbiorów zapisanych przed wprowadzeniem manifestów"""
+    prefix = dataset + '/'
+    files = []
+    for key, size in sorted(storage.list_keys(prefix).items()):
+        partition, name = posixpath.split(key[len(prefix):])
+        if is_internal_file(name):
+            continue
+        values = parse_partition(partition)
+        if partition_filter(values):
+            files.append({'name': name, 'size': size, 'rows': None, 'sha256': None, 'format': file_format(name),
+                          'key': partition_key(dataset, partition, name), 'dataset': dataset,
+                          'partition': partition, 'partition_values': values})
+    return files
+
+
+def plan_read(storage, dataset, start=None, end=None, entity=None):
+    """Pliki zbioru potrzebne dla zakresu dat [start, end] (włącznie)
+
+    Args:
+        entity (str): encja raw - pomija pliki NDJSON innych encji
+
+    Returns:
+        dict: {'files', 'partitions_total', 'partitions_read', 'files_read', 'bytes_read', 'listed'}
+    """
+    start, end = _as_date(start), _as_date(end)
+    seen_partitions = set()
+
+    def partition_filter(values):
+        seen_partitions.add(tuple(sorted(values.items())))
+        return _overlaps(partition_date_range(values), start, end)
+
+    index = load_dataset_index(storage, dataset)
+    if index is not None:
+        files = plan_scan(storage, dataset, partition_filter)
+        partitions_total = len(index)
+    else:
+        files = _listed_scan(storage, dataset, partition_filter)
+        partitions_total = len(seen_partitions)
+
+    selected = []
+    for scan_file in files:
+        if entity is not None and is_ndjson_format(scan_file['format']) and ndjson_entity(scan_file['name']) != entity:
+            continue
+        date_range = file_date_range(scan_file)
+        if _overlaps(date_range, start, end):
+            scan_file['date_column'] = date_range[2] if date_range else None
+            selected.append(scan_file)
+    return {
+        'files': selected,
+        'partitions_total': partitions_total,
+        'partitions_read': len({scan_file['partition'] for scan_file in selected}),
+        'files_read': len(selected),
+        'bytes_read': sum(scan_file['size'] for scan_file in selected),
+        'listed': index is None,
+    }
+
+
+def _row_group_in_range(metadata, row_group, column_index, start, end):
+    """Czy grupa wierszy może zawierać daty z zakresu (statystyki min/max kolumny)"""
+    statistics = metadata.row_group(row_group).column(column_index).statistics
+    if statistics is None or not statistics.has_min_max:
+        return True
+    return _overlaps((_as_date(statistics.min), _as_date(statistics.max)), start, end)
+
+
+def _filter_batch(batch, date_column, start, end):
+    """Wiersze batcha z datą w zakresie (kolumna date32 albo tekst ISO)"""
+    if date_column is None or (start is None and end is None) or date_column not in batch.schema.names:
+        return batch
+    values = batch.column(date_column)
+    if not pa.types.is_date(values.type):
+        values = pc.cast(pc.utf8_slice_codeunits(values, 0, 10), pa.date32())
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(values, pa.scalar(start, pa.date32()))
+    if end is not None:
+        upper = pc.less_equal(values, pa.scalar(end, pa.date32()))
+        mask = upper if mask is None else pc.and_(mask, upper)
+    return batch.filter(pc.fill_null(mask, False))
+
+
+def _parquet_batches(storage, scan_file, columns, start, end, batch_size):
+    date_column = scan_file.get('date_column')
+    with storage.open_input(scan_file['key'], scan_file['size']) as source:
+        parquet_file = pq.ParquetFile(source)
+        row_groups = list(range(parquet_file.num_row_groups))
+        names = parquet_file.schema_arrow.names
+        if date_column in names and (start or end):
+            column_index = names.index(date_column)
+            row_groups = [group for group in row_groups
+                          if _row_group_in_range(parquet_file.metadata, group, column_index, start, end)]
+        if not row_groups:
+            return
+        read_columns = None
+        if columns is not None:
+            # Kolumna daty jest potrzebna do filtrowania wierszy, potem jest usuwana
+            read_columns = list(columns) + ([date_column] if date_column in names and date_column not in columns else [])
+        for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups, columns=read_columns):
+            batch = _filter_batch(batch, date_column, start, end)
+            if columns is not None:
+                batch = batch.select(list(columns))
+            if batch.num_rows:
+                yield batch
+
+
+def _json_records(storage, scan_file, entity):
+    document = json.loads(verify_checksum(scan_file, storage.read_bytes(scan_file['key'])))
+    if isinstance(document, list):
+        return document
+    if entity is None:
+        raise ValueError(f"{scan_file['key']} zawiera kilka encji - podaj entity (np. 'orders')")
+    return document.get(entity, [])
+
+
+def _record_batches(records, columns, batch_size, schema=None):
+    """Batche z iterowalnych rekordów (lista albo strumień) po batch_size rekordów
+
+    Bez listy kolumn batch ma sumę kluczy wszystkich rekordów (from_pylist
+    bierze kolumny tylko z pierwszego rekordu) - przy podanym schemacie
+    zawsze wszystkie jego kolumny, z typami ze schematu.
+    """
+    declared = schema.names if schema is not None else []
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            return
+        names = columns if columns is not None else list(dict.fromkeys(
+            declared + [key for record in chunk for key in record]))
+        arrays = {}
+        for name in names:
+            values = [record.get(name) for record in chunk]
+            arrays[name] = pa.array(values, schema.field(name).type) if name in declared else values
+        yield pa.RecordBatch.from_pydict(arrays)
+
+
+def _record_file_batches(storage, scan_file, entity, columns, start, end, batch_size):
+    """JSON / CSV - plik jest parsowany w całości; NDJSON - strumieniowo.
+    Kolumny są wybierane przed budową batchy."""
+    fmt = scan_file['format']
+    if is_ndjson_format(fmt):
+        file_entity = ndjson_entity(scan_file['name'])
+        if entity is not None and file_entity != entity:
+            return
+        entity = file_entity
+    date_column = scan_file.get('date_column') or ENTITY_DATE_COLUMNS.get(entity)
+    read_columns = None
+    if columns is not None:
+        read_columns = list(columns) + ([date_column] if date_column and date_column not in columns else [])
+
+    if fmt == 'csv':
+        from pyarrow import csv
+
+        table = csv.read_csv(io.BytesIO(verify_checksum(scan_file, storage.read_bytes(scan_file['key']))))
+        batches = table.to_batches(max_chunksize=batch_size)
+    elif fmt == 'json':
+        batches = _record_batches(_json_records(storage, scan_file, entity), read_columns, batch_size,
+                                  RAW_ENTITY_SCHEMAS.get(entity))
+    elif is_ndjson_format(fmt):
+        batches = _record_batches(iter_ndjson_records(storage, scan_file), read_columns, batch_size,
+                                  RAW_ENTITY_SCHEMAS.get(entity))
+    else:
+        raise ValueError(f"Nieobsługiwany format pliku {scan_file['key']}: {fmt}")
+
+    for batch in batches:
+        batch = _filter_batch(batch, date_column, start, end)
+        if columns is not None:
+            batch = batch.select(list(columns))
+        if batch.num_rows:
+            yield batch
+
+
+def iter_batches(location, dataset, start=None, end=None, columns=None, entity=None, batch_size=DEFAULT_BATCH_SIZE,
+                 plan=None):
+    """Iterator RecordBatch z plików zbioru w zakresie dat (przycinanie partycji, plików i grup wierszy)
+
+    Args:
+        location: ścieżka data lake, URI s3://bucket[/prefiks] albo obiekt storage
+        dataset (str): np. 'raw/source1', 'raw/components', 'staging/orders'
+        start, end: zakres dat włącznie (date lub 'YYYY-MM-DD'); None - bez ograniczenia
+        columns (list): kolumny wyniku (None - wszystkie)
+        entity (str): encja dokumentów raw ('users', 'orders')
+        plan (dict): gotowy wynik plan_read() (żeby nie planować drugi raz)
+    """
+    storage = open_lake_storage(location)
+    start, end = _as_date(start), _as_date(end)
+    if plan is None:
+        plan = plan_read(storage, dataset, start, end, entity)
+    for scan_file in plan['files']:
+        if scan_file['format'] == 'parquet':
+            yield from _parquet_batches(storage, scan_file, columns, start, end, batch_size)
+        else:
+            yield from _record_file_batches(storage, scan_file, entity, columns, start, end, batch_size)
+
+
+def read_table(location, dataset, start=None, end=None, columns=None, entity=None, batch_size=DEFAULT_BATCH_SIZE,
+               plan=None):
+    """Tabela Arrow z plików zbioru w zakresie dat (argumenty jak iter_batches)"""
+    batches = list(iter_batches(location, dataset, start, end, columns, entity, batch_size, plan))
+    if not batches:
+        return pa.table({column: pa.array([], pa.null()) for column in columns or ()})
+    # 'permissive' - kolumny spoza schematów encji mogą mieć różne typy liczbowe w różnych plikach
+    return pa.concat_tables([pa.Table.from_batches([batch]) for batch in batches], promote_options='permissive')
+
+
+def check_mixed_numeric_types():
+    """Sprawdzenie na tymczasowym data lake: total_amount całkowite w jednym pliku
+    i ułamkowe w drugim (JSON i NDJSON) dają jedną kolumnę float64"""
+    import tempfile
+
+    from lake_manifest import write_partition_file
+    from lake_ndjson import write_ndjson_file
+
+    def order(order_id, day, amount):
+        return {'order_id': order_id, 'user_id': 'user_001', 'order_date': day, 'total_amount': amount,
+                'currency': 'PLN', 'status': 'completed', 'items': [{'product_id': 'p1', 'quantity': 1,
+                                                                     'price': amount}]}
+
+    with tempfile.TemporaryDirectory() as base_path:
+        storage = open_lake_storage(base_path)
+        documents = {'2025-01-01': [order('o1', '2025-01-01', 100)], '2025-01-02': [order('o2', '2025-01-02', 125.5)]}
+        for day, orders in documents.items():
+            write_partition_file(storage, 'raw/source1', '2025/01', f'data_{day}.json',
+                                 json.dumps({'users': [], 'orders': orders}), rows=len(orders))
+        write_ndjson_file(storage, 'raw/source1', '2025/01', 'orders_2025-01-03.ndjson.gz',
+                          [order('o3', '2025-01-03', 7), {'order_id': 'o4', 'order_date': '2025-01-03', 'extra': 1}],
+                          'order_date')
+        write_partition_file(storage, 'raw/components', '', 'a.json', json.dumps([{'id': 1, 'price': 10}]), rows=1)
+        write_partition_file(storage, 'raw/components', '', 'b.json', json.dumps([{'id': 2, 'price': 12.5}]), rows=1)
+
+        for columns in (None, ['order_id', 'total_amount']):
+            table = read_table(storage, 'raw/source1', entity='orders', columns=columns)
+            assert table.schema.field('total_amount').type == pa.float64(), table.schema
+            assert table['total_amount'].to_pylist() == [100.0, 125.5, 7.0, None], table
+        declared = RAW_ENTITY_SCHEMAS['orders']
+        for batch in iter_batches(storage, 'raw/source1', entity='orders'):
+            assert all(batch.schema.field(field.name).type == field.type for field in declared), batch.schema
+        assert read_table(storage, 'raw/components')['price'].to_pylist() == [10.0, 12.5]
+    print("[SUCCESS] total_amount 100 / 125.5 / 7 (JSON + NDJSON) -> float64, raw/components int + float -> float64")
+
+
+def main():
+    """Odczyt zakresu dat z data lake (podgląd planu i wyniku)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Czytnik data lake z przycinaniem partycji')
+    parser.add_argument('location', nargs='?',
+                        help='Katalog data lake (np. week3/data-lake) albo s3://bucket[/prefiks]')
+    parser.add_argument('dataset', nargs='?', help='Zbiór, np. raw/source1, staging/orders')
+    parser.add_argument('--start', help='Początek zakresu dat (YYYY-MM-DD, włącznie)')
+    parser.add_argument('--end', help='Koniec zakresu dat (YYYY-MM-DD, włącznie)')
+    parser.add_argument('--columns', help='Kolumny oddzielone przecinkami')
+    parser.add_argument('--entity', help='Encja dokumentów raw (users, orders)')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Sprawdź łączenie plików z różnymi typami liczbowymi na tymczasowym data lake')
+    args = parser.parse_args()
+
+    if args.self_check:
+        check_mixed_numeric_types()
+        return
+    if not args.location or not args.dataset:
+        parser.error('podaj lokalizację i zbiór (albo --self-check)')
+
+    storage = open_lake_storage(args.location)
+    plan = plan_read(storage, args.dataset, args.start, args.end, args.entity)
+    print(f"Plan: partycje {plan['partitions_read']}/{plan['partitions_total']}, pliki {plan['files_read']}, "
+          f"{plan['bytes_read']} B" + (" (bez manifestu - listowanie)" if plan['listed'] else ""))
+    columns = args.columns.split(',') if args.columns else None
+    table = read_table(storage, args.dataset, args.start, args.end, columns, args.entity, plan=plan)
+    print(f"Wiersze: {table.num_rows}, kolumny: {table.column_names}")
+    print(table.slice(0, 10).to_pandas().to_string() if table.num_rows else "(brak wierszy)")
+
+
+if __name__ == "__main__":
+    main()
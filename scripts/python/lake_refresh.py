@@ -0,0 +1,357 @@
+"""
+Przyrostowe odświeżanie warstw staging i mart (watermark przetworzonych plików raw)
+
+Pełna przebudowa (lake_parquet.build_parquet_layers) czyta przy każdym
+uruchomieniu całą historię raw/source1. refresh_parquet_layers czyta tylko
+pliki raw nowe albo zmienione od poprzedniego przebiegu:
+
+1. watermark mart/_watermark.json - przetworzone pliki raw (nazwa -> SHA-256)
+   per partycja, razem z updated_at partycji z indeksu _partitions.json;
+   manifest partycji jest wczytywany tylko, gdy updated_at się zmienił
+2. nowe rekordy zastępują wiersze staging o tym samym user_id / order_id
+3. monthly_sales - przeliczane są tylko miesiące nowych i zastąpionych
+   zamówień; customer_metrics - tylko wiersze ich klientów
+4. zapisywane są tylko zmienione pliki (atomowo + wpis w manifeście),
+   watermark na końcu - przerwany przebieg powtórzy się przy następnym
+
+Usunięty plik/partycja raw, brak watermarku albo brak plików staging/mart
+wymusza pełną przebudowę. Tak samo plik raw nadpisany po przetworzeniu
+(rekordów usuniętych z pliku nie da się wycofać przyrostowo).
+
+Przy powtórzonym user_id / order_id pełna przebudowa bierze rekord z pliku
+ostatniego w kolejności (partycja, nazwa). Przyrostowo jest to zachowane, gdy
+nowe pliki sortują się za najnowszym przetworzonym plikiem tej samej encji
+(dopisywanie kolejnych dni); spóźniony plik z wcześniejszą datą wymusza
+pełną przebudowę - inaczej wygrałby rekord przetworzony jako ostatni, a nie
+ten z najpóźniejszego pliku.
+
+Użycie:
+    python lake_refresh.py week3/data-lake
+    python lake_refresh.py s3://voltappbucket --full
+    python lake_refresh.py --self-check
+"""
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from lake_manifest import dataset_index_key, file_format, load_dataset_index, load_partition_manifest, partition_key
+from lake_parquet import (CUSTOMER_METRICS_KEY, CUSTOMERS_KEY, MONTHLY_SALES_KEY, ORDERS_KEY, PARQUET_ROW_GROUP_SIZE,
+                          RAW_DATASET, TABLE_LAYOUTS, build_customer_metrics, build_customers_cleaned,
+                          build_layer_tables, build_monthly_sales, build_orders_staging, read_raw_files,
+                          write_layer_table)
+from lake_ndjson import is_ndjson_format, ndjson_entity
+from lake_storage import open_lake_storage
+
+WATERMARK_KEY = 'mart/_watermark.json'
+WATERMARK_VERSION = 1
+
+
+def load_watermark(storage):
+    """Watermark ostatniego odświeżenia (None, jeśli jeszcze nie było)"""
+    try:
+        return json.loads(storage.read_bytes(WATERMARK_KEY))
+    except FileNotFoundError:
+        return None
+
+
+def save_watermark(storage, raw_dataset, partitions):
+    body = json.dumps({
+        'version': WATERMARK_VERSION,
+        'raw_dataset': raw_dataset,
+        'updated_at': datetime.now().isoformat(),
+        'partitions': partitions,
+    }, indent=2, sort_keys=True).encode('utf-8')
+    storage.write_bytes(WATERMARK_KEY, body, content_type='application/json')
+
+
+def _file_entities(name):
+    """Encje rekordów pliku raw: plik NDJSON - jedna, dokument dzienny JSON - obie"""
+    if is_ndjson_format(file_format(name)):
+        return {ndjson_entity(name)}
+    return {'users', 'orders'}
+
+
+def _latest_files(partitions):
+    """Najpóźniejszy plik (partycja, nazwa) każdej encji w stanie watermarku"""
+    latest = {}
+    for partition, state in partitions.items():
+        for name in state['files']:
+            for entity in _file_entities(name):
+                latest[entity] = max(latest.get(entity, (partition, name)), (partition, name))
+    return latest
+
+
+def plan_refresh(storage, raw_dataset=RAW_DATASET, watermark=None):
+    """Pliki raw nowe lub zmienione od watermarku (None - wszystkie pliki)
+
+    Returns:
+        dict: {'files': wpisy plików do odczytu (jak plan_scan), 'removed': klucze plików
+               usuniętych od watermarku, 'rewritten': klucze przetworzonych plików zmienionych
+               od watermarku, 'out_of_order': klucze nowych plików sortujących się przed
+               najnowszym przetworzonym plikiem tej samej encji, 'partitions': nowy stan
+               watermarku, 'partitions_total', 'partitions_checked'}
+    """
+    index = load_dataset_index(storage, raw_dataset)
+    if index is None:
+        raise FileNotFoundError(
+            f"Brak indeksu partycji {storage.uri(dataset_index_key(raw_dataset))} - "
+            f"uruchom: python lake_manifest.py <lokalizacja> {raw_dataset} --rebuild")
+    seen = watermark['partitions'] if watermark and watermark.get('raw_dataset') == raw_dataset else {}
+
+    files, removed, rewritten, partitions, checked = [], [], [], {}, 0
+    for partition in sorted(index):
+        summary = index[partition]
+        previous = seen.get(partition)
+        if previous is not None and previous['updated_at'] == summary['updated_at']:
+            partitions[partition] = previous
+            continue
+
+        checked += 1
+        manifest = load_partition_manifest(storage, raw_dataset, partition)
+        known = previous['files'] if previous else {}
+        for name in sorted(manifest['files']):
+            entry = manifest['files'][name]
+            if known.get(name) != entry['sha256']:
+                files.append(dict(entry, key=partition_key(raw_dataset, partition, name), dataset=raw_dataset,
+                                  partition=partition, partition_values=summary['values']))
+                if name in known:
+                    rewritten.append(files[-1]['key'])
+        removed.extend(partition_key(raw_dataset, partition, name) for name in known if name not in manifest['files'])
+        partitions[partition] = {
+            'updated_at': summary['updated_at'],
+            'files': {name: entry['sha256'] for name, entry in manifest['files'].items()},
+        }
+
+    for partition, previous in seen.items():
+        if partition not in index:
+            removed.extend(partition_key(raw_dataset, partition, name) for name in previous['files'])
+
+    latest = _latest_files(seen)
+    out_of_order = [scan_file['key'] for scan_file in files if scan_file['key'] not in rewritten
+                    and any((scan_file['partition'], scan_file['name']) < latest[entity]
+                            for entity in _file_entities(scan_file['name']) if entity in latest)]
+
+    return {
+        'files': files,
+        'removed': removed,
+        'rewritten': rewritten,
+        'out_of_order': out_of_order,
+        'partitions': partitions,
+        'partitions_total': len(index),
+        'partitions_checked': checked,
+    }
+
+
+def _read_layer_table(storage, key):
+    """Istniejący plik staging/mart (None, jeśli go nie ma)"""
+    try:
+        with storage.open_input(key) as f:
+            return pq.read_table(f).cast(TABLE_LAYOUTS[key][0])
+    except FileNotFoundError:
+        return None
+
+
+def _value_set(table, column, values):
+    return pa.array(sorted(values), table.schema.field(column).type)
+
+
+def _rows_in(table, column, values):
+    return table.filter(pc.is_in(table[column], value_set=_value_set(table, column, values)))
+
+
+def _replace_rows(table, updates, column, values):
+    """Wiersze `table` z kluczem spoza `values` + wiersze `updates`"""
+    kept = table.filter(pc.invert(pc.is_in(table[column], value_set=_value_set(table, column, values))))
+    return pa.concat_tables([kept, updates.select(table.schema.names).cast(table.schema)])
+
+
+def _non_null(values):
+    return {value for value in values if value is not None}
+
+
+def apply_raw_changes(tables, users, orders):
+    """Nakłada nowe/zmienione rekordy raw na tabele staging i przelicza dotknięte wiersze mart
+
+    Args:
+        tables (dict): bieżące tabele: klucz pliku -> pa.Table (wszystkie cztery z TABLE_LAYOUTS)
+
+    Returns:
+        tuple: (zmienione tabele: klucz -> pa.Table, przeliczone miesiące, przeliczeni klienci)
+    """
+    new_customers = build_customers_cleaned(users)
+    new_orders = build_orders_staging(orders)
+    order_ids = _non_null(new_orders['order_id'].to_pylist())
+    replaced_orders = _rows_in(tables[ORDERS_KEY], 'order_id', order_ids)
+
+    months = _non_null(new_orders['order_month'].to_pylist() + replaced_orders['order_month'].to_pylist())
+    user_ids = _non_null(new_customers['user_id'].to_pylist() + new_orders['user_id'].to_pylist()
+                         + replaced_orders['user_id'].to_pylist())
+
+    customers = _replace_rows(tables[CUSTOMERS_KEY], new_customers, 'user_id',
+                              _non_null(new_customers['user_id'].to_pylist()))
+    orders_staging = _replace_rows(tables[ORDERS_KEY], new_orders, 'order_id', order_ids)
+
+    changed = {}
+    if new_customers.num_rows:
+        changed[CUSTOMERS_KEY] = customers
+    if new_orders.num_rows:
+        changed[ORDERS_KEY] = orders_staging
+    if months:
+        sales = build_monthly_sales(_rows_in(orders_staging, 'order_month', months))
+        changed[MONTHLY_SALES_KEY] = _replace_rows(tables[MONTHLY_SALES_KEY], sales, 'month', months)
+    if user_ids:
+        metrics = build_customer_metrics(_rows_in(customers, 'user_id', user_ids),
+                                         _rows_in(orders_staging, 'user_id', user_ids))
+        changed[CUSTOMER_METRICS_KEY] = _replace_rows(tables[CUSTOMER_METRICS_KEY], metrics, 'user_id', user_ids)
+    return changed, months, user_ids
+
+
+def refresh_parquet_layers(storage, raw_dataset=RAW_DATASET, full=False, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """Odświeża staging i mart - przyrostowo od watermarku albo pełną przebudową
+
+    Args:
+        storage: LocalLakeStorage / S3LakeStorage albo lokalizacja (ścieżka, s3://bucket[/prefiks])
+        full (bool): pełna przebudowa z całej historii raw
+
+    Returns:
+        dict: {'mode': 'full' | 'incremental', 'files_read', 'bytes_read', 'partitions_total',
+               'partitions_checked', 'months', 'customers', 'written': {klucz: wpis manifestu}}
+    """
+    storage = open_lake_storage(storage)
+    watermark = None if full else load_watermark(storage)
+    plan = plan_refresh(storage, raw_dataset, watermark)
+
+    tables = None
+    if watermark is not None and not (plan['removed'] or plan['rewritten'] or plan['out_of_order']):
+        tables = {key: _read_layer_table(storage, key) for key in TABLE_LAYOUTS}
+        if any(table is None for table in tables.values()):
+            tables = None
+    if tables is None and watermark is not None:
+        # Pełna przebudowa po odświeżeniu przyrostowym - potrzebne wszystkie pliki raw
+        plan = plan_refresh(storage, raw_dataset)
+
+    users, orders = read_raw_files(storage, plan['files'])
+    if tables is None:
+        mode = 'full'
+        changed = build_layer_tables(users, orders)
+        months = _non_null(changed[ORDERS_KEY]['order_month'].to_pylist())
+        user_ids = _non_null(changed[CUSTOMERS_KEY]['user_id'].to_pylist())
+    else:
+        mode = 'incremental'
+        changed, months, user_ids = apply_raw_changes(tables, users, orders)
+
+    written = {key: write_layer_table(storage, key, table, row_group_size) for key, table in changed.items()}
+    if mode == 'full' or plan['partitions_checked']:
+        save_watermark(storage, raw_dataset, plan['partitions'])
+
+    return {
+        'mode': mode,
+        'files_read': len(plan['files']),
+        'bytes_read': sum(scan_file['size'] for scan_file in plan['files']),
+        'partitions_total': plan['partitions_total'],
+        'partitions_checked': plan['partitions_checked'],
+        'months': sorted(months),
+        'customers': len(user_ids),
+        'written': written,
+    }
+
+
+def _layer_rows(table, schema, sort_by):
+    """Wiersze tabeli do porównania (kolejność wg sortowania, liczby zaokrąglone)"""
+    table = table.select(schema.names).cast(schema).sort_by([(column, 'ascending') for column in sort_by])
+    return [{name: round(value, 6) if isinstance(value, float) else value for name, value in row.items()}
+            for row in table.to_pylist()]
+
+
+def check_incremental_matches_full(runs=30, files_per_run=12):
+    """Sprawdzenie na tymczasowym data lake: po serii odświeżeń przyrostowych
+    (pliki dopisywane w losowej kolejności, nadpisywane, z powtórzonymi
+    user_id / order_id) staging i mart są takie same jak po pełnej przebudowie"""
+    import random
+    import tempfile
+    from datetime import date, timedelta
+
+    from lake_manifest import write_partition_file
+    from lake_ndjson import write_ndjson_file
+    from lake_parquet import load_raw_records
+
+    modes = {'full': 0, 'incremental': 0}
+    for run in range(runs):
+        rng = random.Random(run)
+
+        def users():
+            return [{'user_id': f'user_{rng.randrange(8):03d}', 'name': f' Klient {rng.randrange(100)} ',
+                     'email': 'KLIENT@EXAMPLE.COM', 'registration_date': '2024-12-01', 'country': 'Poland',
+                     'status': rng.choice(['active', 'Inactive'])} for _ in range(3)]
+
+        def orders(day):
+            return [{'order_id': f'order_{rng.randrange(15):03d}', 'user_id': f'user_{rng.randrange(8):03d}',
+                     'order_date': (day + timedelta(days=rng.randrange(3))).isoformat(),
+                     'total_amount': rng.choice([100, 125.5, rng.randrange(1, 500) / 4]),
+                     'currency': rng.choice(['PLN', 'EUR']), 'status': rng.choice(['completed', 'pending']),
+                     'items': [{'product_id': 'p1', 'quantity': rng.randrange(1, 4), 'price': 10.0}]}
+                    for _ in range(4)]
+
+        with tempfile.TemporaryDirectory() as base_path:
+            storage = open_lake_storage(base_path)
+            for _ in range(files_per_run):
+                day = date(2025, 1, 1) + timedelta(days=rng.randrange(45))
+                partition = f"{day:%Y/%m}"
+                kind = rng.choice(['json', 'users', 'orders'])
+                if kind == 'json':
+                    write_partition_file(storage, RAW_DATASET, partition, f'data_{day}.json',
+                                         json.dumps({'users': users(), 'orders': orders(day)}), rows=4)
+                else:
+                    write_ndjson_file(storage, RAW_DATASET, partition, f'{kind}_{day}.ndjson.gz',
+                                      users() if kind == 'users' else orders(day))
+                modes[refresh_parquet_layers(storage)['mode']] += 1
+
+                expected = build_layer_tables(*load_raw_records(storage, RAW_DATASET))
+                for key, (schema, _, sort_by) in TABLE_LAYOUTS.items():
+                    actual = _read_layer_table(storage, key)
+                    assert _layer_rows(actual, schema, sort_by) == _layer_rows(expected[key], schema, sort_by), \
+                        f"przebieg {run}: {key} różni się od pełnej przebudowy"
+    assert modes['incremental'], modes
+    print(f"[SUCCESS] {runs} przebiegów x {files_per_run} plików: przyrostowo = pełna przebudowa "
+          f"(odświeżenia przyrostowe {modes['incremental']}, pełne {modes['full']})")
+
+
+def main():
+    """Odświeżenie warstw staging i mart data lake"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Przyrostowe odświeżanie staging/mart data lake')
+    parser.add_argument('location', nargs='?',
+                        help='Katalog data lake (np. week3/data-lake) albo s3://bucket[/prefiks]')
+    parser.add_argument('--raw-dataset', default=RAW_DATASET, help=f'Zbiór raw (domyślnie {RAW_DATASET})')
+    parser.add_argument('--full', action='store_true', help='Pełna przebudowa z całej historii raw')
+    parser.add_argument('--row-group-size', type=int, default=PARQUET_ROW_GROUP_SIZE,
+                        help=f'Liczba wierszy w grupie wierszy Parquet (domyślnie {PARQUET_ROW_GROUP_SIZE})')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Porównaj odświeżanie przyrostowe z pełną przebudową na tymczasowym data lake')
+    args = parser.parse_args()
+
+    if args.self_check:
+        check_incremental_matches_full()
+        return
+    if not args.location:
+        parser.error('podaj lokalizację data lake (albo --self-check)')
+
+    storage = open_lake_storage(args.location)
+    result = refresh_parquet_layers(storage, args.raw_dataset, args.full, args.row_group_size)
+    print(f"Tryb: {result['mode']}, partycje sprawdzone {result['partitions_checked']}/{result['partitions_total']}, "
+          f"pliki raw {result['files_read']} ({result['bytes_read']} B)")
+    print(f"Miesiące: {', '.join(result['months']) or '-'}, klienci: {result['customers']}")
+    for key, entry in result['written'].items():
+        print(f"  {storage.uri(key)}  {entry['rows']} wierszy, {entry['size']} B")
+    if not result['written']:
+        print("[SUCCESS] Brak zmian w raw - staging i mart aktualne")
+    else:
+        print(f"[SUCCESS] Zapisano {len(result['written'])} plików")
+
+
+if __name__ == "__main__":
+    main()
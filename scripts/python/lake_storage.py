@@ -0,0 +1,325 @@
+"""
+Dostęp do plików data lake - lokalny katalog data-lake/ albo bucket S3
+
+Warstwy raw/staging/mart są zapisywane zarówno lokalnie (week3/data-lake/),
+jak i w S3. LocalLakeStorage i S3LakeStorage mają to samo API opartego na
+kluczach ('raw/source1/2025/01/data_2025-01-01.json'), więc manifesty
+partycji i czytniki działają tak samo na obu:
+
+    from lake_storage import open_lake_storage
+
+    storage = open_lake_storage('week3/data-lake')          # lokalnie
+    storage = open_lake_storage('s3://voltappbucket')       # S3 (opcjonalnie s3://bucket/prefiks)
+    storage.write_bytes('raw/source1/2025/01/data.json', b'...')
+
+Zapis jest atomowy w obu przypadkach: lokalnie plik tymczasowy + os.replace,
+w S3 pojedynczy put_object (obiekt pojawia się w całości albo wcale).
+
+Pliki współdzielone przez wielu piszących (manifesty) zapisuje się warunkowo:
+read_versioned() zwraca treść z tokenem wersji, a write_bytes_if() zapisuje
+tylko, jeśli obiekt wciąż ma tę wersję (S3: If-Match / If-None-Match na ETag,
+lokalnie: porównanie pod plikiem blokady) - inaczej WriteConflict.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+S3_URI_PREFIX = 's3://'
+# Bufor odczytu zakresami (Parquet czyta stopkę i wybrane kolumny małymi kawałkami)
+S3_RANGE_BUFFER_SIZE = int(os.getenv('LAKE_S3_RANGE_BUFFER_KB', '64')) * 1024
+# Maksymalny czas oczekiwania na blokadę lokalnego zapisu warunkowego (sekundy)
+LOCAL_LOCK_TIMEOUT = float(os.getenv('LAKE_LOCAL_LOCK_TIMEOUT', '30'))
+
+
+class WriteConflict(Exception):
+    """Zapis warunkowy odrzucony - obiekt zmienił się od odczytu (S3: 412 Precondition Failed)"""
+
+
+class LocalLakeStorage:
+    """Data lake w lokalnym katalogu"""
+
+    def __init__(self, base_path):
+        self.base_path = Path(base_path)
+
+    def __repr__(self):
+        return f"LocalLakeStorage({str(self.base_path)!r})"
+
+    def uri(self, key):
+        """Pełna ścieżka pliku (do komunikatów)"""
+        return str(self.base_path / key)
+
+    def path(self, key):
+        return self.base_path / key
+
+    def exists(self, key):
+        return self.path(key).is_file()
+
+    def read_bytes(self, key):
+        return self.path(key).read_bytes()
+
+    def open_read(self, key):
+        """Plik binarny do strumieniowego odczytu"""
+        return open(self.path(key), 'rb')
+
+    def open_input(self, key, size=None):
+        """Plik z dostępem swobodnym (seek) - np. dla pyarrow.parquet.ParquetFile"""
+        return open(self.path(key), 'rb')
+
+    def write_bytes(self, key, data, content_type=None):
+        """Zapis atomowy - plik tymczasowy w tym samym katalogu + os.replace"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def read_versioned(self, key):
+        """Treść pliku i token wersji (SHA-256 treści) dla write_bytes_if"""
+        data = self.read_bytes(key)
+        return data, hashlib.sha256(data).hexdigest()
+
+    def write_bytes_if(self, key, data, token, content_type=None):
+        """Zapis tylko, gdy plik ma wersję `token` (None - plik nie może istnieć); inaczej WriteConflict"""
+        with self._lock(key):
+            try:
+                current = self.read_versioned(key)[1]
+            except FileNotFoundError:
+                current = None
+            if current != token:
+                raise WriteConflict(self.uri(key))
+            self.write_bytes(key, data, content_type)
+
+    @contextmanager
+    def _lock(self, key):
+        """Plik blokady obok pliku (O_EXCL - działa też na Windows)"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = path.parent / f".{path.name}.lock"
+        deadline = time.monotonic() + LOCAL_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Blokada {lock_path} trzymana dłużej niż {LOCAL_LOCK_TIMEOUT} s "
+                                       f"(po awarii usuń plik ręcznie)")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.unlink(lock_path)
+
+    def write_file(self, key, source_path, content_type=None):
+        """Kopiuje gotowy plik pod klucz (atomowo)"""
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def list_keys(self, prefix=''):
+        """Wszystkie pliki pod prefiksem: klucz -> rozmiar (pomija pliki tymczasowe i blokady)"""
+        root = self.path(prefix)
+        if root.is_file():
+            return {prefix: root.stat().st_size}
+        keys = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.startswith('.') and filename.endswith(('.tmp', '.lock')):
+                    continue
+                full_path = Path(dirpath) / filename
+                keys[full_path.relative_to(self.base_path).as_posix()] = full_path.stat().st_size
+        return keys
+
+    def delete(self, keys):
+        for key in keys:
+            try:
+                self.path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class S3LakeStorage:
+    """Data lake w buckecie S3 (opcjonalnie pod wspólnym prefiksem)"""
+
+    def __init__(self, bucket, prefix='', s3=None):
+        """
+        Args:
+            bucket (str): nazwa bucketu
+            prefix (str): prefiks wszystkich kluczy (np. 'lake/'), domyślnie korzeń bucketu
+            s3: klient boto3 S3 (domyślnie boto3.client('s3'))
+        """
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self._s3 = s3
+
+    def __repr__(self):
+        return f"S3LakeStorage('s3://{self.bucket}/{self.prefix}')"
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            import boto3
+            self._s3 = boto3.client('s3')
+        return self._s3
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def read_bytes(self, key):
+        """Zawartość obiektu; brak obiektu -> FileNotFoundError (jak lokalnie)"""
+        return self.open_read(key).read()
+
+    def open_read(self, key):
+        """Strumień treści obiektu (StreamingBody - odczyt w kawałkach bez ładowania całości)"""
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        except self.s3.exceptions.NoSuchKey:
+            raise FileNotFoundError(self.uri(key))
+
+    def open_input(self, key, size=None):
+        """Obiekt z dostępem swobodnym czytany zakresami (GET Range) - Parquet pobiera
+        tylko stopkę i potrzebne kolumny/grupy wierszy, a nie cały plik
+
+        Args:
+            size (int): rozmiar obiektu (np. z manifestu) - bez dodatkowego HEAD
+        """
+        if size is None:
+            from botocore.exceptions import ClientError
+
+            try:
+                size = self.s3.head_object(Bucket=self.bucket, Key=self._key(key))['ContentLength']
+            except ClientError as e:
+                if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                    raise FileNotFoundError(self.uri(key))
+                raise
+        return io.BufferedReader(_S3RangeReader(self.s3, self.bucket, self._key(key), size),
+                                 buffer_size=S3_RANGE_BUFFER_SIZE)
+
+    def write_bytes(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+
+    def read_versioned(self, key):
+        """Treść obiektu i jego ETag (token wersji dla write_bytes_if)"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3.exceptions.NoSuchKey:
+            raise FileNotFoundError(self.uri(key))
+        return response['Body'].read(), response['ETag']
+
+    def write_bytes_if(self, key, data, token, content_type=None):
+        """put_object z If-Match: ETag (token None - If-None-Match: *); 412/409 -> WriteConflict"""
+        from botocore.exceptions import ClientError
+
+        condition = {'IfMatch': token} if token else {'IfNoneMatch': '*'}
+        extra = {'ContentType': content_type} if content_type else {}
+        try:
+            self.s3.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **condition, **extra)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise WriteConflict(self.uri(key))
+            raise
+
+    def write_file(self, key, source_path, content_type=None):
+        """Upload pliku z dysku (upload_file - multipart dla dużych plików)"""
+        extra = {'ExtraArgs': {'ContentType': content_type}} if content_type else {}
+        self.s3.upload_file(str(source_path), self.bucket, self._key(key), **extra)
+
+    def list_keys(self, prefix=''):
+        """Wszystkie obiekty pod prefiksem: klucz -> rozmiar (list_objects_v2 ze stronicowaniem)"""
+        keys = {}
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get('Contents', ()):
+                keys[obj['Key'][len(self.prefix):]] = obj['Size']
+        return keys
+
+    def delete(self, keys):
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': self._key(key)} for key in keys[start:start + 1000]], 'Quiet': True}
+            )
+
+
+class _S3RangeReader(io.RawIOBase):
+    """Surowy plik tylko do odczytu nad obiektem S3 - każdy read() to GET z nagłówkiem Range"""
+
+    def __init__(self, s3, bucket, key, size):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        response = self.s3.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end - 1}")
+        data = response['Body'].read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def open_lake_storage(location, s3=None):
+    """Storage dla ścieżki lokalnej albo URI s3://bucket[/prefiks]"""
+    if isinstance(location, (LocalLakeStorage, S3LakeStorage)):
+        return location
+    location = str(location)
+    if location.startswith(S3_URI_PREFIX):
+        bucket, _, prefix = location[len(S3_URI_PREFIX):].partition('/')
+        return S3LakeStorage(bucket, prefix, s3=s3)
+    return LocalLakeStorage(location)
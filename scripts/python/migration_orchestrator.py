@@ -0,0 +1,140 @@
+"""
+Równoległe wykonywanie migracji danych z zależnościami między tabelami
+
+Krok migracji to słownik:
+    {'name': 'subcategories', 'run': funkcja(conn), 'depends_on': ['categories']}
+
+- każdy krok dostaje osobne połączenie z puli (db_config) i własną transakcję:
+  po udanym kroku runner robi commit, po błędzie rollback
+- kroki bez wzajemnych zależności działają równolegle, więc pełne
+  przeładowanie trwa mniej więcej tyle, co najdłuższa ścieżka zależności
+- krok jest nieudany, gdy rzuci wyjątek albo zwróci False; kroki od niego
+  zależne są pomijane, pozostałe wykonują się dalej
+
+    from migration_orchestrator import run_migration_steps
+
+    results = run_migration_steps([
+        {'name': 'fuse_types', 'run': migrate_fuse_types_copy},
+        {'name': 'categories', 'run': upsert_categories},
+        {'name': 'subcategories', 'run': upsert_subcategories, 'depends_on': ['categories']},
+    ])
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from db_config import POOL_MAX_CONNECTIONS, db_connection
+
+STEP_OK = 'ok'
+STEP_FAILED = 'failed'
+STEP_SKIPPED = 'skipped'
+
+
+def _validate_steps(steps):
+    """Sprawdź unikalność nazw, istnienie zależności i brak cykli"""
+    names = [step['name'] for step in steps]
+    if len(names) != len(set(names)):
+        raise ValueError("Zduplikowane nazwy kroków migracji")
+
+    known = set(names)
+    for step in steps:
+        missing = set(step.get('depends_on', ())) - known
+        if missing:
+            raise ValueError(f"Krok {step['name']} zależy od nieznanych kroków: {', '.join(sorted(missing))}")
+
+    # Algorytm Kahna - jeśli nie da się uporządkować wszystkich kroków, jest cykl
+    remaining = {step['name']: set(step.get('depends_on', ())) for step in steps}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cykl zależności między krokami: {', '.join(sorted(remaining))}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def _run_step(step):
+    """Wykonaj krok na osobnym połączeniu z puli, w jednej transakcji"""
+    start = time.perf_counter()
+    try:
+        with db_connection() as conn:
+            result = step['run'](conn)
+            if result is False:
+                conn.rollback()
+                return STEP_FAILED, None, time.perf_counter() - start, None
+            conn.commit()
+        return STEP_OK, result, time.perf_counter() - start, None
+    except Exception as e:
+        return STEP_FAILED, None, time.perf_counter() - start, e
+
+
+def run_migration_steps(steps, max_workers=None):
+    """Wykonaj kroki migracji równolegle, z zachowaniem zależności
+
+    Args:
+        steps (list): kroki {'name', 'run', 'depends_on'}
+        max_workers (int): maksymalna liczba równoległych kroków
+            (domyślnie liczba kroków, nie więcej niż rozmiar puli połączeń)
+
+    Returns:
+        dict: nazwa kroku -> {'status', 'elapsed', 'result', 'error'}
+    """
+    _validate_steps(steps)
+    if not steps:
+        return {}
+    max_workers = max_workers or min(len(steps), POOL_MAX_CONNECTIONS)
+
+    by_name = {step['name']: step for step in steps}
+    pending = {step['name']: set(step.get('depends_on', ())) for step in steps}
+    results = {}
+    print_lock = threading.Lock()
+    wall_start = time.perf_counter()
+
+    def finish(name, status, result=None, elapsed=0.0, error=None):
+        results[name] = {'status': status, 'elapsed': elapsed, 'result': result, 'error': error}
+        with print_lock:
+            if status == STEP_OK:
+                print(f"   ✅ [{name}] zakończony w {elapsed:.3f}s")
+            elif status == STEP_FAILED:
+                print(f"   ❌ [{name}] nieudany po {elapsed:.3f}s" + (f": {error}" if error else ""))
+            else:
+                print(f"   ⏭️  [{name}] pominięty (nieudana zależność)")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='volt_migration') as executor:
+        running = {}
+        while pending or running:
+            # Pomiń kroki, których zależność się nie powiodła
+            for name in [n for n, deps in pending.items()
+                         if any(results.get(dep, {}).get('status') in (STEP_FAILED, STEP_SKIPPED) for dep in deps)]:
+                del pending[name]
+                finish(name, STEP_SKIPPED)
+
+            # Uruchom kroki, których zależności są już wykonane
+            for name in [n for n, deps in pending.items()
+                         if all(results.get(dep, {}).get('status') == STEP_OK for dep in deps)]:
+                del pending[name]
+                with print_lock:
+                    print(f"   ▶️  [{name}] start")
+                running[executor.submit(_run_step, by_name[name])] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                status, result, elapsed, error = future.result()
+                finish(running.pop(future), status, result, elapsed, error)
+
+    wall_time = time.perf_counter() - wall_start
+    serial_time = sum(result['elapsed'] for result in results.values())
+    failed = [name for name, result in results.items() if result['status'] != STEP_OK]
+    print(f"\n⏱️  Czas całkowity: {wall_time:.3f}s (suma czasów kroków: {serial_time:.3f}s)")
+    if failed:
+        print(f"⚠️  Nieudane lub pominięte kroki: {', '.join(failed)}")
+    return results
+
+
+def all_steps_succeeded(results):
+    """True, jeśli wszystkie kroki zakończyły się sukcesem"""
+    return all(result['status'] == STEP_OK for result in results.values())
@@ -0,0 +1,239 @@
+"""
+Wersjonowane migracje schematu PostgreSQL bez blokowania działającej bazy
+
+Każda migracja ma numer wersji; zastosowane wersje są zapisywane w tabeli
+schema_version, więc ponowne uruchomienie wykonuje tylko brakujące kroki.
+
+Migracja to słownik:
+    {'version': 2, 'description': 'Indeksy', 'steps': [...]}
+
+Kroki:
+- tekst SQL lub funkcja f(cur) - wykonywane w jednej transakcji razem
+  z wpisem do schema_version, z SET LOCAL lock_timeout
+- concurrent_index(...) - CREATE INDEX CONCURRENTLY poza transakcją
+  (nie blokuje zapisów do tabeli); migracja z takimi krokami nie może
+  zawierać kroków transakcyjnych
+
+Zasady "bez przestojów":
+- lock_timeout - DDL, który nie dostanie blokady w MIGRATION_LOCK_TIMEOUT_MS,
+  jest przerywany zamiast ustawiać się w kolejce przed zapytaniami aplikacji;
+  migracja jest wtedy powtarzana (MIGRATION_LOCK_RETRIES razy, z rosnącym odstępem)
+- nieudany CREATE INDEX CONCURRENTLY zostawia indeks INVALID - przed
+  ponowną próbą jest on usuwany przez DROP INDEX CONCURRENTLY
+- pg_advisory_lock - dwa równoległe wdrożenia nie wykonują migracji jednocześnie
+"""
+import hashlib
+import os
+import time
+
+from psycopg2 import errors, sql
+
+LOCK_TIMEOUT_MS = int(os.getenv('MIGRATION_LOCK_TIMEOUT_MS', '3000'))
+LOCK_RETRIES = int(os.getenv('MIGRATION_LOCK_RETRIES', '5'))
+RETRY_DELAY = float(os.getenv('MIGRATION_RETRY_DELAY', '2'))
+
+# Stały klucz pg_advisory_lock dla runnera migracji Volt
+MIGRATION_ADVISORY_LOCK = 7_020_001
+
+# Błędy, po których migrację można bezpiecznie powtórzyć
+RETRYABLE_ERRORS = (errors.LockNotAvailable, errors.DeadlockDetected)
+
+SCHEMA_VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    checksum CHAR(32) NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW(),
+    duration_ms INTEGER
+);
+"""
+
+
+def concurrent_index(name, table, columns, unique=False, where=None):
+    """Krok migracji: indeks budowany przez CREATE INDEX CONCURRENTLY
+
+    Args:
+        name (str): nazwa indeksu
+        table (str): tabela
+        columns (str): lista kolumn / wyrażenie, np. "phase_type, rated_current"
+        unique (bool): indeks UNIQUE
+        where (str): opcjonalny warunek indeksu częściowego
+    """
+    statement = (f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                 f"ON {table} ({columns})")
+    if where:
+        statement += f" WHERE {where}"
+    return {'index': name, 'sql': statement}
+
+
+def _is_concurrent(step):
+    return isinstance(step, dict) and 'index' in step
+
+
+def migration_checksum(migration):
+    """Suma kontrolna kroków migracji (wykrywa zmianę już zastosowanej migracji)"""
+    parts = []
+    for step in migration['steps']:
+        if callable(step):
+            parts.append(f"{step.__module__}.{step.__qualname__}")
+        elif _is_concurrent(step):
+            parts.append(step['sql'])
+        else:
+            parts.append(' '.join(step.split()))
+    return hashlib.md5('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def get_applied_versions(conn):
+    """Mapa version -> checksum zastosowanych migracji"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_version')")
+        if cur.fetchone()[0] is None:
+            return {}
+        cur.execute("SELECT version, checksum FROM schema_version")
+        return dict(cur.fetchall())
+
+
+def get_pending_migrations(conn, migrations):
+    """Migracje, które nie zostały jeszcze zastosowane (rosnąco po wersji)"""
+    applied = get_applied_versions(conn)
+    for migration in migrations:
+        checksum = applied.get(migration['version'])
+        if checksum is not None and checksum != migration_checksum(migration):
+            print(f"⚠️  Migracja {migration['version']} ({migration['description']}) "
+                  f"zmieniła się od zastosowania - nie zostanie wykonana ponownie")
+    return sorted((m for m in migrations if m['version'] not in applied), key=lambda m: m['version'])
+
+
+def _validate(migrations):
+    versions = [migration['version'] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Zduplikowane numery wersji migracji")
+    for migration in migrations:
+        concurrent = [_is_concurrent(step) for step in migration['steps']]
+        if any(concurrent) and not all(concurrent):
+            raise ValueError(f"Migracja {migration['version']}: kroki CONCURRENTLY nie mogą być "
+                             f"łączone z krokami transakcyjnymi")
+
+
+def _record_version(cur, migration, duration_ms):
+    cur.execute("""
+        INSERT INTO schema_version (version, description, checksum, duration_ms)
+        VALUES (%s, %s, %s, %s)
+    """, (migration['version'], migration['description'], migration_checksum(migration), duration_ms))
+
+
+def _apply_transactional(conn, migration, lock_timeout_ms):
+    conn.autocommit = False
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", (f"{lock_timeout_ms}ms",))
+            for step in migration['steps']:
+                if callable(step):
+                    step(cur)
+                else:
+                    cur.execute(step)
+            _record_version(cur, migration, int((time.perf_counter() - start) * 1000))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _drop_invalid_index(cur, name):
+    """Usuń indeks INVALID pozostawiony przez przerwany CREATE INDEX CONCURRENTLY"""
+    cur.execute("""
+        SELECT NOT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND pg_catalog.pg_table_is_visible(c.oid)
+    """, (name,))
+    row = cur.fetchone()
+    if row and row[0]:
+        print(f"   🧹 Usuwanie niepoprawnego indeksu {name} po przerwanej budowie")
+        cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+
+
+def _apply_concurrent(conn, migration, lock_timeout_ms):
+    conn.autocommit = True
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("SET lock_timeout = %s", (f"{lock_timeout_ms}ms",))
+        # Budowa indeksu na dużej tabeli może trwać dłużej niż statement_timeout puli
+        cur.execute("SET statement_timeout = 0")
+        for step in migration['steps']:
+            _drop_invalid_index(cur, step['index'])
+            cur.execute(step['sql'])
+        _record_version(cur, migration, int((time.perf_counter() - start) * 1000))
+
+
+def apply_migration(conn, migration, lock_timeout_ms=LOCK_TIMEOUT_MS, retries=LOCK_RETRIES,
+                    retry_delay=RETRY_DELAY):
+    """Zastosuj jedną migrację, powtarzając ją po przekroczeniu lock_timeout"""
+    concurrent = any(_is_concurrent(step) for step in migration['steps'])
+    for attempt in range(1, retries + 2):
+        try:
+            if concurrent:
+                _apply_concurrent(conn, migration, lock_timeout_ms)
+            else:
+                _apply_transactional(conn, migration, lock_timeout_ms)
+            return attempt
+        except RETRYABLE_ERRORS as e:
+            if attempt > retries:
+                raise
+            delay = retry_delay * attempt
+            print(f"   ⏳ Blokada niedostępna ({e.pgcode}), ponowna próba {attempt}/{retries} za {delay:.1f}s")
+            time.sleep(delay)
+
+
+def run_migrations(conn, migrations, lock_timeout_ms=LOCK_TIMEOUT_MS, retries=LOCK_RETRIES,
+                   retry_delay=RETRY_DELAY):
+    """Zastosuj brakujące migracje w kolejności wersji
+
+    Połączenie jest po zakończeniu przywracane do poprzedniego trybu
+    (autocommit, lock_timeout, statement_timeout), więc może pochodzić z puli.
+
+    Returns:
+        list: wersje zastosowane w tym uruchomieniu
+    """
+    _validate(migrations)
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_VERSION_TABLE_SQL)
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_ADVISORY_LOCK,))
+        try:
+            # Lista oczekujących migracji dopiero po zdobyciu blokady
+            pending = get_pending_migrations(conn, migrations)
+            if not pending:
+                print("✅ Schemat jest aktualny - brak migracji do zastosowania")
+            for migration in pending:
+                print(f"\n📋 Migracja {migration['version']}: {migration['description']}...")
+                start = time.perf_counter()
+                attempts = apply_migration(conn, migration, lock_timeout_ms, retries, retry_delay)
+                print(f"✅ Migracja {migration['version']} zastosowana w {time.perf_counter() - start:.2f}s"
+                      + (f" (próby: {attempts})" if attempts > 1 else ""))
+                applied.append(migration['version'])
+        finally:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_ADVISORY_LOCK,))
+                cur.execute("RESET lock_timeout")
+                cur.execute("RESET statement_timeout")
+    finally:
+        if not conn.closed:
+            conn.autocommit = previous_autocommit
+    return applied
+
+
+def print_migration_status(conn, migrations):
+    """Wypisz stan migracji (zastosowane / oczekujące)"""
+    applied = get_applied_versions(conn)
+    print(f"\n{'Wersja':<8} {'Stan':<12} Opis")
+    for migration in sorted(migrations, key=lambda m: m['version']):
+        state = 'zastosowana' if migration['version'] in applied else 'oczekuje'
+        print(f"{migration['version']:<8} {state:<12} {migration['description']}")
+    if not conn.autocommit:
+        conn.rollback()
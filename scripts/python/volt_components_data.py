@@ -5,7 +5,9 @@ skopiowana z frontendu). Skrypt spróbuje użyć tych zmiennych z globals() —
 czyli możesz wkleić swoje dane powyżej tej logiki w tym samym pliku.
 
 Użycie:
-  python scripts/python/volt_components_data.py
+  python scripts/python/volt_components_data.py                # równolegle (migration_orchestrator)
+  python scripts/python/volt_components_data.py --all          # + fuse_types i circuit_templates
+  python scripts/python/volt_components_data.py --sequential   # jedno połączenie, krok po kroku
 
 Plik korzysta ze zmiennych środowiskowych Postgres (z .env) jak w innych
 skryptach w `scripts/python`.
@@ -13,25 +15,16 @@ skryptach w `scripts/python`.
 
 import os
 import sys
-from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import execute_values
 
-# Załaduj .env
-load_dotenv()
-
-DB_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'database': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', '')
-}
+from db_config import DB_CONFIG, get_connection as get_pooled_connection, release_connection
+from migration_orchestrator import all_steps_succeeded, run_migration_steps
 
 
 def get_connection():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pooled_connection()
         print(f"✅ Połączono z bazą danych: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
         return conn
     except psycopg2.Error as e:
@@ -43,6 +36,9 @@ def upsert_components(conn, components):
     """Wstaw/aktualizuj rekordy w tabeli `components`.
 
     Komponenty powinny mieć pola: id, name, fields, description, price, image
+
+    Zwraca liczbę zapisanych komponentów (0 dla pustej listy) albo None,
+    gdy zapis się nie powiódł.
     """
     if not components:
         print("ℹ️  Brak komponentów do przetworzenia")
@@ -81,7 +77,88 @@ def upsert_components(conn, components):
         conn.rollback()
         print(f"❌ Błąd przy wstawianiu komponentów: {e}")
         cur.close()
-        return 0
+        return None
+
+
+def flatten_category_tree(categories):
+    """Spłaszcz drzewo ComponentCategory[] do tablic kolumn dla trzech tabel.
+
+    Zwraca słownik z listami kolumn:
+    - categories: id, name
+    - subcategories: id, category_id, name
+    - links: category_id, subcategory_id, component_id
+
+    Przy powtórzonym id kategorii/podkategorii wygrywa ostatnie wystąpienie
+    (tak jak przy kolejnych UPSERT-ach), a powtórzone powiązania są pomijane.
+    """
+    cats = {}
+    subs = {}
+    links = {}
+
+    for cat in categories:
+        cat_id = cat.get('id')
+        cats[cat_id] = cat.get('name')
+
+        # direct components in category
+        for comp_id in cat.get('components') or []:
+            links.setdefault((cat_id, None, comp_id), None)
+
+        # subcategories
+        for sub in cat.get('subcategories') or []:
+            sub_id = sub.get('id')
+            subs[sub_id] = (cat_id, sub.get('name'))
+            for comp_id in sub.get('components') or []:
+                links.setdefault((None, sub_id, comp_id), None)
+
+    return {
+        'categories': (list(cats.keys()), list(cats.values())),
+        'subcategories': (list(subs.keys()), [v[0] for v in subs.values()], [v[1] for v in subs.values()]),
+        'links': tuple(list(col) for col in zip(*links.keys())) if links else ([], [], []),
+    }
+
+
+def upsert_categories(conn, flat):
+    """Zapisz kategorie ze spłaszczonego drzewa (bez commit - robi go wywołujący)"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO component_categories (id, name)
+            SELECT * FROM unnest(%s::varchar[], %s::varchar[])
+            ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name;
+            """,
+            flat['categories']
+        )
+    return len(flat['categories'][0])
+
+
+def upsert_subcategories(conn, flat):
+    """Zapisz podkategorie (wymaga kategorii; bez commit)"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO component_subcategories (id, category_id, name)
+            SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[])
+            ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category_id = EXCLUDED.category_id;
+            """,
+            flat['subcategories']
+        )
+    return len(flat['subcategories'][0])
+
+
+def upsert_category_links(conn, flat):
+    """Zapisz powiązania kategoria/podkategoria <-> komponent (wymaga kategorii, podkategorii i komponentów; bez commit)"""
+    with conn.cursor() as cur:
+        # Brak celu ON CONFLICT - pomija duplikaty zarówno dla (category_id, component_id),
+        # jak i (subcategory_id, component_id)
+        cur.execute(
+            """
+            INSERT INTO component_category_components (category_id, subcategory_id, component_id)
+            SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[])
+            ON CONFLICT DO NOTHING;
+            """,
+            flat['links']
+        )
+    return len(flat['links'][2])
 
 
 def upsert_categories_and_links(conn, categories):
@@ -90,77 +167,61 @@ def upsert_categories_and_links(conn, categories):
     Struktura `categories` powinna odpowiadać ComponentCategory[] z TS:
     - element może mieć `id`, `name`, `components` (lista id komponentów)
     - lub `subcategories`: lista {id, name, components}
+
+    Całe drzewo jest spłaszczane do tablic i każda z trzech tabel jest
+    zapisywana jednym zapytaniem INSERT ... SELECT FROM unnest(...), więc
+    liczba round-tripów nie zależy od liczby powiązań.
     """
     if not categories:
         print("ℹ️  Brak kategorii do przetworzenia")
         return 0
 
-    cur = conn.cursor()
-    count_links = 0
+    flat = flatten_category_tree(categories)
 
     try:
-        for cat in categories:
-            cat_id = cat.get('id')
-            cat_name = cat.get('name')
-            # upsert category
-            cur.execute(
-                """
-                INSERT INTO component_categories (id, name)
-                VALUES (%s, %s)
-                ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name;
-                """,
-                (cat_id, cat_name)
-            )
-
-            # direct components in category
-            comps = cat.get('components') or []
-            for comp_id in comps:
-                cur.execute(
-                    """
-                    INSERT INTO component_category_components (category_id, subcategory_id, component_id)
-                    VALUES (%s, NULL, %s)
-                    ON CONFLICT (category_id, component_id) DO NOTHING;
-                    """,
-                    (cat_id, comp_id)
-                )
-                count_links += 1
-
-            # subcategories
-            for sub in cat.get('subcategories') or []:
-                sub_id = sub.get('id')
-                sub_name = sub.get('name')
-                cur.execute(
-                    """
-                    INSERT INTO component_subcategories (id, category_id, name)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, category_id = EXCLUDED.category_id;
-                    """,
-                    (sub_id, cat_id, sub_name)
-                )
-
-                for comp_id in sub.get('components') or []:
-                    cur.execute(
-                        """
-                        INSERT INTO component_category_components (category_id, subcategory_id, component_id)
-                        VALUES (NULL, %s, %s)
-                        ON CONFLICT (subcategory_id, component_id) DO NOTHING;
-                        """,
-                        (sub_id, comp_id)
-                    )
-                    count_links += 1
-
+        count_categories = upsert_categories(conn, flat)
+        count_subcategories = upsert_subcategories(conn, flat)
+        count_links = upsert_category_links(conn, flat)
         conn.commit()
-        print(f"✅ Wstawiono/aktualizowano {len(categories)} kategorii/podkategorii i {count_links} powiązań komponentów")
-        cur.close()
+        print(f"✅ Wstawiono/aktualizowano {count_categories} kategorii, "
+              f"{count_subcategories} podkategorii i {count_links} powiązań komponentów")
         return count_links
 
     except psycopg2.Error as e:
         conn.rollback()
         print(f"❌ Błąd przy wstawianiu kategorii/powiązań: {e}")
-        cur.close()
         return 0
 
 
+def build_migration_steps(comps, cats, include_base_data=False):
+    """Kroki migracji dla migration_orchestrator (kolejność wynika z kluczy obcych)
+
+    components i categories są niezależne; subcategories wymagają categories,
+    a powiązania - podkategorii i komponentów. include_base_data dodaje
+    niezależne kroki fuse_types i circuit_templates z week2/migrate_volt_data.py.
+    """
+    flat = flatten_category_tree(cats)
+
+    def run_components(conn):
+        # None = błąd zapisu (krok nieudany); 0 przy pustej liście to sukces
+        count = upsert_components(conn, comps)
+        return False if count is None else count
+
+    steps = [
+        {'name': 'components', 'run': run_components},
+        {'name': 'categories', 'run': lambda conn: upsert_categories(conn, flat)},
+        {'name': 'subcategories', 'run': lambda conn: upsert_subcategories(conn, flat),
+         'depends_on': ['categories']},
+        {'name': 'category_links', 'run': lambda conn: upsert_category_links(conn, flat),
+         'depends_on': ['subcategories', 'components']},
+    ]
+    if include_base_data:
+        sys.path.append(os.path.join(os.path.dirname(__file__), 'week2'))
+        from migrate_volt_data import VOLT_BASE_DATA_STEPS
+        steps = list(VOLT_BASE_DATA_STEPS) + steps
+    return steps
+
+
 def load_data_from_globals():
     """Sprawdź czy `COMPONENTS` i `COMPONENT_CATEGORIES` są już zdefiniowane
     w tym module (użyteczne gdy wkleisz TS->py listy nad tym kodem).
@@ -174,6 +235,10 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='Migracja komponentów Volt do PostgreSQL')
     parser.add_argument('--dry', action='store_true', help='Nie wykonuj zapisu, tylko podsumuj')
+    parser.add_argument('--all', action='store_true',
+                        help='Pełne przeładowanie: także fuse_types i circuit_templates (week2/migrate_volt_data.py)')
+    parser.add_argument('--sequential', action='store_true',
+                        help='Stary tryb: komponenty, potem kategorie na jednym połączeniu')
     args = parser.parse_args()
 
     comps, cats = load_data_from_globals()
@@ -189,13 +254,22 @@ def main():
         print("--dry uruchomiony — koniec")
         return
 
-    conn = get_connection()
-    try:
-        upsert_components(conn, comps)
-        upsert_categories_and_links(conn, cats)
+    if args.sequential:
+        conn = get_connection()
+        try:
+            upsert_components(conn, comps)
+            upsert_categories_and_links(conn, cats)
+            print("\n✅ Migracja komponentów zakończona")
+        finally:
+            release_connection(conn)
+        return
+
+    # Niezależne tabele równolegle, każda na osobnym połączeniu z puli
+    results = run_migration_steps(build_migration_steps(comps, cats, include_base_data=args.all))
+    if all_steps_succeeded(results):
         print("\n✅ Migracja komponentów zakończona")
-    finally:
-        conn.close()
+    else:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
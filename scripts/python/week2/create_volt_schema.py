@@ -9,30 +9,31 @@ Tabele:
 - component_categories - kategorie komponentów
 - component_subcategories - podkategorie komponentów
 - component_category_components - relacja wiele-do-wielu (kategorie <-> komponenty)
+- schema_version - zastosowane wersje migracji schematu
+
+Schemat jest budowany wersjonowanymi migracjami (VOLT_SCHEMA_MIGRATIONS) -
+ponowne uruchomienie na produkcji wykonuje tylko brakujące kroki:
+    python create_volt_schema.py            # zastosuj brakujące migracje
+    python create_volt_schema.py --status   # pokaż stan migracji
 """
 
 import os
 import sys
-from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
-# Załaduj zmienne środowiskowe
-load_dotenv()
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-DB_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'database': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', '')
-}
+from db_config import DB_CONFIG, get_connection as get_pooled_connection, release_connection
+from catalog_cache import install_catalog_triggers
+from schema_migrations import concurrent_index, print_migration_status, run_migrations
 
 
 def get_connection():
-    """Utwórz połączenie z bazą danych"""
+    """Pobierz połączenie z puli połączeń"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pooled_connection()
         print(f"✅ Połączono z bazą danych: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
         return conn
     except psycopg2.Error as e:
@@ -40,18 +41,26 @@ def get_connection():
         sys.exit(1)
 
 
-def create_schema(conn):
-    """Utwórz wszystkie tabele"""
-    print("\n" + "="*60)
-    print("Tworzenie schematu bazy danych Volt")
-    print("="*60)
-    
-    cur = conn.cursor()
-    
-    try:
-        # 1. Tabela circuit_templates - szablony obwodów
-        print("\n📋 Tworzenie tabeli circuit_templates...")
-        cur.execute("""
+def _install_fuse_types_notify_trigger(cur):
+    """Trigger NOTIFY dla cache katalogu (catalog_cache.ComponentCatalog)"""
+    install_catalog_triggers(cur, tables=['fuse_types'])
+
+
+def _updated_at_trigger_sql(table):
+    return f"""
+        DROP TRIGGER IF EXISTS update_{table}_updated_at ON {table};
+        CREATE TRIGGER update_{table}_updated_at
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    """
+
+
+# Wersjonowane migracje schematu (patrz schema_migrations.py)
+# Nowe zmiany dopisujemy jako kolejną wersję - nie edytujemy już zastosowanych migracji
+VOLT_SCHEMA_MIGRATIONS = [
+    {'version': 1, 'description': 'Tabele bazowe Volt', 'steps': [
+        # Szablony obwodów
+        """
         CREATE TABLE IF NOT EXISTS circuit_templates (
             id SERIAL PRIMARY KEY,
             description VARCHAR(255) NOT NULL,
@@ -64,24 +73,18 @@ def create_schema(conn):
             created_at TIMESTAMP DEFAULT NOW(),
             updated_at TIMESTAMP DEFAULT NOW()
         );
-        """)
-        print("✅ Tabela circuit_templates utworzona")
-        
-        # 2. Tabela fuse_types - typy bezpieczników
-        print("\n📋 Tworzenie tabeli fuse_types...")
-        cur.execute("""
+        """,
+        # Typy bezpieczników
+        """
         CREATE TABLE IF NOT EXISTS fuse_types (
             id SERIAL PRIMARY KEY,
             fuse_type VARCHAR(20) NOT NULL UNIQUE,
             phase_type VARCHAR(10) NOT NULL CHECK (phase_type IN ('1φ', '3φ')),
             created_at TIMESTAMP DEFAULT NOW()
         );
-        """)
-        print("✅ Tabela fuse_types utworzona")
-        
-        # 3. Tabela components - komponenty elektryczne
-        print("\n📋 Tworzenie tabeli components...")
-        cur.execute("""
+        """,
+        # Komponenty elektryczne
+        """
         CREATE TABLE IF NOT EXISTS components (
             id VARCHAR(100) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
@@ -94,24 +97,18 @@ def create_schema(conn):
             created_at TIMESTAMP DEFAULT NOW(),
             updated_at TIMESTAMP DEFAULT NOW()
         );
-        """)
-        print("✅ Tabela components utworzona")
-        
-        # 4. Tabela component_categories - kategorie komponentów
-        print("\n📋 Tworzenie tabeli component_categories...")
-        cur.execute("""
+        """,
+        # Kategorie komponentów
+        """
         CREATE TABLE IF NOT EXISTS component_categories (
             id VARCHAR(100) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             created_at TIMESTAMP DEFAULT NOW(),
             updated_at TIMESTAMP DEFAULT NOW()
         );
-        """)
-        print("✅ Tabela component_categories utworzona")
-        
-        # 5. Tabela component_subcategories - podkategorie
-        print("\n📋 Tworzenie tabeli component_subcategories...")
-        cur.execute("""
+        """,
+        # Podkategorie
+        """
         CREATE TABLE IF NOT EXISTS component_subcategories (
             id VARCHAR(100) PRIMARY KEY,
             category_id VARCHAR(100) NOT NULL REFERENCES component_categories(id) ON DELETE CASCADE,
@@ -119,12 +116,9 @@ def create_schema(conn):
             created_at TIMESTAMP DEFAULT NOW(),
             updated_at TIMESTAMP DEFAULT NOW()
         );
-        """)
-        print("✅ Tabela component_subcategories utworzona")
-        
-        # 6. Tabela component_category_components - relacja kategoria <-> komponent (bezpośrednio w kategorii)
-        print("\n📋 Tworzenie tabeli component_category_components...")
-        cur.execute("""
+        """,
+        # Relacja kategoria <-> komponent (bezpośrednio w kategorii lub w podkategorii)
+        """
         CREATE TABLE IF NOT EXISTS component_category_components (
             id SERIAL PRIMARY KEY,
             category_id VARCHAR(100) REFERENCES component_categories(id) ON DELETE CASCADE,
@@ -138,22 +132,20 @@ def create_schema(conn):
                 (category_id IS NULL AND subcategory_id IS NOT NULL)
             )
         );
-        """)
-        print("✅ Tabela component_category_components utworzona")
-        
-        # Indeksy dla lepszej wydajności
-        print("\n📋 Tworzenie indeksów...")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_circuit_templates_zone ON circuit_templates(zone);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_circuit_templates_type ON circuit_templates(type);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_fuse_types_phase_type ON fuse_types(phase_type);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_component_subcategories_category ON component_subcategories(category_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_component_category_components_category ON component_category_components(category_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_component_category_components_subcategory ON component_category_components(subcategory_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_component_category_components_component ON component_category_components(component_id);")
-        print("✅ Indeksy utworzone")
-        
-        # Funkcja do aktualizacji updated_at
-        cur.execute("""
+        """,
+    ]},
+    # Indeksy budowane bez blokowania zapisów (CREATE INDEX CONCURRENTLY)
+    {'version': 2, 'description': 'Indeksy', 'steps': [
+        concurrent_index('idx_circuit_templates_zone', 'circuit_templates', 'zone'),
+        concurrent_index('idx_circuit_templates_type', 'circuit_templates', 'type'),
+        concurrent_index('idx_fuse_types_phase_type', 'fuse_types', 'phase_type'),
+        concurrent_index('idx_component_subcategories_category', 'component_subcategories', 'category_id'),
+        concurrent_index('idx_component_category_components_category', 'component_category_components', 'category_id'),
+        concurrent_index('idx_component_category_components_subcategory', 'component_category_components', 'subcategory_id'),
+        concurrent_index('idx_component_category_components_component', 'component_category_components', 'component_id'),
+    ]},
+    {'version': 3, 'description': 'Triggery updated_at', 'steps': [
+        """
         CREATE OR REPLACE FUNCTION update_updated_at_column()
         RETURNS TRIGGER AS $$
         BEGIN
@@ -161,47 +153,47 @@ def create_schema(conn):
             RETURN NEW;
         END;
         $$ language 'plpgsql';
-        """)
-        
-        # Triggery dla updated_at
-        cur.execute("""
-        DROP TRIGGER IF EXISTS update_circuit_templates_updated_at ON circuit_templates;
-        CREATE TRIGGER update_circuit_templates_updated_at
-            BEFORE UPDATE ON circuit_templates
-            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-        """)
-        
-        cur.execute("""
-        DROP TRIGGER IF EXISTS update_components_updated_at ON components;
-        CREATE TRIGGER update_components_updated_at
-            BEFORE UPDATE ON components
-            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-        """)
-        
-        cur.execute("""
-        DROP TRIGGER IF EXISTS update_component_categories_updated_at ON component_categories;
-        CREATE TRIGGER update_component_categories_updated_at
-            BEFORE UPDATE ON component_categories
-            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-        """)
-        
-        cur.execute("""
-        DROP TRIGGER IF EXISTS update_component_subcategories_updated_at ON component_subcategories;
-        CREATE TRIGGER update_component_subcategories_updated_at
-            BEFORE UPDATE ON component_subcategories
-            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
-        """)
-        print("✅ Triggery dla updated_at utworzone")
-        
-        conn.commit()
-        print("\n✅ Schemat bazy danych utworzony pomyślnie!")
-        cur.close()
+        """,
+        _updated_at_trigger_sql('circuit_templates'),
+        _updated_at_trigger_sql('components'),
+        _updated_at_trigger_sql('component_categories'),
+        _updated_at_trigger_sql('component_subcategories'),
+    ]},
+    {'version': 4, 'description': 'Trigger NOTIFY katalogu (fuse_types)', 'steps': [
+        _install_fuse_types_notify_trigger,
+    ]},
+    # Liczbowy prąd znamionowy ('16A' -> 16) - sortowanie i filtrowanie bez parsowania tekstu w zapytaniu
+    {'version': 5, 'description': 'Kolumna fuse_types.rated_current', 'steps': [
+        """
+        ALTER TABLE fuse_types ADD COLUMN IF NOT EXISTS rated_current INTEGER
+            GENERATED ALWAYS AS (NULLIF(regexp_replace(fuse_type, '[^0-9]', '', 'g'), '')::INTEGER) STORED;
+        """,
+    ]},
+    {'version': 6, 'description': 'Indeks fuse_types (phase_type, rated_current)', 'steps': [
+        concurrent_index('idx_fuse_types_phase_rated_current', 'fuse_types', 'phase_type, rated_current'),
+    ]},
+]
+
+
+def create_schema(conn):
+    """Zastosuj brakujące migracje schematu (VOLT_SCHEMA_MIGRATIONS)
+
+    Każda wersja jest wykonywana raz i zapisywana w schema_version. DDL działa
+    z lock_timeout i ponowieniami, a indeksy powstają przez CREATE INDEX
+    CONCURRENTLY, więc wdrożenie na działającej bazie nie wstrzymuje odczytów
+    ani zapisów.
+    """
+    print("\n" + "="*60)
+    print("Tworzenie schematu bazy danych Volt")
+    print("="*60)
+
+    try:
+        applied = run_migrations(conn, VOLT_SCHEMA_MIGRATIONS)
+        print(f"\n✅ Schemat bazy danych aktualny (zastosowane migracje: {applied or 'brak'})")
         return True
-        
+
     except psycopg2.Error as e:
-        conn.rollback()
-        print(f"\n❌ Błąd podczas tworzenia schematu: {e}")
-        cur.close()
+        print(f"\n❌ Błąd podczas migracji schematu: {e}")
         return False
 
 
@@ -226,7 +218,8 @@ def drop_schema(conn):
             'component_categories',
             'components',
             'fuse_types',
-            'circuit_templates'
+            'circuit_templates',
+            'schema_version'
         ]
         
         for table in tables:
@@ -251,11 +244,16 @@ def main():
     
     parser = argparse.ArgumentParser(description='Zarządzanie schematem bazy danych Volt')
     parser.add_argument('--drop', action='store_true', help='Usuń istniejące tabele przed utworzeniem')
+    parser.add_argument('--status', action='store_true', help='Pokaż zastosowane i oczekujące migracje')
     args = parser.parse_args()
     
     conn = get_connection()
     
     try:
+        if args.status:
+            print_migration_status(conn, VOLT_SCHEMA_MIGRATIONS)
+            return
+
         if args.drop:
             drop_schema(conn)
         
@@ -271,8 +269,8 @@ def main():
     except Exception as e:
         print(f"\n❌ Nieoczekiwany błąd: {e}")
     finally:
-        conn.close()
-        print("\n🔌 Połączenie zamknięte")
+        release_connection(conn)
+        print("\n🔌 Połączenie zwrócone do puli")
 
 
 if __name__ == "__main__":
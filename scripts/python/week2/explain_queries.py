@@ -0,0 +1,188 @@
+"""
+Sprawdzanie planów zapytań ze skryptów week2 (EXPLAIN ANALYZE, BUFFERS)
+
+Każde zapytanie z WEEK2_QUERIES jest wykonywane przez
+EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) w transakcji, która jest zawsze
+wycofywana (także UPDATE/DELETE nie zmieniają danych). W planie oznaczane są:
+- Seq Scan - pełny odczyt tabeli (dla małych tabel tylko informacyjnie)
+- Sort     - sortowanie w zapytaniu (brak indeksu pasującego do ORDER BY),
+             ze wskazaniem sortowania na dysku
+
+Użycie:
+    python explain_queries.py                    # wszystkie zapytania
+    python explain_queries.py --query fuse       # tylko zapytania zawierające 'fuse' w nazwie
+    python explain_queries.py --force-index      # enable_seqscan = off - czy indeks w ogóle może być użyty
+    python explain_queries.py --min-rows 5000    # próg "dużej" tabeli dla Seq Scan
+"""
+
+import json
+import os
+import sys
+
+import psycopg2
+
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from db_config import db_connection
+from catalog_cache import CATALOG_QUERIES
+from volt_components_data import (
+    COMPONENT_COUNT_QUERY,
+    COMPONENT_HASHES_QUERY,
+    COMPONENTS_BY_FIELDS_QUERY,
+    COMPONENTS_EXPORT_QUERY,
+    COMPONENTS_QUERY,
+    FUSE_TYPES_BY_PHASE_QUERY,
+    FUSE_TYPES_QUERY,
+)
+
+# Zapytania ze skryptów week2 - nazwa, skrypt, SQL, parametry
+WEEK2_QUERIES = [
+    {'name': 'components_by_fields', 'script': 'volt_components_data.py',
+     'sql': COMPONENTS_BY_FIELDS_QUERY, 'params': (2, 2)},
+    {'name': 'components_all', 'script': 'volt_components_data.py',
+     'sql': COMPONENTS_QUERY},
+    {'name': 'component_count', 'script': 'volt_components_data.py',
+     'sql': COMPONENT_COUNT_QUERY},
+    {'name': 'component_hashes', 'script': 'volt_components_data.py',
+     'sql': COMPONENT_HASHES_QUERY},
+    {'name': 'components_export', 'script': 'volt_components_data.py',
+     'sql': COMPONENTS_EXPORT_QUERY},
+    {'name': 'fuse_types_all', 'script': 'volt_components_data.py',
+     'sql': FUSE_TYPES_QUERY},
+    {'name': 'fuse_types_by_phase', 'script': 'volt_components_data.py',
+     'sql': FUSE_TYPES_BY_PHASE_QUERY, 'params': ('1φ',)},
+    {'name': 'catalog_components', 'script': 'catalog_cache.py',
+     'sql': CATALOG_QUERIES['electric_components']},
+    {'name': 'catalog_fuse_types', 'script': 'catalog_cache.py',
+     'sql': CATALOG_QUERIES['fuse_types']},
+    {'name': 'test_users_all', 'script': 'postgres_crud.py',
+     'sql': "SELECT id, email, name, created_at, updated_at FROM volt_test_users ORDER BY created_at DESC"},
+    {'name': 'test_users_by_id', 'script': 'postgres_crud.py',
+     'sql': "SELECT id, email, name, created_at, updated_at FROM volt_test_users WHERE id = %s", 'params': (1,)},
+    {'name': 'test_users_last', 'script': 'postgres_crud.py',
+     'sql': "SELECT id, email, name FROM volt_test_users ORDER BY id DESC LIMIT 1"},
+    {'name': 'test_users_update', 'script': 'postgres_crud.py',
+     'sql': "UPDATE volt_test_users SET name = %s WHERE id = %s RETURNING id", 'params': ('explain', 1)},
+    {'name': 'test_users_delete', 'script': 'postgres_crud.py',
+     'sql': "DELETE FROM volt_test_users WHERE id = %s RETURNING id", 'params': (1,)},
+]
+
+# Tabele mniejsze niż próg - Seq Scan jest tam zwykle najtańszym planem
+DEFAULT_MIN_ROWS = 1000
+
+
+def _walk_plan(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _walk_plan(child)
+
+
+def _table_rows(cur, relation):
+    cur.execute("SELECT reltuples::BIGINT FROM pg_class WHERE oid = to_regclass(%s)", (relation,))
+    row = cur.fetchone()
+    return max(row[0], 0) if row else 0
+
+
+def find_plan_issues(cur, plan, min_rows=DEFAULT_MIN_ROWS):
+    """Seq Scan i Sort w planie jako lista (poziom, opis)
+
+    Poziom 'WARN' - pełny odczyt dużej tabeli lub sortowanie na dysku,
+    'INFO' - pozostałe (np. Seq Scan małej tabeli, sort w pamięci).
+    """
+    issues = []
+    for node in _walk_plan(plan):
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan':
+            relation = node['Relation Name']
+            table_rows = _table_rows(cur, relation)
+            level = 'WARN' if table_rows >= min_rows else 'INFO'
+            issues.append((level, f"Seq Scan on {relation} (~{table_rows} wierszy w tabeli, "
+                                  f"zwrócono {node.get('Actual Rows', 0)})"))
+        elif node_type in ('Sort', 'Incremental Sort'):
+            keys = ', '.join(node.get('Sort Key', ()))
+            space_type = node.get('Sort Space Type', '')
+            level = 'WARN' if space_type == 'Disk' else 'INFO'
+            issues.append((level, f"{node_type} by {keys} ({node.get('Sort Method', '?')}, "
+                                  f"{node.get('Sort Space Used', '?')} kB {space_type})"))
+    return issues
+
+
+def explain_query(conn, query, force_index=False, min_rows=DEFAULT_MIN_ROWS):
+    """EXPLAIN (ANALYZE, BUFFERS) jednego zapytania w wycofywanej transakcji
+
+    Returns:
+        dict: czasy, bufory, plan i lista problemów
+    """
+    try:
+        with conn.cursor() as cur:
+            if force_index:
+                cur.execute("SET LOCAL enable_seqscan = off")
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query['sql'], query.get('params'))
+            result = cur.fetchone()[0]
+            explain = result[0] if isinstance(result, list) else json.loads(result)[0]
+            plan = explain['Plan']
+            return {
+                'name': query['name'],
+                'script': query['script'],
+                'execution_ms': explain['Execution Time'],
+                'planning_ms': explain['Planning Time'],
+                'shared_hit': plan.get('Shared Hit Blocks', 0),
+                'shared_read': plan.get('Shared Read Blocks', 0),
+                'plan': plan,
+                'issues': find_plan_issues(cur, plan, min_rows),
+            }
+    finally:
+        # EXPLAIN ANALYZE wykonuje zapytanie - nic nie może zostać zatwierdzone
+        conn.rollback()
+
+
+def run_explain_report(queries=WEEK2_QUERIES, force_index=False, min_rows=DEFAULT_MIN_ROWS):
+    """Wykonaj EXPLAIN dla wszystkich zapytań i wypisz raport
+
+    Returns:
+        list: wyniki explain_query (zapytania z błędem są pomijane)
+    """
+    results = []
+    with db_connection() as conn:
+        for query in queries:
+            try:
+                result = explain_query(conn, query, force_index, min_rows)
+            except psycopg2.Error as e:
+                print(f"\n❌ {query['name']} ({query['script']}): {str(e).strip().splitlines()[0]}")
+                continue
+            results.append(result)
+
+            print(f"\n📋 {result['name']} ({result['script']}) - {result['execution_ms']:.3f} ms "
+                  f"(planowanie {result['planning_ms']:.3f} ms), bufory: hit={result['shared_hit']} "
+                  f"read={result['shared_read']}")
+            if not result['issues']:
+                print("   ✅ Brak Seq Scan i Sort")
+            for level, description in result['issues']:
+                print(f"   {'⚠️ ' if level == 'WARN' else 'ℹ️ '} {description}")
+
+    warnings = sum(1 for result in results for level, _ in result['issues'] if level == 'WARN')
+    print("\n" + "=" * 60)
+    print(f"Zapytania: {len(results)}/{len(queries)}, ostrzeżenia: {warnings}")
+    print("=" * 60)
+    return results
+
+
+def main():
+    """Główna funkcja"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='EXPLAIN (ANALYZE, BUFFERS) zapytań ze skryptów week2')
+    parser.add_argument('--query', help='Tylko zapytania, których nazwa zawiera podany tekst')
+    parser.add_argument('--force-index', action='store_true',
+                        help='Wyłącz Seq Scan (enable_seqscan = off) - sprawdza, czy istnieje pasujący indeks')
+    parser.add_argument('--min-rows', type=int, default=DEFAULT_MIN_ROWS,
+                        help=f'Seq Scan jest ostrzeżeniem dla tabel od tylu wierszy (domyślnie {DEFAULT_MIN_ROWS})')
+    args = parser.parse_args()
+
+    queries = [q for q in WEEK2_QUERIES if not args.query or args.query in q['name']]
+    run_explain_report(queries, force_index=args.force_index, min_rows=args.min_rows)
+
+
+if __name__ == "__main__":
+    main()
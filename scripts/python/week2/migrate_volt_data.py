@@ -5,24 +5,24 @@ Import danych do tabel: circuit_templates, fuse_types, components, component_cat
 Użycie:
 1. Najpierw utwórz schemat: python scripts/python/create_volt_schema.py
 2. Potem uruchom migrację: python scripts/python/migrate_volt_data.py
+   (--method insert - stara pętla INSERT wiersz po wierszu zamiast COPY)
+   Przy COPY tabele są ładowane równolegle (VOLT_BASE_DATA_STEPS, osobne połączenia z puli)
+3. Benchmark COPY vs pętla INSERT: python scripts/python/migrate_volt_data.py --benchmark 100000
 """
 
+import io
 import os
 import sys
-from dotenv import load_dotenv
+import time
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor, execute_values
 
-# Załaduj zmienne środowiskowe
-load_dotenv()
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-DB_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'database': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', '')
-}
+from db_config import DB_CONFIG, get_connection as get_pooled_connection, release_connection
+from migration_orchestrator import run_migration_steps
 
 # Dane do migracji - FUSE_TYPES
 FUSE_TYPES_1PHASE = ['6A', '10A', '13A', '16A', '20A', '25A', '32A', '40A', '50A', '63A']
@@ -72,9 +72,9 @@ CIRCUIT_TEMPLATES = [
 
 
 def get_connection():
-    """Utwórz połączenie z bazą danych"""
+    """Pobierz połączenie z puli połączeń"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pooled_connection()
         print(f"✅ Połączono z bazą danych: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
         return conn
     except psycopg2.Error as e:
@@ -162,8 +162,241 @@ def migrate_circuit_templates(conn):
         return False
 
 
+class CopyRowStream(io.TextIOBase):
+    """Strumień tekstowy dla COPY FROM STDIN budowany leniwie z iteratora wierszy
+
+    Wiersze są serializowane do formatu text COPY dopiero gdy psycopg2 woła
+    read(), więc w pamięci jest tylko bieżący fragment danych.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.row_count = 0
+
+    @staticmethod
+    def _format_value(value):
+        if value is None:
+            return '\\N'
+        return (str(value)
+                .replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self._buffer += '\t'.join(self._format_value(v) for v in row) + '\n'
+            self.row_count += 1
+
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_load(cur, table, columns, rows, merge_sql, replace=False):
+    """Bulk load: COPY FROM STDIN do tabeli tymczasowej i jeden INSERT ... SELECT do tabeli docelowej
+
+    Args:
+        cur: kursor (transakcję zatwierdza wywołujący)
+        table (str): tabela docelowa
+        columns (list): kolumny ładowane przez COPY
+        rows (iterable): krotki wartości w kolejności `columns`
+        merge_sql (str): zapytanie łączące; {target}, {staging} i {columns} są podstawiane
+        replace (bool): usuń wcześniej wszystkie wiersze z tabeli docelowej (pełne przeładowanie)
+
+    Returns:
+        tuple: (liczba wierszy wczytanych przez COPY, liczba wierszy wstawionych, czas w sekundach)
+    """
+    start = time.perf_counter()
+    target = sql.Identifier(table)
+    staging = sql.Identifier(f"_staging_{table}")
+    column_list = sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+
+    # Tabela tymczasowa z samymi ładowanymi kolumnami (bez DEFAULT, więc COPY nie zużywa sekwencji SERIAL)
+    cur.execute(sql.SQL(
+        "CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {target} WITH NO DATA"
+    ).format(staging=staging, target=target, columns=column_list))
+
+    stream = CopyRowStream(rows)
+    cur.copy_expert(
+        sql.SQL("COPY {staging} ({columns}) FROM STDIN").format(staging=staging, columns=column_list),
+        stream
+    )
+
+    if replace:
+        cur.execute(sql.SQL("DELETE FROM {target}").format(target=target))
+
+    cur.execute(sql.SQL(merge_sql).format(target=target, staging=staging, columns=column_list))
+    merged = cur.rowcount
+    cur.execute(sql.SQL("DROP TABLE {staging}").format(staging=staging))
+
+    return stream.row_count, merged, time.perf_counter() - start
+
+
+FUSE_TYPES_MERGE_SQL = """
+    INSERT INTO {target} ({columns})
+    SELECT {columns} FROM {staging}
+    ON CONFLICT (fuse_type) DO NOTHING
+"""
+
+CIRCUIT_TEMPLATES_COLUMNS = ['description', 'zone', 'voltage', 'cable', 'power', 'phase', 'type']
+
+CIRCUIT_TEMPLATES_MERGE_SQL = """
+    INSERT INTO {target} ({columns})
+    SELECT {columns} FROM {staging}
+"""
+
+
+def circuit_template_rows(templates):
+    """Krotki wartości szablonów w kolejności CIRCUIT_TEMPLATES_COLUMNS"""
+    for template in templates:
+        yield tuple(template[column] for column in CIRCUIT_TEMPLATES_COLUMNS)
+
+
+def _print_copy_stats(loaded, merged, elapsed):
+    rate = loaded / elapsed if elapsed > 0 else float('inf')
+    print(f"   COPY: {loaded} wierszy, wstawiono {merged} w {elapsed:.3f}s ({rate:,.0f} wierszy/s)")
+
+
+def migrate_fuse_types_copy(conn):
+    """Migracja typów bezpieczników przez COPY + INSERT ... SELECT"""
+    print("\n" + "="*60)
+    print("Migracja fuse_types (COPY)")
+    print("="*60)
+
+    cur = conn.cursor()
+
+    try:
+        # fuse_type jest UNIQUE - jak w pętli INSERT wygrywa pierwsze wystąpienie (1-fazowe)
+        rows = {}
+        for fuse_type, phase_type in ([(f, '1φ') for f in FUSE_TYPES_1PHASE] +
+                                      [(f, '3φ') for f in FUSE_TYPES_3PHASE]):
+            rows.setdefault(fuse_type, (fuse_type, phase_type))
+        loaded, merged, elapsed = copy_load(
+            cur, 'fuse_types', ['fuse_type', 'phase_type'], rows.values(), FUSE_TYPES_MERGE_SQL, replace=True
+        )
+        conn.commit()
+        print(f"✅ Wstawiono {merged} typów bezpieczników")
+        _print_copy_stats(loaded, merged, elapsed)
+        cur.close()
+        return True
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd: {e}")
+        cur.close()
+        return False
+
+
+def migrate_circuit_templates_copy(conn, templates=CIRCUIT_TEMPLATES):
+    """Migracja szablonów obwodów przez COPY + INSERT ... SELECT"""
+    print("\n" + "="*60)
+    print("Migracja circuit_templates (COPY)")
+    print("="*60)
+
+    cur = conn.cursor()
+
+    try:
+        loaded, merged, elapsed = copy_load(
+            cur, 'circuit_templates', CIRCUIT_TEMPLATES_COLUMNS, circuit_template_rows(templates),
+            CIRCUIT_TEMPLATES_MERGE_SQL, replace=True
+        )
+        conn.commit()
+        print(f"✅ Wstawiono {merged} szablonów obwodów")
+        _print_copy_stats(loaded, merged, elapsed)
+        cur.close()
+        return True
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd: {e}")
+        cur.close()
+        return False
+
+
+# Kroki migracji dla migration_orchestrator - tabele niezależne od siebie, ładowane równolegle
+VOLT_BASE_DATA_STEPS = [
+    {'name': 'fuse_types', 'run': migrate_fuse_types_copy},
+    {'name': 'circuit_templates', 'run': migrate_circuit_templates_copy},
+]
+
+
+def generate_synthetic_templates(count):
+    """Syntetyczne szablony obwodów do benchmarku (kopie CIRCUIT_TEMPLATES z numerem)"""
+    for i in range(count):
+        template = dict(CIRCUIT_TEMPLATES[i % len(CIRCUIT_TEMPLATES)])
+        template['description'] = f"{template['description']} #{i}"
+        yield template
+
+
+def benchmark_circuit_templates_load(conn, row_count=100000):
+    """Porównanie pętli INSERT (jak w migrate_circuit_templates) z COPY
+
+    Oba warianty działają w transakcji wycofywanej na końcu, więc dane
+    w circuit_templates pozostają nienaruszone.
+    """
+    print("\n" + "="*60)
+    print(f"Benchmark circuit_templates: {row_count} wierszy")
+    print("="*60)
+
+    cur = conn.cursor()
+    results = {}
+
+    try:
+        # Wariant 1: pętla INSERT wiersz po wierszu
+        start = time.perf_counter()
+        for template in generate_synthetic_templates(row_count):
+            cur.execute("""
+                INSERT INTO circuit_templates (description, zone, voltage, cable, power, phase, type)
+                VALUES (%s, %s, %s, %s, %s, %s, %s);
+            """, tuple(template[column] for column in CIRCUIT_TEMPLATES_COLUMNS))
+        results['insert_loop'] = time.perf_counter() - start
+        conn.rollback()
+
+        # Wariant 2: COPY do tabeli tymczasowej + INSERT ... SELECT
+        _, _, results['copy'] = copy_load(
+            cur, 'circuit_templates', CIRCUIT_TEMPLATES_COLUMNS,
+            circuit_template_rows(generate_synthetic_templates(row_count)), CIRCUIT_TEMPLATES_MERGE_SQL
+        )
+        conn.rollback()
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd benchmarku: {e}")
+        cur.close()
+        return None
+
+    cur.close()
+    for method, elapsed in results.items():
+        print(f"   {method:<12} {elapsed:8.3f}s  ({row_count / elapsed:,.0f} wierszy/s)")
+    print(f"   Przyspieszenie COPY: {results['insert_loop'] / results['copy']:.1f}x")
+    return results
+
+
 def main():
     """Główna funkcja migracji"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migracja danych Volt do PostgreSQL')
+    parser.add_argument('--method', choices=['copy', 'insert'], default='copy',
+                        help='copy - COPY FROM STDIN + INSERT ... SELECT (domyślnie), insert - pętla INSERT')
+    parser.add_argument('--benchmark', type=int, metavar='ROWS',
+                        help='Porównaj COPY z pętlą INSERT na ROWS syntetycznych szablonach (bez zapisu)')
+    args = parser.parse_args()
+
     print("\n" + "="*60)
     print("Migracja danych Volt do PostgreSQL")
     print("="*60)
@@ -171,9 +404,17 @@ def main():
     conn = get_connection()
     
     try:
+        if args.benchmark:
+            benchmark_circuit_templates_load(conn, args.benchmark)
+            return
+
         # Migruj dane
-        migrate_fuse_types(conn)
-        migrate_circuit_templates(conn)
+        if args.method == 'copy':
+            # Każda tabela na osobnym połączeniu z puli, we własnej transakcji
+            run_migration_steps(VOLT_BASE_DATA_STEPS)
+        else:
+            migrate_fuse_types(conn)
+            migrate_circuit_templates(conn)
         
         print("\n" + "="*60)
         print("✅ Migracja podstawowych danych zakończona!")
@@ -188,8 +429,8 @@ def main():
         import traceback
         traceback.print_exc()
     finally:
-        conn.close()
-        print("\n🔌 Połączenie zamknięte")
+        release_connection(conn)
+        print("\n🔌 Połączenie zwrócone do puli")
 
 
 if __name__ == "__main__":
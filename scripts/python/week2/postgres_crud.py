@@ -14,28 +14,21 @@ Użycie:
 import os
 import sys
 from datetime import datetime
-from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import sql
 
-# Załaduj zmienne środowiskowe z .env
-load_dotenv()
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-# Konfiguracja połączenia z PostgreSQL
-DB_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'database': os.getenv('POSTGRES_DB', 'postgres'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', '')
-}
+# Konfiguracja połączenia z PostgreSQL (pula połączeń)
+from db_config import DB_CONFIG, get_connection as get_pooled_connection, release_connection
 
 
 def get_connection():
-    """Utwórz połączenie z bazą danych PostgreSQL"""
+    """Pobierz połączenie z puli połączeń PostgreSQL"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pooled_connection()
         print(f"✅ Połączono z bazą danych: {DB_CONFIG['database']}@{DB_CONFIG['host']}")
         return conn
     except psycopg2.Error as e:
@@ -346,9 +339,9 @@ def main():
         print(f"\n❌ Nieoczekiwany błąd: {e}")
         
     finally:
-        # Zamknij połączenie
-        conn.close()
-        print("\n🔌 Połączenie z bazą danych zamknięte")
+        # Zwróć połączenie do puli
+        release_connection(conn)
+        print("\n🔌 Połączenie z bazą danych zwrócone do puli")
 
 
 if __name__ == "__main__":
@@ -5,22 +5,19 @@ Skrypt do zarządzania danymi komponentów elektrycznych w bazie PostgreSQL
 """
 
 import os
+import sys
 import json
+import hashlib
 import psycopg2
 from psycopg2.extras import execute_values
-from dotenv import load_dotenv
 
-# Załadowanie zmiennych środowiskowych
-load_dotenv()
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-# Konfiguracja bazy danych
-DB_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'database': os.getenv('POSTGRES_DB'),
-    'user': os.getenv('POSTGRES_USER'),
-    'password': os.getenv('POSTGRES_PASSWORD')
-}
+# Konfiguracja bazy danych (pula połączeń)
+from db_config import DB_CONFIG, get_connection, release_connection
+from db_export import DEFAULT_ITERSIZE, export_query_to_json
+from catalog_cache import ComponentCatalog, install_catalog_triggers
 
 # Dane typów bezpieczników
 FUSE_TYPES_DATA = [
@@ -48,9 +45,197 @@ FUSE_TYPES_DATA = [
     {'fuse_type': '125A', 'phase_type': '3φ'},
 ]
 
+# Reguły kategorii komponentów - kolejność = priorytet (wygrywa pierwsza pasująca reguła)
+# keywords             - fragment nazwy lub opisu
+# name_keywords        - fragment nazwy
+# description_keywords - fragment opisu
+# id_keywords          - fragment id komponentu
+# id_prefixes          - początek id komponentu
+# ids                  - dokładne id komponentu
+CATEGORY_RULES = [
+    # Zabezpieczenia podstawowe
+    {'category': 'basic_protection',
+     'keywords': ['rozłącznik', 'izolacyjny', 'pen', 'podział', 'półprzewodnik'],
+     'ids': ['isolator', 'pen_splitter']},
+    # Zabezpieczenia nadprądowe (MCB, wyłączniki)
+    {'category': 'overcurrent_protection',
+     'name_keywords': ['wyłącznik'],
+     'description_keywords': ['nadprądowy', 'mc b'],
+     'id_prefixes': ['mcb_']},
+    # Zabezpieczenia przepięciowe
+    {'category': 'surge_protection_detailed',
+     'description_keywords': ['przepięć', 'warystor'],
+     'id_keywords': ['surge', 'spd']},
+    # Sterowanie i automatyka
+    {'category': 'control_automation',
+     'keywords': ['przekaźnik', 'stycznik', 'kontaktor', 'sterowanie', 'automatyka', 'bistabilny', 'timer', 'contactor'],
+     'ids': ['bistable_relay', 'contactor', 'timer_relay', 'smart_module']},
+    # Pomiary i kontrola
+    {'category': 'measurement_control',
+     'keywords': ['amperomierz', 'woltomierz', 'miernik', 'multimetr', 'pomiary', 'kontrola', 'licznik', 'energy_meter'],
+     'ids': ['ammeter', 'voltmeter', 'power_meter', 'phase_indicator', 'spd_indicator']},
+    # Zasilanie awaryjne
+    {'category': 'emergency_special',
+     'keywords': ['awaryjne', 'zasilacz', 'backup', 'akumulator', 'bateria', 'ups'],
+     'ids': ['power_supply_24v', 'power_supply_12v', 'network_generator_switch', 'fire_switch', 'ups_module']},
+    # PV, EV i nowoczesne instalacje
+    {'category': 'pv_ev',
+     'keywords': ['fotowolta', 'pv', 'ev', 'samochód elektryczny', 'ładowarka'],
+     'ids': ['pv_ac_protection', 'pv_dc_disconnect', 'ev_charger_protection', 'ev_energy_meter']},
+    # Elementy łączeniowe i rozdział
+    {'category': 'connection_elements',
+     'keywords': ['blok', 'rozdzielczy', 'rozgałęźny', 'szyna', 'łączeniowe', 'rozdzielacz', 'mostek', 'bridge'],
+     'ids': ['distribution_block', 'branch_distribution_block', 'comb_bridge_1f', 'comb_bridge_3f', 'distribution_busbar']},
+    # Organizacja i estetyka
+    {'category': 'organization',
+     'keywords': ['pusty', 'moduł', 'organizacja', 'estetyka', 'pokrywa', 'ramka', 'etykieta', 'kanał', 'duct'],
+     'ids': ['n_pe_busbar', 'gsu', 'comb_busbar', 'cable_duct', 'module_labels']},
+    # Ochrona i bezpieczeństwo - dodatkowe
+    {'category': 'additional_protection',
+     'keywords': ['awaryjny', 'przeciwpożarowy', 'emergency', 'fire', 'voltage_relay', 'overvoltage_relay'],
+     'ids': ['emergency_switch', 'voltage_relay', 'overvoltage_relay']},
+    # Automatyka i sterowanie - dodatkowe
+    {'category': 'additional_automation',
+     'keywords': ['io_module', 'blind_controller', 'heating_controller', 'current_relay'],
+     'ids': ['current_relay', 'io_module', 'blind_controller', 'heating_controller']},
+    # Zasilanie pomocnicze - dodatkowe
+    {'category': 'auxiliary_power',
+     'keywords': ['priorytet', 'priority'],
+     'ids': ['priority_relay']},
+    # Kable instalacyjne
+    {'category': 'cables',
+     'name_keywords': ['kabel', 'przewód'],
+     'id_prefixes': ['cable_']},
+    # Rzeczy obowiązkowe
+    {'category': 'required',
+     'ids': ['din_rail', 'n_pe_rail', 'rcd_separator', 'blank_module', 'circuit_description', 'door_schematic']},
+]
+
+# Domyślna kategoria
+DEFAULT_CATEGORY = 'other'
+
+class CategoryMatcher:
+    """Reguły CATEGORY_RULES skompilowane raz do tablic wzorców per pole
+
+    Reguła pasuje, gdy pasuje w nazwie, w opisie albo w id - dlatego
+    zwycięska reguła (najniższy indeks) to minimum z najlepszych reguł
+    znalezionych osobno dla każdego pola. Pozwala to:
+    - sprawdzać dla każdego pola tylko wzorce, które go dotyczą,
+    - zapamiętywać wynik dla powtarzających się opisów i id (classify_many),
+    - przerywać skanowanie nazwy po osiągnięciu wyniku z opisu/id.
+    Wynik jest identyczny z sekwencyjnym sprawdzaniem reguł.
+    """
+
+    def __init__(self, rules=CATEGORY_RULES, default_category=DEFAULT_CATEGORY):
+        self.categories = [rule['category'] for rule in rules] + [default_category]
+        self._no_rule = len(rules)
+
+        # Dokładne id -> najwyższy priorytet
+        self._exact_ids = {}
+        for index, rule in enumerate(rules):
+            for comp_id in rule.get('ids', ()):
+                self._exact_ids.setdefault(comp_id, index)
+
+        # (indeks reguły, wzorce) - tylko reguły, które mają wzorce dla danego pola
+        self._name_rules = self._compile(rules, 'keywords', 'name_keywords')
+        self._desc_rules = self._compile(rules, 'keywords', 'description_keywords')
+        self._id_rules = [
+            (index, tuple(rule.get('id_keywords', ())), tuple(rule.get('id_prefixes', ())))
+            for index, rule in enumerate(rules)
+            if rule.get('id_keywords') or rule.get('id_prefixes')
+        ]
+
+    @staticmethod
+    def _compile(rules, *keys):
+        compiled = []
+        for index, rule in enumerate(rules):
+            patterns = tuple(pattern for key in keys for pattern in rule.get(key, ()))
+            if patterns:
+                compiled.append((index, patterns))
+        return compiled
+
+    @staticmethod
+    def _scan(compiled, text, best):
+        """Najlepsza reguła (< best), której wzorzec występuje w tekście"""
+        for index, patterns in compiled:
+            if index >= best:
+                break
+            for pattern in patterns:
+                if pattern in text:
+                    return index
+        return best
+
+    def _match_id(self, comp_id):
+        best = self._exact_ids.get(comp_id, self._no_rule)
+        for index, id_keywords, id_prefixes in self._id_rules:
+            if index >= best:
+                break
+            for keyword in id_keywords:
+                if keyword in comp_id:
+                    return index
+            if id_prefixes and comp_id.startswith(id_prefixes):
+                return index
+        return best
+
+    def _match_desc(self, description):
+        return self._scan(self._desc_rules, description.lower() if description else "", self._no_rule)
+
+    def classify(self, component_id, name, description):
+        """Kategoria pojedynczego komponentu jako (category, subcategory)"""
+        best = min(self._match_id(component_id.lower()), self._match_desc(description))
+        if best:
+            best = self._scan(self._name_rules, name.lower(), best)
+        return self.categories[best], None
+
+    def classify_many(self, components):
+        """Kategorie dla wielu komponentów (słowniki z id, name, description)
+
+        Wynik dla opisu i id jest liczony raz na unikalną wartość - warianty
+        tego samego produktu zwykle mają wspólny opis.
+
+        Returns:
+            list: krotki (category, subcategory) w kolejności wejścia
+        """
+        desc_cache = {}
+        id_cache = {}
+        name_rules = self._name_rules
+        scan = self._scan
+        results = []
+        for comp in components:
+            description = comp.get('description')
+            desc_best = desc_cache.get(description)
+            if desc_best is None:
+                desc_best = desc_cache[description] = self._match_desc(description)
+
+            comp_id = comp['id']
+            id_best = id_cache.get(comp_id)
+            if id_best is None:
+                id_best = id_cache[comp_id] = self._match_id(comp_id.lower())
+
+            best = desc_best if desc_best < id_best else id_best
+            if best:
+                best = scan(name_rules, comp['name'].lower(), best)
+            results.append((self.categories[best], None))
+        return results
+
+
+_category_matcher = CategoryMatcher()
+
+
 # Funkcja do określania kategorii komponentu na podstawie jego nazwy i opisu
 def determine_component_category(component_id, name, description):
     """Określa kategorię komponentu na podstawie jego nazwy i opisu"""
+    return _category_matcher.classify(component_id, name, description)
+
+
+def classify_many(components):
+    """Określa kategorie wielu komponentów naraz (patrz CategoryMatcher.classify_many)"""
+    return _category_matcher.classify_many(components)
+
+
+# Pierwotna, sekwencyjna wersja reguł - wzorzec poprawności i punkt odniesienia dla benchmarku
+def _determine_component_category_sequential(component_id, name, description):
+    """Określa kategorię komponentu sprawdzając reguły jedna po drugiej (wersja referencyjna)"""
     name_lower = name.lower()
     desc_lower = description.lower() if description else ""
     comp_id_lower = component_id.lower()
@@ -134,6 +319,11 @@ def determine_component_category(component_id, name, description):
     # Domyślna kategoria
     return 'other', None
 
+def compute_content_hash(row):
+    """Skrót MD5 treści komponentu (bez id i znaczników czasu) do wykrywania zmian"""
+    payload = json.dumps(row[1:], ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
 # Dane komponentów elektrycznych (z REQUIRED_COMPONENTS z page.tsx)
 ELECTRIC_COMPONENTS = [
     {
@@ -892,17 +1082,60 @@ ELECTRIC_COMPONENTS = [
 ]
 
 
+# Zapytania odczytu (sprawdzane też przez explain_queries.py)
+COMPONENT_HASHES_QUERY = "SELECT id, content_hash FROM electric_components"
+
+COMPONENT_COUNT_QUERY = "SELECT COUNT(*) FROM electric_components"
+
+COMPONENTS_QUERY = """
+    SELECT id, name, fields, price
+    FROM electric_components
+    ORDER BY fields, price, id
+"""
+
+COMPONENTS_BY_FIELDS_QUERY = """
+    SELECT id, name, fields, price
+    FROM electric_components
+    WHERE fields BETWEEN %s AND %s
+    ORDER BY fields, price, id
+"""
+
+COMPONENTS_EXPORT_QUERY = """
+    SELECT id, name, fields, description, price, image, category, subcategory, created_at, updated_at
+    FROM electric_components
+    ORDER BY name
+"""
+
+FUSE_TYPES_QUERY = """
+    SELECT fuse_type, phase_type, rated_current
+    FROM fuse_types
+    ORDER BY phase_type, rated_current
+"""
+
+FUSE_TYPES_BY_PHASE_QUERY = """
+    SELECT fuse_type, phase_type, rated_current
+    FROM fuse_types
+    WHERE phase_type = %s
+    ORDER BY rated_current
+"""
+
+
 class VoltComponentsManager:
-    """Zarządzanie komponentami elektrycznymi w bazie danych PostgreSQL"""
+    """Zarządzanie komponentami elektrycznymi w bazie danych PostgreSQL
+
+    Z catalog (ComponentCatalog) odczyty get_components_by_category
+    i get_fuse_types idą do cache w pamięci zamiast do bazy.
+    """
 
-    def __init__(self):
+    def __init__(self, catalog=None):
         self.connection = None
         self.cursor = None
+        self.catalog = catalog
 
     def connect_to_database(self):
         """Nawiązanie połączenia z bazą danych"""
         try:
-            self.connection = psycopg2.connect(**DB_CONFIG)
+            self.connection = get_connection()
             self.cursor = self.connection.cursor()
 
             # Pobierz nazwę aktualnego schematu
@@ -925,12 +1158,14 @@ class VoltComponentsManager:
             return False
 
     def disconnect_from_database(self):
-        """Zamknięcie połączenia z bazą danych"""
+        """Zwrócenie połączenia do puli"""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
-            print("[SUCCESS] Polaczenie z baza danych zostalo zamkniete")
+            release_connection(self.connection)
+            self.connection = None
+            print("[SUCCESS] Polaczenie z baza danych zostalo zwrocone do puli")
 
     def create_components_table(self):
         """Tworzenie tabeli komponentów elektrycznych"""
@@ -955,6 +1190,7 @@ class VoltComponentsManager:
                     image VARCHAR(500),
                     category VARCHAR(100),
                     subcategory VARCHAR(100),
+                    content_hash CHAR(32),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
@@ -963,13 +1199,13 @@ class VoltComponentsManager:
         else:
             print("[INFO] Tabela electric_components juz istnieje")
 
-        # Dodanie kolumn category i subcategory jeśli nie istnieją (dla kompatybilności wstecznej)
+        # Dodanie kolumn category, subcategory i content_hash jeśli nie istnieją (dla kompatybilności wstecznej)
         try:
             # Sprawdź czy kolumny już istnieją
             self.cursor.execute("""
                 SELECT column_name
                 FROM information_schema.columns
-                WHERE table_name = 'electric_components' AND column_name IN ('category', 'subcategory')
+                WHERE table_name = 'electric_components' AND column_name IN ('category', 'subcategory', 'content_hash')
             """)
             existing_columns = [row[0] for row in self.cursor.fetchall()]
 
@@ -984,11 +1220,17 @@ class VoltComponentsManager:
                 print("[SUCCESS] Dodano kolumnę subcategory")
                 columns_added = True
 
+            if 'content_hash' not in existing_columns:
+                # NULL dla istniejących wierszy - zostaną uzupełnione przy pierwszej synchronizacji
+                self.cursor.execute("ALTER TABLE electric_components ADD COLUMN content_hash CHAR(32)")
+                print("[SUCCESS] Dodano kolumnę content_hash")
+                columns_added = True
+
             if columns_added:
                 self.connection.commit()
-                print("[SUCCESS] Kolumny category i subcategory zostaly dodane do tabeli")
+                print("[SUCCESS] Brakujace kolumny zostaly dodane do tabeli")
             else:
-                print("[INFO] Kolumny category i subcategory juz istnieja")
+                print("[INFO] Kolumny category, subcategory i content_hash juz istnieja")
 
         except psycopg2.Error as e:
             print(f"[WARNING] Nie udalo sie dodac kolumn category/subcategory: {e}")
@@ -1005,13 +1247,35 @@ class VoltComponentsManager:
         except psycopg2.Error as e:
             print(f"[WARNING] Problem z indeksami: {e}")
 
+        # Triggery NOTIFY unieważniające cache katalogu (ComponentCatalog)
+        try:
+            install_catalog_triggers(self.cursor)
+            print("[SUCCESS] Triggery powiadomien katalogu zostaly utworzone")
+        except psycopg2.Error as e:
+            print(f"[WARNING] Problem z triggerami powiadomien: {e}")
+
         self.connection.commit()
         return True
 
-    def insert_components_batch(self, components_data):
-        """Wsadowe wstawianie komponentów do bazy danych"""
+    def get_component_hashes(self):
+        """Pobranie mapy id -> content_hash dla komponentów w bazie"""
+        self.cursor.execute(COMPONENT_HASHES_QUERY)
+        return dict(self.cursor.fetchall())
+
+    def insert_components_batch(self, components_data, force=False):
+        """Przyrostowa synchronizacja komponentów z bazą danych
+
+        Do bazy wysyłane są tylko nowe i zmienione komponenty (porównanie po
+        content_hash). UPSERT dodatkowo pomija aktualizacje bez zmian, więc
+        updated_at zmienia się tylko dla wierszy, których treść faktycznie
+        się zmieniła. force=True wysyła wszystkie komponenty (bez porównania
+        z bazą), ale no-op UPDATE nadal są pomijane.
+
+        Returns:
+            dict: liczniki {'inserted', 'updated', 'unchanged'} lub False przy błędzie
+        """
         insert_query = """
-        INSERT INTO electric_components (id, name, fields, description, price, image, category, subcategory)
+        INSERT INTO electric_components (id, name, fields, description, price, image, category, subcategory, content_hash)
         VALUES %s
         ON CONFLICT (id) DO UPDATE SET
             name = EXCLUDED.name,
@@ -1021,23 +1285,23 @@ class VoltComponentsManager:
             image = EXCLUDED.image,
             category = EXCLUDED.category,
             subcategory = EXCLUDED.subcategory,
+            content_hash = EXCLUDED.content_hash,
             updated_at = CURRENT_TIMESTAMP
+        WHERE electric_components.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        RETURNING (xmax = 0) AS inserted
         """
 
         try:
-            # Przygotowanie danych do wsadowego wstawiania z automatycznym przypisywaniem kategorii
-            values = []
-            for comp in components_data:
-                # Automatyczne przypisanie kategorii jeśli nie jest zdefiniowana
-                category = comp.get('category')
-                subcategory = comp.get('subcategory')
+            # Automatyczne przypisanie kategorii (wsadowo) dla komponentów bez zdefiniowanej kategorii
+            uncategorized = [comp for comp in components_data if comp.get('category') is None]
+            detected = {id(comp): result for comp, result in zip(uncategorized, classify_many(uncategorized))}
 
-                if category is None:
-                    category, subcategory = determine_component_category(
-                        comp['id'], comp['name'], comp['description']
-                    )
+            # Przygotowanie danych do wsadowego wstawiania
+            values = {}
+            for comp in components_data:
+                category, subcategory = detected.get(id(comp), (comp.get('category'), comp.get('subcategory')))
 
-                values.append((
+                row = (
                     comp['id'],
                     comp['name'],
                     comp['fields'],
@@ -1046,16 +1310,33 @@ class VoltComponentsManager:
                     comp['image'],
                     category,
                     subcategory
-                ))
+                )
+                # Powtórzone id - wygrywa ostatnie wystąpienie
+                values[comp['id']] = row + (compute_content_hash(row),)
 
-            # Wsadowe wstawianie danych
-            execute_values(self.cursor, insert_query, values)
+            # Wysyłamy tylko nowe lub zmienione wiersze
+            existing_hashes = {} if force else self.get_component_hashes()
+            changed = [row for comp_id, row in values.items() if existing_hashes.get(comp_id) != row[-1]]
+
+            results = execute_values(self.cursor, insert_query, changed, fetch=True) if changed else []
             self.connection.commit()
+            if self.catalog and changed:
+                # Własne zmiany widoczne od razu, bez czekania na NOTIFY
+                self.catalog.invalidate('electric_components')
 
-            print(f"[SUCCESS] Wsadowo wstawiono/zaktualizowano {len(components_data)} komponentow")
-            return True
+            inserted = sum(1 for (is_insert,) in results if is_insert)
+            stats = {
+                'inserted': inserted,
+                'updated': len(results) - inserted,
+                'unchanged': len(values) - len(results)
+            }
+
+            print(f"[SUCCESS] Zsynchronizowano {len(values)} komponentow: "
+                  f"nowe {stats['inserted']}, zmienione {stats['updated']}, bez zmian {stats['unchanged']}")
+            return stats
 
         except psycopg2.Error as e:
+            self.connection.rollback()
             print(f"[ERROR] Blad wsadowego wstawiania danych: {e}")
             return False
 
@@ -1072,6 +1353,8 @@ class VoltComponentsManager:
 
             execute_values(self.cursor, insert_query, values)
             self.connection.commit()
+            if self.catalog:
+                self.catalog.invalidate('fuse_types')
 
             print(f"[SUCCESS] Wsadowo wstawiono/zaktualizowano {len(fuse_types_data)} typów bezpieczników")
             return True
@@ -1083,22 +1366,16 @@ class VoltComponentsManager:
     def get_fuse_types(self, phase_type=None):
         """Pobieranie typów bezpieczników z opcjonalnym filtrowaniem po typie fazy"""
         try:
+            if self.catalog:
+                return [dict(fuse) for fuse in self.catalog.fuse_types(phase_type)]
+
             if phase_type:
-                self.cursor.execute("""
-                    SELECT fuse_type, phase_type
-                    FROM fuse_types
-                    WHERE phase_type = %s
-                    ORDER BY CAST(REPLACE(fuse_type, 'A', '') AS INTEGER)
-                """, (phase_type,))
+                self.cursor.execute(FUSE_TYPES_BY_PHASE_QUERY, (phase_type,))
             else:
-                self.cursor.execute("""
-                    SELECT fuse_type, phase_type
-                    FROM fuse_types
-                    ORDER BY phase_type, CAST(REPLACE(fuse_type, 'A', '') AS INTEGER)
-                """)
+                self.cursor.execute(FUSE_TYPES_QUERY)
 
             fuse_types = self.cursor.fetchall()
-            return [{'fuse_type': row[0], 'phase_type': row[1]} for row in fuse_types]
+            return [{'fuse_type': row[0], 'phase_type': row[1], 'rated_current': row[2]} for row in fuse_types]
 
         except psycopg2.Error as e:
             print(f"[ERROR] Błąd pobierania typów bezpieczników: {e}")
@@ -1107,7 +1384,7 @@ class VoltComponentsManager:
     def get_component_count(self):
         """Pobranie liczby komponentów w bazie danych"""
         try:
-            self.cursor.execute("SELECT COUNT(*) FROM electric_components")
+            self.cursor.execute(COMPONENT_COUNT_QUERY)
             count = self.cursor.fetchone()[0]
             return count
         except psycopg2.Error as e:
@@ -1117,19 +1394,14 @@ class VoltComponentsManager:
     def get_components_by_category(self, fields_range=None):
         """Pobieranie komponentów z opcjonalnym filtrowaniem po liczbie pól"""
         try:
+            if self.catalog:
+                components = self.catalog.components_by_fields(*(fields_range or (None, None)))
+                return [(comp['id'], comp['name'], comp['fields'], comp['price']) for comp in components]
+
             if fields_range:
-                self.cursor.execute("""
-                    SELECT id, name, fields, price
-                    FROM electric_components
-                    WHERE fields BETWEEN %s AND %s
-                    ORDER BY fields, price
-                """, fields_range)
+                self.cursor.execute(COMPONENTS_BY_FIELDS_QUERY, fields_range)
             else:
-                self.cursor.execute("""
-                    SELECT id, name, fields, price
-                    FROM electric_components
-                    ORDER BY fields, price
-                """)
+                self.cursor.execute(COMPONENTS_QUERY)
 
             components = self.cursor.fetchall()
             return components
@@ -1138,55 +1410,121 @@ class VoltComponentsManager:
             print(f"[ERROR] Blad pobierania komponentow: {e}")
             return []
 
-    def export_components_to_json(self, filename="electric_components_export.json"):
-        """Eksport wszystkich komponentów do pliku JSON"""
-        try:
-            self.cursor.execute("""
-                SELECT id, name, fields, description, price, image, category, subcategory, created_at, updated_at
-                FROM electric_components
-                ORDER BY name
-            """)
+    def export_components_to_json(self, filename="electric_components_export.json", fmt='json',
+                                  pretty=True, itersize=DEFAULT_ITERSIZE):
+        """Strumieniowy eksport wszystkich komponentów do pliku JSON/NDJSON
 
-            components = self.cursor.fetchall()
+        Komponenty są czytane kursorem po stronie serwera i zapisywane
+        na bieżąco, więc pamięć nie rośnie z rozmiarem tabeli. Domyślny
+        format (json, pretty) jest identyczny jak wcześniejszy json.dump(indent=2).
 
-            # Konwersja do formatu JSON
-            components_json = []
-            for comp in components:
-                components_json.append({
-                    'id': comp[0],
-                    'name': comp[1],
-                    'fields': comp[2],
-                    'description': comp[3],
-                    'price': float(comp[4]) if comp[4] else 0,
-                    'image': comp[5],
-                    'category': comp[6],
-                    'subcategory': comp[7],
-                    'created_at': comp[8].isoformat() if comp[8] else None,
-                    'updated_at': comp[9].isoformat() if comp[9] else None
-                })
-
-            # Zapis do pliku
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(components_json, f, indent=2, ensure_ascii=False)
-
-            print(f"[SUCCESS] Wyeksportowano {len(components_json)} komponentow do pliku {filename}")
+        Args:
+            filename: ścieżka pliku lub obiekt z metodą write()
+            fmt (str): 'json' (tablica) lub 'ndjson' (jeden komponent na linię)
+            pretty (bool): wcięcia jak json.dump(indent=2)
+            itersize (int): liczba wierszy pobieranych z bazy w jednej partii
+        """
+        try:
+            count = export_query_to_json(
+                self.connection,
+                COMPONENTS_EXPORT_QUERY,
+                filename,
+                fmt=fmt,
+                pretty=pretty,
+                itersize=itersize,
+                transform=_component_export_record
+            )
+            self.connection.commit()
+
+            print(f"[SUCCESS] Wyeksportowano {count} komponentow do pliku {filename}")
             return True
 
         except (psycopg2.Error, IOError) as e:
+            self.connection.rollback()
             print(f"[ERROR] Blad eksportu danych: {e}")
             return False
 
 
+def _component_export_record(row):
+    """Konwersja wiersza electric_components do formatu eksportu JSON"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'fields': row['fields'],
+        'description': row['description'],
+        'price': float(row['price']) if row['price'] else 0,
+        'image': row['image'],
+        'category': row['category'],
+        'subcategory': row['subcategory'],
+        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+        'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
+    }
+
+
+def generate_synthetic_components(count, seed=42):
+    """Syntetyczne komponenty do benchmarku - warianty ELECTRIC_COMPONENTS z losowymi dopiskami"""
+    import random
+
+    rng = random.Random(seed)
+    suffixes = ['', ' premium', ' wariant B', ' do rozdzielnicy', ' IP65', ' 230V', ' seria X']
+    for i in range(count):
+        base = ELECTRIC_COMPONENTS[i % len(ELECTRIC_COMPONENTS)]
+        yield {
+            # Co trzeci komponent ma id bez dokładnego dopasowania w regułach
+            'id': base['id'] if i % 3 else f"{base['id']}_{i}",
+            'name': f"{base['name']}{rng.choice(suffixes)} #{i}",
+            'description': base.get('description')
+        }
+
+
+def benchmark_category_detection(count=1_000_000):
+    """Benchmark: sekwencyjne reguły vs skompilowany CategoryMatcher (classify_many)"""
+    import time
+
+    print(f"[BENCHMARK] Klasyfikacja {count} syntetycznych komponentow")
+    components = list(generate_synthetic_components(count))
+
+    start = time.perf_counter()
+    expected = [
+        _determine_component_category_sequential(comp['id'], comp['name'], comp['description'])
+        for comp in components
+    ]
+    sequential_time = time.perf_counter() - start
+
+    matcher = CategoryMatcher()
+    start = time.perf_counter()
+    actual = matcher.classify_many(components)
+    compiled_time = time.perf_counter() - start
+    if actual != expected:
+        print("   [ERROR] classify_many: wyniki roznia sie od sekwencyjnych regul")
+
+    print(f"   {'sequential':<14} {sequential_time:8.2f}s  ({count / sequential_time:,.0f} komponentow/s)")
+    print(f"   {'classify_many':<14} {compiled_time:8.2f}s  ({count / compiled_time:,.0f} komponentow/s)  "
+          f"przyspieszenie {sequential_time / compiled_time:.1f}x")
+    return sequential_time, compiled_time
+
+
 def main():
     """Główna funkcja zarządzania komponentami elektrycznymi"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Zarządzanie komponentami elektrycznymi w PostgreSQL')
+    parser.add_argument('--benchmark-categories', type=int, metavar='COUNT',
+                        help='Uruchom tylko benchmark klasyfikacji kategorii na COUNT syntetycznych komponentach')
+    args = parser.parse_args()
+
+    if args.benchmark_categories:
+        benchmark_category_detection(args.benchmark_categories)
+        return
 
     print("=" * 60)
     print("[VOLT] Components Data Management")
     print("Zarządzanie komponentami elektrycznymi w PostgreSQL")
     print("=" * 60)
 
-    # Inicjalizacja managera
-    manager = VoltComponentsManager()
+    # Inicjalizacja managera (odczyty katalogu z cache w pamięci)
+    catalog = ComponentCatalog()
+    manager = VoltComponentsManager(catalog=catalog)
 
     # Połączenie z bazą danych
     if not manager.connect_to_database():
@@ -1245,6 +1583,7 @@ def main():
     finally:
         # Zamknięcie połączenia
         manager.disconnect_from_database()
+        catalog.close()
 
     print("=" * 60)
 
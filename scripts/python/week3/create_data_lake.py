@@ -19,14 +19,41 @@ Skrypt utworzy strukturę katalogów data lake:
 - W S3: w bucketcie voltappbucket (wymaga skonfigurowanych credentials AWS)
 
 Obie struktury zawierają przykładowe dane i dokumentację.
+
+Warstwy staging/ i mart/ to prawdziwe pliki Parquet budowane z surowych
+partycji JSON (lake_parquet.py: jawne schematy, kodowanie słownikowe,
+statystyki kolumn, konfigurowalny rozmiar grupy wierszy):
+    python create_data_lake.py --row-group-size 65536
+
+Surowe dane mogą być zapisane jako NDJSON - jedna encja na plik, kompresja
+gzip/zstd, odczyt strumieniowy (lake_ndjson.py):
+    python create_data_lake.py --raw-format ndjson --compression zstd
+
+Kolejne odświeżenia są przyrostowe (lake_refresh.py: watermark
+mart/_watermark.json, czytane są tylko nowe/zmienione pliki raw):
+    python ../lake_refresh.py data-lake
+
+Każdy zapisany plik jest rejestrowany w manifeście partycji
+({dataset}/{partition}/_manifest.json + {dataset}/_partitions.json, zob.
+lake_manifest.py), więc czytniki planują skan bez listowania prefiksów.
 """
 
 import os
+import sys
 import json
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 import io
 
+# Wspólne moduły data lake (scripts/python/lake_manifest.py, lake_storage.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from lake_manifest import partition_key, split_lake_key, write_partition_file
+from lake_ndjson import COMPRESSION_SUFFIXES, ENTITY_DATE_COLUMNS, NDJSON_COMPRESSION, ndjson_name, write_ndjson_file
+from lake_parquet import PARQUET_ROW_GROUP_SIZE
+from lake_refresh import refresh_parquet_layers
+from lake_storage import LocalLakeStorage, S3LakeStorage
+
 # Configuration
 BUCKET_NAME = "voltappbucket"  # Change this to your desired S3 bucket name
 
@@ -106,8 +133,8 @@ def create_directory_structure_info():
     print()
 
 
-def create_local_sample_raw_data(base_path: str):
-    """Create sample raw data files locally"""
+def create_local_sample_raw_data(base_path: str, raw_format: str = 'json', compression: str = NDJSON_COMPRESSION):
+    """Create sample raw data files locally (raw_format 'json' or 'ndjson', see write_raw_data_file)"""
 
     # Sample user data
     users_data = [
@@ -176,21 +203,18 @@ def create_local_sample_raw_data(base_path: str):
     orders_jan_02 = [order for order in orders_data if order["order_date"] == "2025-01-02"]
 
     # Create raw data files locally
-    raw_path = os.path.join(base_path, "raw")
-
-    # Source1 data for January 1st and 2nd
-    source1_path = os.path.join(raw_path, "source1", "2025", "01")
+    storage = LocalLakeStorage(base_path)
 
     # Pliki są organizowane w strukturze partycjonowanej: raw/source1/2025/01/
     # Każdy plik zawiera dane tylko z jednego dnia w ramach partycji miesięcznej
     data_files = [
-        (os.path.join(source1_path, "data_2025-01-01.json"), {
+        ("raw/source1/2025/01/data_2025-01-01.json", {
             "users": users_jan_01,
             "orders": orders_jan_01,
             "source": "source1",
             "date": "2025-01-01"
         }),
-        (os.path.join(source1_path, "data_2025-01-02.json"), {
+        ("raw/source1/2025/01/data_2025-01-02.json", {
             "users": users_jan_02,
             "orders": orders_jan_02,
             "source": "source1",
@@ -198,14 +222,43 @@ def create_local_sample_raw_data(base_path: str):
         })
     ]
 
-    for file_path, data in data_files:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"Created local raw data file: {file_path}")
+    for key, data in data_files:
+        for written_key in write_raw_data_file(storage, key, data, raw_format, compression):
+            print(f"Created local raw data file: {storage.uri(written_key)}")
+
+
+def write_raw_data_file(storage, key: str, data: dict, raw_format: str = 'json',
+                        compression: str = NDJSON_COMPRESSION):
+    """Write one day of raw data and register it in its partition manifest
+
+    raw_format 'json' writes the whole day as one document under `key`;
+    'ndjson' writes one compressed line-delimited file per entity next to it
+    (orders_2025-01-01.ndjson.gz), which readers can stream in constant memory.
+
+    Returns:
+        list: keys of the written files
+    """
+
+    dataset, partition, name = split_lake_key(key)
+    if raw_format == 'ndjson':
+        keys = []
+        for entity in ("users", "orders"):
+            if not data[entity]:
+                continue
+            entity_name = ndjson_name(entity, data["date"], compression)
+            write_ndjson_file(storage, dataset, partition, entity_name, data[entity], ENTITY_DATE_COLUMNS[entity])
+            keys.append(partition_key(dataset, partition, entity_name))
+        return keys
 
+    rows = len(data["users"]) + len(data["orders"])
+    write_partition_file(storage, dataset, partition, name,
+                         json.dumps(data, indent=2, ensure_ascii=False),
+                         rows=rows, content_type='application/json')
+    return [key]
 
-def create_sample_raw_data(bucket_name: str):
-    """Create sample raw data files in S3"""
+
+def create_sample_raw_data(bucket_name: str, raw_format: str = 'json', compression: str = NDJSON_COMPRESSION):
+    """Create sample raw data files in S3 (raw_format 'json' or 'ndjson', see write_raw_data_file)"""
 
     try:
         s3_client = boto3.client('s3')
@@ -293,18 +346,11 @@ def create_sample_raw_data(bucket_name: str):
             })
         ]
 
+        storage = S3LakeStorage(bucket_name, s3=s3_client)
         for s3_key, data in data_files:
-            # Convert data to JSON string
-            json_data = json.dumps(data, indent=2, ensure_ascii=False)
-
-            # Upload to S3
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=json_data,
-                ContentType='application/json'
-            )
-            print(f"Uploaded raw data file: s3://{bucket_name}/{s3_key}")
+            # Upload to S3 (and register in the partition manifest)
+            for written_key in write_raw_data_file(storage, s3_key, data, raw_format, compression):
+                print(f"Uploaded raw data file: s3://{bucket_name}/{written_key}")
 
         return True
 
@@ -319,59 +365,23 @@ def create_sample_raw_data(bucket_name: str):
         return False
 
 
-def create_local_placeholder_parquet_files(base_path: str):
-    """Create placeholder parquet files locally (empty for now, would contain processed data)"""
-
-    parquet_files = [
-        "staging/customers/customers_cleaned.parquet",
-        "staging/orders/orders_staging.parquet",
-        "mart/customer_summary/customer_metrics.parquet",
-        "mart/sales_dashboard/monthly_sales.parquet"
-    ]
-
-    # Placeholder content for parquet files
-    placeholder_content = """# Placeholder for parquet file
-# In real scenario, this would be a binary parquet file
-# containing processed data
-# This is just a text marker for demonstration purposes
-"""
+def create_local_parquet_files(base_path: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """Build real staging and mart parquet files locally from the raw JSON partitions"""
 
-    for parquet_file in parquet_files:
-        file_path = os.path.join(base_path, parquet_file)
-        with open(file_path, 'w') as f:
-            f.write(placeholder_content)
-        print(f"Created local placeholder parquet file: {file_path}")
+    storage = LocalLakeStorage(base_path)
+    result = refresh_parquet_layers(storage, full=True, row_group_size=row_group_size)
+    for key, entry in result['written'].items():
+        print(f"Created local parquet file: {storage.uri(key)} ({entry['rows']} rows, {entry['size']} bytes)")
 
 
-def create_placeholder_parquet_files(bucket_name: str):
-    """Create placeholder parquet files in S3 (empty for now, would contain processed data)"""
+def create_parquet_files(bucket_name: str, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """Build real staging and mart parquet files in S3 from the raw JSON partitions"""
 
     try:
-        s3_client = boto3.client('s3')
-
-        parquet_files = [
-            "staging/customers/customers_cleaned.parquet",
-            "staging/orders/orders_staging.parquet",
-            "mart/customer_summary/customer_metrics.parquet",
-            "mart/sales_dashboard/monthly_sales.parquet"
-        ]
-
-        # Placeholder content for parquet files
-        placeholder_content = """# Placeholder for parquet file
-# In real scenario, this would be a binary parquet file
-# containing processed data
-# This is just a text marker for demonstration purposes
-"""
-
-        for parquet_file in parquet_files:
-            # Upload placeholder to S3
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key=parquet_file,
-                Body=placeholder_content,
-                ContentType='application/octet-stream'
-            )
-            print(f"Created placeholder parquet file: s3://{bucket_name}/{parquet_file}")
+        storage = S3LakeStorage(bucket_name, s3=boto3.client('s3'))
+        result = refresh_parquet_layers(storage, full=True, row_group_size=row_group_size)
+        for key, entry in result['written'].items():
+            print(f"Created parquet file: s3://{bucket_name}/{key} ({entry['rows']} rows, {entry['size']} bytes)")
 
         return True
 
@@ -379,7 +389,7 @@ def create_placeholder_parquet_files(bucket_name: str):
         print("AWS credentials not found. Please configure AWS CLI or set environment variables.")
         return False
     except ClientError as e:
-        print(f"Error uploading parquet placeholder to S3: {e}")
+        print(f"Error uploading parquet files to S3: {e}")
         return False
     except Exception as e:
         print(f"Unexpected error: {e}")
@@ -423,16 +433,33 @@ data-lake/
 - Contains original, unmodified data
 - Data is partitioned by source and date
 - Files are in JSON format with original structure
+- Optional NDJSON format (`--raw-format ndjson`): one entity per file, gzip/zstd compressed
+  (`orders_2025-01-01.ndjson.gz`), streamed record by record in constant memory
+- Large ERP dumps: `python lake_ndjson.py <location> dump.ndjson.gz --entity orders --date 2025-01-01`
 
 ### Staging Layer
 - Contains cleaned and processed data
 - Data is transformed and standardized
 - Files are in parquet format for better performance
+- Built from the raw JSON partitions with explicit schemas (`lake_parquet.py`),
+  sorted by the main filter column, with min/max statistics per row group
 
 ### Mart Layer
 - Contains aggregated data ready for business analysis
 - Optimized for reporting and dashboard consumption
 - Files are in parquet format with pre-computed metrics
+- Incremental refresh: `python lake_refresh.py <location>` reads only raw files added or changed
+  since `mart/_watermark.json` and rewrites only the affected months/customers (`--full` rebuilds everything)
+
+### Partition Manifests
+- Every partition has a `_manifest.json` listing its files (size, row count, SHA-256)
+- Every dataset (e.g. `raw/source1`) has a `_partitions.json` index of its partitions
+- Readers plan scans from manifests only - no LIST calls on S3
+- Rebuild manifests for existing data: `python lake_manifest.py <location> <dataset> --rebuild`
+- Compact small files: `python lake_compact.py <location> <dataset> --sort-by <column>` merges small files
+  of each partition into ~128 MB files and swaps them in with a single manifest write
+- Date-range reads skip partitions, files and Parquet row groups outside the range:
+  `python lake_reader.py <location> <dataset> --start 2025-01-10 --end 2025-01-12`
 
 ## Partycjonowanie po Dacie - Korzyści Wydajnościowe
 
@@ -540,16 +567,33 @@ s3://{bucket_name}/
 - Contains original, unmodified data
 - Data is partitioned by source and date
 - Files are in JSON format with original structure
+- Optional NDJSON format (`--raw-format ndjson`): one entity per file, gzip/zstd compressed
+  (`orders_2025-01-01.ndjson.gz`), streamed record by record in constant memory
+- Large ERP dumps: `python lake_ndjson.py <location> dump.ndjson.gz --entity orders --date 2025-01-01`
 
 ### Staging Layer
 - Contains cleaned and processed data
 - Data is transformed and standardized
 - Files are in parquet format for better performance
+- Built from the raw JSON partitions with explicit schemas (`lake_parquet.py`),
+  sorted by the main filter column, with min/max statistics per row group
 
 ### Mart Layer
 - Contains aggregated data ready for business analysis
 - Optimized for reporting and dashboard consumption
 - Files are in parquet format with pre-computed metrics
+- Incremental refresh: `python lake_refresh.py <location>` reads only raw files added or changed
+  since `mart/_watermark.json` and rewrites only the affected months/customers (`--full` rebuilds everything)
+
+### Partition Manifests
+- Every partition has a `_manifest.json` listing its files (size, row count, SHA-256)
+- Every dataset (e.g. `raw/source1`) has a `_partitions.json` index of its partitions
+- Readers plan scans from manifests only - no LIST calls on S3
+- Rebuild manifests for existing data: `python lake_manifest.py <location> <dataset> --rebuild`
+- Compact small files: `python lake_compact.py <location> <dataset> --sort-by <column>` merges small files
+  of each partition into ~128 MB files and swaps them in with a single manifest write
+- Date-range reads skip partitions, files and Parquet row groups outside the range:
+  `python lake_reader.py <location> <dataset> --start 2025-01-10 --end 2025-01-12`
 
 ## Partycjonowanie po Dacie - Korzyści Wydajnościowe
 
@@ -643,6 +687,16 @@ aws s3 ls s3://{bucket_name}/ --recursive
 
 def main():
     """Main function to create the data lake structure locally and in S3"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Create the Volt data lake locally and in S3')
+    parser.add_argument('--row-group-size', type=int, default=PARQUET_ROW_GROUP_SIZE,
+                        help=f'Rows per parquet row group (default {PARQUET_ROW_GROUP_SIZE})')
+    parser.add_argument('--raw-format', choices=['json', 'ndjson'], default='json',
+                        help='Raw file format: one JSON document per day or NDJSON per entity (default json)')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION_SUFFIXES), default=NDJSON_COMPRESSION,
+                        help=f'Compression of NDJSON raw files (default {NDJSON_COMPRESSION})')
+    args = parser.parse_args()
 
     # Local data lake path
     local_path = "data-lake"
@@ -660,10 +714,10 @@ def main():
     create_local_directory_structure(local_path)
 
     print("\n2. Creating local sample raw data...")
-    create_local_sample_raw_data(local_path)
+    create_local_sample_raw_data(local_path, args.raw_format, args.compression)
 
-    print("\n3. Creating local placeholder parquet files...")
-    create_local_placeholder_parquet_files(local_path)
+    print("\n3. Building local staging and mart parquet files...")
+    create_local_parquet_files(local_path, args.row_group_size)
 
     print("\n4. Creating local README documentation...")
     create_local_readme(local_path)
@@ -688,13 +742,13 @@ def main():
 
         # Create sample raw data
         print("7. Creating sample raw data...")
-        if not create_sample_raw_data(BUCKET_NAME):
+        if not create_sample_raw_data(BUCKET_NAME, args.raw_format, args.compression):
             success = False
 
         if success:
-            # Create placeholder parquet files
-            print("\n8. Creating placeholder parquet files...")
-            if not create_placeholder_parquet_files(BUCKET_NAME):
+            # Build staging and mart parquet files from the raw data
+            print("\n8. Building staging and mart parquet files...")
+            if not create_parquet_files(BUCKET_NAME, args.row_group_size):
                 success = False
 
             # Create README documentation
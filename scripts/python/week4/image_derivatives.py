@@ -0,0 +1,186 @@
+"""
+Miniatury zdjęć komponentów (WebP/AVIF w kilku szerokościach) dla frontendu
+
+Frontend w wyszukiwarce i popupach konfiguracji wyświetla pełne JPG, choć
+potrzebuje miniatur. Ten etap migracji zdjęć buduje z każdego JPG wersje
+o szerokościach DERIVATIVE_WIDTHS w formatach DERIVATIVE_FORMATS:
+
+    images/components/{component_id}/{width}.webp
+    images/components/{component_id}/{width}.avif
+
+- obrazy są przetwarzane w puli procesów (kodowanie AVIF/WebP obciąża CPU)
+- JPG jest dekodowany od razu w zmniejszonej skali (Image.draft), a kolejne
+  szerokości są liczone od największej, więc pełna rozdzielczość nie jest
+  przetwarzana więcej niż raz
+- istniejąca miniatura nowsza od źródła nie jest budowana ponownie
+- manifest (component_id -> oryginał + lista miniatur) trafia do S3 pod
+  DERIVATIVES_MANIFEST_KEY, żeby klient wybrał najmniejszy pasujący plik
+
+Wymaga Pillow (AVIF: Pillow >= 11.3 lub pillow-avif-plugin).
+"""
+import json
+import mimetypes
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Szerokości (px) i formaty miniatur
+DERIVATIVE_WIDTHS = tuple(int(width) for width in os.getenv('S3_IMAGE_DERIVATIVE_WIDTHS', '160,320,640').split(','))
+DERIVATIVE_FORMATS = tuple(os.getenv('S3_IMAGE_DERIVATIVE_FORMATS', 'webp,avif').split(','))
+DERIVATIVE_QUALITY = {'webp': 80, 'avif': 60}
+DERIVATIVES_DIR = os.getenv('S3_IMAGE_DERIVATIVES_DIR', str(Path(__file__).parent / '.image_derivatives'))
+# Poza prefiksem images/components/, żeby synchronizacja nie traktowała go jako zdjęcia
+DERIVATIVES_MANIFEST_KEY = 'images/derivatives_manifest.json'
+
+# Nazwa pliku miniatury: {width}.{format}
+DERIVATIVE_FILENAME = re.compile(r'^\d+\.(webp|avif)$')
+
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+def is_derivative_filename(filename):
+    """Czy plik w images/components/{id}/ jest miniaturą (a nie oryginałem)"""
+    return DERIVATIVE_FILENAME.match(filename) is not None
+
+def _derivative_info(path, component_id, width, height, fmt):
+    stat = path.stat()
+    return {
+        'path': str(path),
+        'filename': path.name,
+        'component_id': component_id,
+        'size': stat.st_size,
+        'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        'width': width,
+        'height': height,
+        'format': fmt,
+    }
+
+def build_image_derivatives(image_info, output_dir=DERIVATIVES_DIR, widths=DERIVATIVE_WIDTHS,
+                            formats=DERIVATIVE_FORMATS):
+    """Buduje miniatury jednego zdjęcia (funkcja wykonywana w procesie puli)
+
+    Szerokości większe lub równe oryginałowi są pomijane (bez powiększania);
+    jeśli oryginał jest węższy niż wszystkie szerokości, powstaje jedna
+    miniatura w jego szerokości.
+
+    Returns:
+        list: opisy miniatur w formacie find_component_images() + width/height/format
+    """
+    from PIL import Image
+
+    source = Path(image_info['path'])
+    component_id = image_info['component_id']
+    target_dir = Path(output_dir) / component_id
+    target_dir.mkdir(parents=True, exist_ok=True)
+    source_mtime = source.stat().st_mtime
+
+    with Image.open(source) as original:
+        original_width, original_height = original.size
+        targets = sorted({width for width in widths if width < original_width} or {original_width}, reverse=True)
+
+        def height_for(width):
+            return max(1, round(original_height * width / original_width))
+
+        outputs = [(width, fmt, target_dir / f"{width}.{fmt}") for width in targets for fmt in formats]
+        results = []
+        missing = []
+        for width, fmt, path in outputs:
+            if path.exists() and path.stat().st_mtime >= source_mtime:
+                results.append(_derivative_info(path, component_id, width, height_for(width), fmt))
+            else:
+                missing.append((width, fmt, path))
+        if not missing:
+            return sorted(results, key=lambda result: (result['width'], result['format']))
+
+        # Dekodowanie JPG od razu w skali >= największej potrzebnej szerokości
+        largest = max(width for width, _, _ in missing)
+        original.draft('RGB', (largest, height_for(largest)))
+        image = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+        # Tylko szerokości z brakującymi miniaturami - istniejące większe nie są przeliczane
+        # (powiększanie zdekodowanego w mniejszej skali obrazu i ponowne zmniejszanie)
+        for width in sorted({missing_width for missing_width, _, _ in missing}, reverse=True):
+            pending = [(fmt, path) for missing_width, fmt, path in missing if missing_width == width]
+            # Kolejne (mniejsze) szerokości liczone z poprzedniego wyniku
+            image = image.resize((width, height_for(width)), Image.LANCZOS) if image.width != width else image
+            for fmt, path in pending:
+                tmp_path = path.with_suffix(f".{fmt}.tmp")
+                image.save(tmp_path, format=fmt.upper(), quality=DERIVATIVE_QUALITY.get(fmt, 75))
+                os.replace(tmp_path, path)
+                results.append(_derivative_info(path, component_id, width, image.height, fmt))
+
+    return sorted(results, key=lambda result: (result['width'], result['format']))
+
+def _build_safe(args):
+    image_info, output_dir, widths, formats = args
+    try:
+        return image_info, build_image_derivatives(image_info, output_dir, widths, formats), None
+    except Exception as e:
+        return image_info, [], str(e)
+
+def build_all_derivatives(image_files, output_dir=DERIVATIVES_DIR, widths=DERIVATIVE_WIDTHS,
+                          formats=DERIVATIVE_FORMATS, processes=None):
+    """Buduje miniatury wszystkich zdjęć w puli procesów
+
+    Returns:
+        tuple: (miniatury, manifest, błędy) - manifest: component_id -> oryginał + miniatury
+    """
+    derivatives = []
+    manifest = {}
+    failed = []
+    tasks = [(image_info, output_dir, tuple(widths), tuple(formats)) for image_info in image_files]
+    chunksize = max(1, len(tasks) // ((processes or os.cpu_count() or 1) * 4))
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for image_info, results, error in executor.map(_build_safe, tasks, chunksize=chunksize):
+            if error:
+                failed.append({'component_id': image_info['component_id'], 'error': error})
+                print(f"  ❌ {image_info['component_id']}: {error}")
+                continue
+            derivatives.extend(results)
+            manifest[image_info['component_id']] = {
+                'original': {
+                    'key': f"images/components/{image_info['component_id']}/{image_info['filename']}",
+                    'size': image_info['size'],
+                },
+                'derivatives': [
+                    {
+                        'key': f"images/components/{result['component_id']}/{result['filename']}",
+                        'width': result['width'],
+                        'height': result['height'],
+                        'format': result['format'],
+                        'size': result['size'],
+                    }
+                    for result in results
+                ],
+            }
+
+    return derivatives, manifest, failed
+
+def upload_derivatives_manifest(s3, bucket, manifest):
+    """Zapisuje manifest miniatur w S3 (DERIVATIVES_MANIFEST_KEY) i lokalnie obok miniatur"""
+    body = json.dumps({'generated_at': datetime.now().isoformat(), 'components': manifest},
+                      indent=2, ensure_ascii=False, sort_keys=True)
+    Path(DERIVATIVES_DIR).mkdir(parents=True, exist_ok=True)
+    (Path(DERIVATIVES_DIR) / 'manifest.json').write_text(body, encoding='utf-8')
+    s3.put_object(
+        Bucket=bucket,
+        Key=DERIVATIVES_MANIFEST_KEY,
+        Body=body.encode('utf-8'),
+        ContentType='application/json',
+        CacheControl='no-cache'
+    )
+    return DERIVATIVES_MANIFEST_KEY
+
+def summarize_derivatives(image_files, derivatives):
+    """Rozmiar oryginałów vs średni rozmiar miniatury na szerokość/format"""
+    original_bytes = sum(image_info['size'] for image_info in image_files)
+    print(f"   Oryginały: {len(image_files)} plików, {original_bytes / 1024:.0f} KB "
+          f"(średnio {original_bytes / max(1, len(image_files)) / 1024:.1f} KB)")
+    groups = {}
+    for derivative in derivatives:
+        groups.setdefault((derivative['width'], derivative['format']), []).append(derivative['size'])
+    for (width, fmt), sizes in sorted(groups.items()):
+        print(f"   {width:>5}px {fmt:<5}: {len(sizes)} plików, średnio {sum(sizes) / len(sizes) / 1024:.1f} KB")
@@ -2,11 +2,122 @@
 """
 Generator presigned URLs dla bezpiecznego dostępu do zdjęć komponentów w S3
 Data Engineering Roadmap - Week 4: Python + S3 Integration z aplikacją Volt
+
+URL zdjęć komponentów podpisuje lokalnie BatchPresigner (s3_presigner.py).
+Pojedyncze URL przechodzą przez url_cache (PresignedUrlCache): ten sam
+komponent dostaje ten sam URL do końca okna odświeżania, a batch podpisuje
+z tym samym, wyrównanym czasem - przeglądarka i CDN mają trafienia w cache.
+
+Po migracji z --dedup (volt_images_to_s3.py) zdjęcia leżą pod
+images/by-hash/{sha256}: klucz komponentu jest brany z mapowania
+images/component_hashes.json (image_keys), a komponenty spoza mapowania
+dostają dotychczasowy klucz images/components/{id}/{id}.jpg. Mapowanie jest
+pobierane raz; po COMPONENT_HASHES_TTL s odświeża je wątek w tle, a żądania
+URL do tego czasu dostają poprzednią kopię (bez czekania na S3).
+
+Użycie:
+    python presigned_urls.py                                  # demonstracja
+    python presigned_urls.py --ndjson urls.ndjson             # URL dla wszystkich komponentów z bazy
+    python presigned_urls.py --benchmark --count 100000       # boto3 vs BatchPresigner
+    python presigned_urls.py --benchmark --processes 4        # + pula procesów
 """
+import io
 import os
+import sys
 import json
-from datetime import datetime, timedelta
-from s3_config import get_s3_client, s3_config
+import threading
+import time
+from datetime import timedelta
+from s3_config import COMPONENT_HASHES_KEY, S3_IMAGES_PREFIX, content_s3_key, get_s3_client, s3_config
+from s3_presigner import (
+    BatchPresigner,
+    PresignedUrlCache,
+    aligned_signing_time,
+    presign_keys_parallel,
+    write_presigned_ndjson,
+)
+
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# Jak długo (s) trzymać mapowanie component_id -> sha256 przed ponownym pobraniem z S3
+COMPONENT_HASHES_TTL = int(os.getenv('COMPONENT_HASHES_TTL', '300'))
+
+class ComponentImageKeys:
+    """Klucze S3 zdjęć komponentów z mapowania COMPONENT_HASHES_KEY (tryb --dedup)
+
+    Mapowanie jest pobierane z S3 przy pierwszym użyciu (jedyny odczyt, na
+    który czeka żądanie URL). Po `ttl` sekundach pobiera je ponownie wątek
+    w tle, a do tego czasu (i po błędzie odczytu) zwracana jest poprzednia
+    kopia. Brak mapowania albo komponentu w mapowaniu - klucz
+    images/components/{id}/{id}.jpg (migracja bez --dedup).
+    """
+
+    def __init__(self, ttl=COMPONENT_HASHES_TTL, s3=None):
+        self.ttl = ttl
+        self._s3 = s3
+        self._mapping = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        """Mapowanie z S3 ({} - brak pliku mapowania, None - błąd odczytu)"""
+        s3 = self._s3 or get_s3_client()
+        try:
+            response = s3.get_object(Bucket=s3_config.bucket_name, Key=COMPONENT_HASHES_KEY)
+        except s3.exceptions.NoSuchKey:
+            return {}
+        except Exception as e:
+            print(f"⚠️  Nie udało się pobrać {COMPONENT_HASHES_KEY}: {e}")
+            return None
+        components = json.loads(response['Body'].read()).get('components', {})
+        return {str(component_id): content_s3_key(entry['sha256']) for component_id, entry in components.items()}
+
+    def _store(self, mapping):
+        with self._lock:
+            if mapping is not None or self._mapping is None:
+                self._mapping = mapping or {}
+            # Po błędzie też czekamy ttl - bez zapytania do S3 przy każdym URL
+            self._loaded_at = time.monotonic()
+
+    def _refresh(self):
+        try:
+            self._store(self._load())
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def mapping(self):
+        """component_id -> klucz obiektu images/by-hash/{sha256}"""
+        with self._lock:
+            mapping = self._mapping
+            if (mapping is not None and not self._refreshing
+                    and time.monotonic() - self._loaded_at >= self.ttl):
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name='component-hashes-refresh', daemon=True).start()
+        if mapping is not None:
+            return mapping
+        with self._load_lock:
+            if self._mapping is None:
+                self._store(self._load())
+            return self._mapping
+
+    def get(self, component_id):
+        return self.mapping().get(str(component_id)) or legacy_component_image_key(component_id)
+
+    def clear(self):
+        with self._lock:
+            self._mapping = None
+
+# Cache URL zdjęć komponentów (presigner tworzony przy pierwszym użyciu)
+url_cache = PresignedUrlCache()
+image_keys = ComponentImageKeys()
+
+def _local_isoformat(moment):
+    """Czas UTC jako lokalny isoformat (format jak datetime.now().isoformat())"""
+    return moment.astimezone().replace(tzinfo=None).isoformat()
 
 def generate_presigned_url(s3_key, expiration_seconds=3600):
     """
@@ -48,35 +159,66 @@ def generate_component_image_url(component_id, expiration_hours=24):
     Returns:
         dict: Słownik z informacjami o URL lub błędem
     """
-    # Struktura klucza w S3: images/components/{component_id}/{component_id}.jpg
-    s3_key = f"images/components/{component_id}/{component_id}.jpg"
+    s3_key = component_image_key(component_id)
 
-    expiration_seconds = expiration_hours * 3600
-    url = generate_presigned_url(s3_key, expiration_seconds)
-
-    if url:
-        return {
-            'success': True,
-            'component_id': component_id,
-            'presigned_url': url,
-            'expires_in_hours': expiration_hours,
-            'expires_at': (datetime.now() + timedelta(hours=expiration_hours)).isoformat(),
-            's3_key': s3_key
-        }
-    else:
+    try:
+        # Stabilny URL z cache - odświeżany po części czasu ważności
+        url, expires_at = url_cache.get(s3_key, expiration_hours * 3600)
+    except Exception as e:
+        print(f"❌ Błąd generowania presigned URL dla {s3_key}: {e}")
         return {
             'success': False,
             'component_id': component_id,
             'error': 'Nie udało się wygenerować presigned URL'
         }
 
-def batch_generate_presigned_urls(component_ids, expiration_hours=24):
+    return {
+        'success': True,
+        'component_id': component_id,
+        'presigned_url': url,
+        'expires_in_hours': expiration_hours,
+        'expires_at': _local_isoformat(expires_at),
+        's3_key': s3_key
+    }
+
+def legacy_component_image_key(component_id):
+    """Struktura klucza w S3 bez --dedup: images/components/{component_id}/{component_id}.jpg"""
+    return f"{S3_IMAGES_PREFIX}{component_id}/{component_id}.jpg"
+
+def component_image_key(component_id):
+    """Klucz zdjęcia komponentu: images/by-hash/{sha256} z mapowania --dedup albo klucz bez --dedup"""
+    return image_keys.get(component_id)
+
+def iter_component_image_urls(component_ids, expiration_hours=24, processes=None):
+    """Generator (component_id, klucz S3, presigned URL) - podpis lokalny, bez boto3 dla każdego URL
+
+    Args:
+        component_ids: iterowalne ID komponentów
+        expiration_hours (int): czas wygaśnięcia w godzinach
+        processes (int): liczba procesów (None/1 - podpis w bieżącym procesie)
+    """
+    presigner = url_cache.presigner
+    component_ids = list(component_ids)
+    keys = (component_image_key(component_id) for component_id in component_ids)
+    expires_in = expiration_hours * 3600
+    # Ten sam czas podpisu co w url_cache - batch daje te same URL co pojedyncze żądania
+    signed_at = aligned_signing_time(expires_in, url_cache.refresh_fraction)
+    if processes and processes > 1:
+        presigned = presign_keys_parallel(presigner, keys, expires_in, processes, signed_at=signed_at)
+    else:
+        presigned = presigner.presign_keys(keys, expires_in, signed_at)
+    for component_id, (key, url) in zip(component_ids, presigned):
+        yield component_id, key, url
+
+def batch_generate_presigned_urls(component_ids, expiration_hours=24, processes=None, verbose=False):
     """
     Generuje presigned URLs dla wielu komponentów na raz
 
     Args:
         component_ids (list): Lista ID komponentów
         expiration_hours (int): Czas wygaśnięcia w godzinach
+        processes (int): Liczba procesów podpisujących (domyślnie jeden)
+        verbose (bool): Wypisz każdy wygenerowany URL
 
     Returns:
         dict: Wyniki generowania URLs
@@ -89,19 +231,41 @@ def batch_generate_presigned_urls(component_ids, expiration_hours=24):
 
     print(f"🔗 Generowanie presigned URLs dla {len(component_ids)} komponentów...")
 
-    for component_id in component_ids:
-        result = generate_component_image_url(component_id, expiration_hours)
-
-        if result['success']:
-            results['successful'].append(result)
-            print(f"  ✅ {component_id}: URL wygenerowany")
-        else:
-            results['failed'].append(result)
-            print(f"  ❌ {component_id}: {result['error']}")
+    try:
+        signed_at = aligned_signing_time(expiration_hours * 3600, url_cache.refresh_fraction)
+        expires_at = _local_isoformat(signed_at + timedelta(hours=expiration_hours))
+        for component_id, s3_key, url in iter_component_image_urls(component_ids, expiration_hours, processes):
+            results['successful'].append({
+                'success': True,
+                'component_id': component_id,
+                'presigned_url': url,
+                'expires_in_hours': expiration_hours,
+                'expires_at': expires_at,
+                's3_key': s3_key
+            })
+            if verbose:
+                print(f"  ✅ {component_id}: URL wygenerowany")
+    except Exception as e:
+        # Błąd konfiguracji (credentials, czas ważności) dotyczy całego batcha
+        done = {result['component_id'] for result in results['successful']}
+        for component_id in component_ids:
+            if component_id not in done:
+                results['failed'].append({'success': False, 'component_id': component_id, 'error': str(e)})
+        print(f"  ❌ {e}")
 
     results['success_rate'] = f"{len(results['successful'])}/{len(component_ids)}"
     return results
 
+def get_component_ids_from_db():
+    """Wszystkie ID komponentów z bazy danych (jako tekst)"""
+    from db_config import db_connection
+
+    # Połączenie z puli (db_config)
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT id FROM electrical_components ORDER BY id")
+        return [str(row[0]) for row in cursor.fetchall()]
+
 def get_component_image_urls_from_db():
     """
     Pobiera wszystkie component_id z bazy danych i generuje presigned URLs
@@ -110,24 +274,7 @@ def get_component_image_urls_from_db():
         dict: Wyniki z URLs dla wszystkich komponentów
     """
     try:
-        import psycopg2
-        from dotenv import load_dotenv
-        load_dotenv()
-
-        # Połącz z bazą danych
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD'),
-            port=os.getenv('POSTGRES_PORT', '5432')
-        )
-
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT id FROM electrical_components ORDER BY id")
-        component_ids = [str(row[0]) for row in cursor.fetchall()]
-
-        conn.close()
+        component_ids = get_component_ids_from_db()
 
         if not component_ids:
             return {'error': 'Brak komponentów w bazie danych'}
@@ -182,41 +329,123 @@ def main():
 
     result = generate_component_image_url(test_component_id)
     if result['success']:
-        print("✅ URL wygenerowany pomyślnie:"        print(f"   URL: {result['presigned_url']}")
+        print("✅ URL wygenerowany pomyślnie:")
+        print(f"   URL: {result['presigned_url']}")
         print(f"   Wygasa: {result['expires_at']} (za {result['expires_in_hours']}h)")
         print(f"   S3 Key: {result['s3_key']}")
     else:
         print(f"❌ Błąd: {result['error']}")
 
     # Test batch processing ze wszystkich komponentów z bazy
-    print("
-📦 Test batch processing dla wszystkich komponentów z bazy:"    batch_results = get_component_image_urls_from_db()
+    print("\n📦 Test batch processing dla wszystkich komponentów z bazy:")
+    batch_results = get_component_image_urls_from_db()
 
     if 'error' in batch_results:
         print(f"❌ Błąd: {batch_results['error']}")
     else:
-        print("✅ Batch processing zakończony:"        print(f"   Sukces: {batch_results['success_rate']}")
+        print("✅ Batch processing zakończony:")
+        print(f"   Sukces: {batch_results['success_rate']}")
         print(f"   Pomyślnych: {len(batch_results['successful'])}")
         print(f"   Błędnych: {len(batch_results['failed'])}")
 
         if batch_results['successful']:
-            print("
-📋 Przykładowe URLs:"            for item in batch_results['successful'][:3]:  # Pokaż pierwsze 3
+            print("\n📋 Przykładowe URLs:")
+            for item in batch_results['successful'][:3]:  # Pokaż pierwsze 3
                 print(f"   {item['component_id']}: {item['presigned_url'][:80]}...")
 
+    print(f"\n📊 Cache presigned URL: {url_cache.stats()}")
+
 def test_api_response_format():
     """Test formatu odpowiedzi API"""
-    print("
-🧪 Test formatu odpowiedzi API:"    api_response = create_presigned_url_api_response("123", 48)
+    print("\n🧪 Test formatu odpowiedzi API:")
+    api_response = create_presigned_url_api_response("123", 48)
 
     print("Odpowiedź JSON API:")
     print(json.dumps(api_response, indent=2, ensure_ascii=False))
 
+def export_presigned_urls_ndjson(path, expiration_hours=24, processes=None):
+    """Zapisuje presigned URL dla wszystkich komponentów z bazy jako NDJSON (strumieniowo)"""
+    component_ids = get_component_ids_from_db()
+    keys = (component_image_key(component_id) for component_id in component_ids)
+    expires_in = expiration_hours * 3600
+    signed_at = aligned_signing_time(expires_in, url_cache.refresh_fraction)
+
+    start = time.perf_counter()
+    with open(path, 'w', encoding='utf-8') as f:
+        count = write_presigned_ndjson(url_cache.presigner, keys, f, expires_in, processes, signed_at=signed_at)
+    print(f"✅ Zapisano {count} presigned URL do {path} w {time.perf_counter() - start:.2f}s")
+    return count
+
+def benchmark_presigning(count=100000, processes=None):
+    """Porównanie: boto3 generate_presigned_url (klient z cache) vs BatchPresigner"""
+    keys = [legacy_component_image_key(component_id) for component_id in range(count)]
+    s3 = get_s3_client()
+    boto_count = min(count, 5000)
+
+    start = time.perf_counter()
+    for key in keys[:boto_count]:
+        s3.generate_presigned_url('get_object', Params={'Bucket': s3_config.bucket_name, 'Key': key},
+                                  ExpiresIn=3600)
+    boto_rate = boto_count / (time.perf_counter() - start)
+
+    presigner = BatchPresigner.from_s3_config()
+    start = time.perf_counter()
+    for _ in presigner.presign_keys(keys, 3600):
+        pass
+    batch_rate = count / (time.perf_counter() - start)
+
+    print(f"[BENCHMARK] presigned URL ({count} kluczy)")
+    print(f"   boto3:          {boto_rate:10.0f} URL/s  (próbka {boto_count})")
+    print(f"   BatchPresigner: {batch_rate:10.0f} URL/s  (1 proces, x{batch_rate / boto_rate:.0f})")
+
+    sink = io.StringIO()
+    start = time.perf_counter()
+    write_presigned_ndjson(presigner, keys, sink, 3600)
+    ndjson_rate = count / (time.perf_counter() - start)
+    print(f"   + NDJSON:       {ndjson_rate:10.0f} URL/s  (1 proces)")
+
+    # Cache: 80% żądań dotyczy 200 popularnych komponentów, reszta 5000 pozostałych
+    import random
+
+    rng = random.Random(1)
+    requests = [keys[rng.randrange(200)] if rng.random() < 0.8 else keys[rng.randrange(5000)]
+                for _ in range(count)]
+    cache = PresignedUrlCache(presigner, max_entries=1000)
+    start = time.perf_counter()
+    for key in requests:
+        cache.get(key, 3600)
+    cache_rate = count / (time.perf_counter() - start)
+    stats = cache.stats()
+    print(f"   PresignedUrlCache: {cache_rate:7.0f} URL/s  (trafienia {stats['hit_rate']:.1%}, "
+          f"usunięte {stats['evictions']}, cache 1000 URL)")
+
+    if processes and processes > 1:
+        sink = io.StringIO()
+        start = time.perf_counter()
+        write_presigned_ndjson(presigner, keys, sink, 3600, processes)
+        parallel_rate = count / (time.perf_counter() - start)
+        print(f"   + NDJSON:       {parallel_rate:10.0f} URL/s  ({processes} procesy)")
+
 if __name__ == "__main__":
-    # Test połączenia z S3
-    if not s3_config.test_connection():
-        print("❌ Nie można połączyć się z S3. Sprawdź konfigurację.")
-        exit(1)
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Presigned URLs dla zdjęć komponentów Volt')
+    parser.add_argument('--benchmark', action='store_true', help='Porównaj boto3 i BatchPresigner')
+    parser.add_argument('--count', type=int, default=100000, help='Liczba kluczy w benchmarku')
+    parser.add_argument('--processes', type=int, help='Liczba procesów podpisujących')
+    parser.add_argument('--ndjson', metavar='PLIK', help='Zapisz URL wszystkich komponentów z bazy jako NDJSON')
+    parser.add_argument('--hours', type=int, default=24, help='Czas ważności URL w godzinach')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_presigning(args.count, args.processes)
+    elif args.ndjson:
+        export_presigned_urls_ndjson(args.ndjson, args.hours, args.processes)
+    else:
+        # Test połączenia z S3
+        if not s3_config.test_connection():
+            print("❌ Nie można połączyć się z S3. Sprawdź konfigurację.")
+            exit(1)
 
-    main()
-    test_api_response_format()
\ No newline at end of file
+        main()
+        test_api_response_format()
@@ -1,18 +1,101 @@
 """
 Konfiguracja S3 dla aplikacji Volt - Data Engineering Roadmap Week 4
+
+Klienci S3 są cache'owani w procesie: budowa klienta boto3 trwa
+milisekundy i zajmuje sporo pamięci, a klient jest thread-safe, więc
+get_s3_client() zwraca tego samego klienta dla tych samych opcji (osobny
+cache w każdym procesie - po fork() klient rodzica nie jest używany).
+
+Ustawienia klienta (botocore Config) - zmienne środowiskowe:
+    S3_MAX_POOL_CONNECTIONS  - rozmiar puli połączeń HTTP (domyślnie 50)
+    S3_RETRY_MODE            - tryb ponawiania: adaptive / standard / legacy (domyślnie adaptive)
+    S3_MAX_ATTEMPTS          - maksymalna liczba prób żądania (domyślnie 5)
+    S3_CONNECT_TIMEOUT       - timeout połączenia w sekundach (domyślnie 5)
+    S3_READ_TIMEOUT          - timeout odczytu w sekundach (domyślnie 60)
+    S3_TCP_KEEPALIVE         - TCP keepalive dla połączeń (domyślnie true)
+
+Inicjalizacja jest leniwa: import modułu nie importuje boto3, nie czyta
+.env ani nie sprawdza credentials. S3Config powstaje przy pierwszym użyciu
+s3_config (np. s3_config.bucket_name) lub get_s3_client(), więc import
+modułów week4 (także przez parser DAG Airflow) jest szybki i nie kończy się
+błędem przy braku zmiennych AWS.
+
+Użycie:
+    python s3_config.py              # test połączenia
+    python s3_config.py --benchmark  # koszt get_s3_client(): nowy klient vs cache
 """
 import os
-import boto3
-from dotenv import load_dotenv
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+import threading
+import time
+
+def _env_client_options():
+    """Domyślne ustawienia klienta S3 ze zmiennych środowiskowych (czytane przy tworzeniu klienta)"""
+    return {
+        'max_pool_connections': int(os.getenv('S3_MAX_POOL_CONNECTIONS', '50')),
+        'retries': {'mode': os.getenv('S3_RETRY_MODE', 'adaptive'),
+                    'total_max_attempts': int(os.getenv('S3_MAX_ATTEMPTS', '5'))},
+        'connect_timeout': float(os.getenv('S3_CONNECT_TIMEOUT', '5')),
+        'read_timeout': float(os.getenv('S3_READ_TIMEOUT', '60')),
+        'tcp_keepalive': os.getenv('S3_TCP_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes'),
+    }
+
+def build_client_config(**overrides):
+    """botocore Config z domyślnymi ustawieniami Volt, nadpisanymi przez overrides
+
+    Args:
+        **overrides: dowolne argumenty botocore.config.Config, np. max_pool_connections=32
+    """
+    from botocore.config import Config
+
+    options = _env_client_options()
+    options.update(overrides)
+    return Config(**options)
+
+def _options_key(options):
+    """Hashowalny klucz cache z opcji Config (wartości mogą być słownikami)"""
+    return tuple(sorted((name, repr(value)) for name, value in options.items()))
+
+# Kody błędów S3, po których warto ponowić żądanie (throttling, chwilowe błędy serwera)
+RETRYABLE_S3_ERROR_CODES = {
+    'SlowDown', 'RequestTimeout', 'RequestTimeTooSkewed', 'InternalError',
+    'ServiceUnavailable', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+}
+
+# Układ kluczy zdjęć komponentów w buckecie - wspólny dla uploadu (volt_images_to_s3)
+# i generatora URL (presigned_urls)
+S3_IMAGES_PREFIX = 'images/components/'
+S3_CONTENT_PREFIX = 'images/by-hash/'
+COMPONENT_HASHES_KEY = 'images/component_hashes.json'
+
+def content_s3_key(sha256):
+    """Klucz obiektu adresowanego treścią: images/by-hash/{sha256}"""
+    return f"{S3_CONTENT_PREFIX}{sha256}"
+
+def is_retryable_s3_error(error):
+    """Czy błąd żądania S3 jest przejściowy (throttling, 5xx, zerwane połączenie)"""
+    from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, HTTPClientError
 
-# Załaduj zmienne środowiskowe
-load_dotenv()
+    if isinstance(error, (BotocoreConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code', '')
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return code in RETRYABLE_S3_ERROR_CODES or status >= 500
+    return False
+
+def _credential_errors():
+    from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+    return (NoCredentialsError, PartialCredentialsError)
 
 class S3Config:
     """Konfiguracja połączenia z AWS S3"""
 
     def __init__(self):
+        from dotenv import load_dotenv
+
+        # Załaduj zmienne środowiskowe
+        load_dotenv()
+
         self.access_key = os.getenv('AWS_ACCESS_KEY_ID')
         self.secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.region = os.getenv('AWS_DEFAULT_REGION', 'eu-central-1')
@@ -22,28 +105,74 @@ class S3Config:
         if not all([self.access_key, self.secret_key, self.bucket_name]):
             raise ValueError("Brakuje wymaganych zmiennych środowiskowych dla AWS S3")
 
-    def get_s3_client(self):
-        """Zwraca skonfigurowanego klienta S3"""
-        try:
-            return boto3.client(
-                's3',
+        # Cache klientów: (pid, opcje) -> klient; sesja boto3 nie jest thread-safe,
+        # więc tworzenie sesji i klientów odbywa się pod blokadą
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+        self._clients = {}
+
+    def _get_session(self):
+        import boto3
+
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = boto3.session.Session(
                 aws_access_key_id=self.access_key,
                 aws_secret_access_key=self.secret_key,
                 region_name=self.region
             )
-        except (NoCredentialsError, PartialCredentialsError) as e:
+            self._session_pid = os.getpid()
+            self._clients = {}
+        return self._session
+
+    def create_s3_client(self, config=None):
+        """Tworzy nowego klienta S3 (bez cache) - config to botocore.config.Config"""
+        try:
+            with self._lock:
+                return self._get_session().client('s3', config=config or build_client_config())
+        except _credential_errors() as e:
             raise ValueError(f"Błąd konfiguracji AWS credentials: {e}")
 
+    def get_s3_client(self, config=None, **options):
+        """Zwraca skonfigurowanego klienta S3 współdzielonego w procesie
+
+        Args:
+            config: botocore.config.Config - jeśli podany, tworzony jest nowy klient (bez cache)
+            **options: nadpisania domyślnej konfiguracji (build_client_config), np.
+                max_pool_connections=32; klient jest cache'owany per zestaw opcji
+        """
+        if config is not None:
+            return self.create_s3_client(config)
+
+        key = _options_key(options)
+        client = self._clients.get(key) if self._session_pid == os.getpid() else None
+        if client is not None:
+            return client
+
+        try:
+            with self._lock:
+                session = self._get_session()
+                client = self._clients.get(key)
+                if client is None:
+                    client = session.client('s3', config=build_client_config(**options))
+                    self._clients[key] = client
+                return client
+        except _credential_errors() as e:
+            raise ValueError(f"Błąd konfiguracji AWS credentials: {e}")
+
+    def clear_client_cache(self):
+        """Usuwa klientów z cache (np. po zmianie credentials)"""
+        with self._lock:
+            self._session = None
+            self._session_pid = None
+            self._clients = {}
+
     def get_s3_resource(self):
-        """Zwraca skonfigurowany resource S3"""
+        """Zwraca skonfigurowany resource S3 (resource nie jest thread-safe - nowy przy każdym wywołaniu)"""
         try:
-            return boto3.resource(
-                's3',
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=self.region
-            )
-        except (NoCredentialsError, PartialCredentialsError) as e:
+            with self._lock:
+                return self._get_session().resource('s3', config=build_client_config())
+        except _credential_errors() as e:
             raise ValueError(f"Błąd konfiguracji AWS credentials: {e}")
 
     def test_connection(self):
@@ -67,18 +196,92 @@ class S3Config:
             print(f"❌ Błąd połączenia z S3: {e}")
             return False
 
-# Singleton instance
-s3_config = S3Config()
+_s3_config = None
+_s3_config_lock = threading.Lock()
+
+def get_s3_config():
+    """Zwraca instancję S3Config, tworząc ją przy pierwszym wywołaniu"""
+    global _s3_config
+    if _s3_config is None:
+        with _s3_config_lock:
+            if _s3_config is None:
+                _s3_config = S3Config()
+    return _s3_config
+
+class _LazyS3Config:
+    """Pośrednik singletonu - S3Config jest tworzony przy pierwszym dostępie do atrybutu"""
+
+    def __getattr__(self, name):
+        return getattr(get_s3_config(), name)
+
+    def __repr__(self):
+        return repr(_s3_config) if _s3_config is not None else '<S3Config (niezainicjalizowany)>'
+
+# Singleton instance (leniwy)
+s3_config = _LazyS3Config()
 
-def get_s3_client():
-    """Helper function do szybkiego dostępu do klienta S3"""
-    return s3_config.get_s3_client()
+def get_s3_client(config=None, **options):
+    """Helper function do szybkiego dostępu do klienta S3 (cache'owany w procesie)"""
+    return s3_config.get_s3_client(config, **options)
 
 def get_s3_resource():
     """Helper function do szybkiego dostępu do resource S3"""
     return s3_config.get_s3_resource()
 
-if __name__ == "__main__":
+def benchmark_client_overhead(iterations=100):
+    """Koszt uzyskania klienta S3: boto3.client() przy każdym wywołaniu vs cache"""
+    import tracemalloc
+
+    import boto3
+
+    def new_default_client():
+        # Zachowanie sprzed cache - nowy klient (i domyślna sesja) przy każdym wywołaniu
+        return boto3.client(
+            's3',
+            aws_access_key_id=s3_config.access_key,
+            aws_secret_access_key=s3_config.secret_key,
+            region_name=s3_config.region
+        )
+
+    new_default_client()
+    tracemalloc.start()
+    start = time.perf_counter()
+    clients = [new_default_client() for _ in range(iterations)]
+    uncached_time = time.perf_counter() - start
+    uncached_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del clients
+
+    s3_config.clear_client_cache()
+    get_s3_client()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        get_s3_client()
+    cached_time = time.perf_counter() - start
+
+    print(f"[BENCHMARK] {iterations} wywołań get_s3_client()")
+    print(f"   nowy klient: {uncached_time / iterations * 1e3:8.3f} ms/wywołanie, "
+          f"~{uncached_memory / iterations / 1024:.0f} KB pamięci na klienta")
+    print(f"   cache:       {cached_time / iterations * 1e3:8.4f} ms/wywołanie")
+    return uncached_time / iterations, cached_time / iterations
+
+def main():
+    """Test konfiguracji S3"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Konfiguracja S3 dla aplikacji Volt')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Zmierz koszt get_s3_client(): nowy klient vs cache')
+    parser.add_argument('--iterations', type=int, default=100, help='Liczba wywołań w benchmarku')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_client_overhead(args.iterations)
+        return
+
     # Test konfiguracji
     print("Testowanie konfiguracji S3...")
-    s3_config.test_connection()
\ No newline at end of file
+    s3_config.test_connection()
+
+if __name__ == "__main__":
+    main()
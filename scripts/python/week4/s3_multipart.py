@@ -0,0 +1,285 @@
+"""
+Strumieniowy zapis do S3 przez multipart upload (stała pamięć)
+
+S3MultipartWriter to obiekt plikowy z metodą write(): dane (str lub bytes)
+są buforowane do rozmiaru części i od razu wysyłane przez upload_part,
+równolegle w kilku wątkach. W pamięci jest naraz co najwyżej
+(max_concurrency + 1) * part_size bajtów, niezależnie od rozmiaru eksportu,
+więc można do niego pisać bezpośrednio z write_json_stream() czy csv.writer.
+
+- część, której upload się nie powiódł, jest ponawiana (z rosnącym odstępem)
+  bez wysyłania pozostałych części od nowa
+- resume=True: po przerwanym eksporcie niedokończony upload nie jest
+  usuwany; kolejne uruchomienie z tym samym kluczem pobiera listę wysłanych
+  części (list_parts) i pomija te, których MD5 zgadza się z ETag części
+- eksport mniejszy niż jedna część trafia do S3 zwykłym put_object
+
+    from s3_multipart import S3MultipartWriter
+
+    with S3MultipartWriter('raw/components/dt=2024-12-20/components.json',
+                           content_type='application/json') as writer:
+        write_json_stream(records, writer)
+    print(writer.result)
+"""
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from s3_config import get_s3_client, is_retryable_s3_error, s3_config
+
+MIB = 1024 * 1024
+# S3 wymaga części min. 5 MiB (poza ostatnią) i max. 10 000 części
+S3_MIN_PART_SIZE = 5 * MIB
+S3_MAX_PARTS = 10000
+
+MULTIPART_PART_SIZE = int(float(os.getenv('S3_MULTIPART_PART_SIZE_MB', '8')) * MIB)
+MULTIPART_CONCURRENCY = int(os.getenv('S3_MULTIPART_CONCURRENCY', '4'))
+MULTIPART_MAX_ATTEMPTS = int(os.getenv('S3_MULTIPART_MAX_ATTEMPTS', '5'))
+MULTIPART_RETRY_BASE_DELAY = float(os.getenv('S3_MULTIPART_RETRY_BASE_DELAY', '1'))
+
+def find_incomplete_upload(s3, bucket, key):
+    """Najnowszy niedokończony multipart upload dla klucza (None, jeśli brak)"""
+    uploads = []
+    paginator = s3.get_paginator('list_multipart_uploads')
+    for page in paginator.paginate(Bucket=bucket, Prefix=key):
+        uploads.extend(upload for upload in page.get('Uploads', ()) if upload['Key'] == key)
+    if not uploads:
+        return None
+    return max(uploads, key=lambda upload: upload['Initiated'])['UploadId']
+
+def list_uploaded_parts(s3, bucket, key, upload_id):
+    """Części już wysłane w ramach uploadu: numer -> {'etag', 'size'}"""
+    parts = {}
+    paginator = s3.get_paginator('list_parts')
+    for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+        for part in page.get('Parts', ()):
+            parts[part['PartNumber']] = {'etag': part['ETag'].strip('"'), 'size': part['Size']}
+    return parts
+
+class S3MultipartWriter:
+    """Obiekt plikowy wysyłający zapisywane dane do S3 częściami (multipart upload)"""
+
+    def __init__(self, key, bucket=None, s3=None, part_size=MULTIPART_PART_SIZE,
+                 max_concurrency=MULTIPART_CONCURRENCY, content_type='application/octet-stream',
+                 metadata=None, resume=False, max_attempts=MULTIPART_MAX_ATTEMPTS, encoding='utf-8'):
+        """
+        Args:
+            key (str): klucz obiektu w S3
+            bucket (str): bucket (domyślnie s3_config.bucket_name)
+            s3: klient S3 (domyślnie współdzielony klient z pulą >= max_concurrency)
+            part_size (int): rozmiar części w bajtach (min. 5 MiB)
+            max_concurrency (int): maksymalna liczba części wysyłanych równolegle
+            content_type (str): Content-Type obiektu
+            metadata (dict): metadane obiektu
+            resume (bool): wznów niedokończony upload tego klucza i nie usuwaj go po błędzie
+            max_attempts (int): maksymalna liczba prób wysłania jednej części
+            encoding (str): kodowanie danych tekstowych przekazywanych do write()
+        """
+        if part_size < S3_MIN_PART_SIZE:
+            raise ValueError(f"Rozmiar części musi wynosić co najmniej {S3_MIN_PART_SIZE // MIB} MiB")
+
+        self.key = key
+        self.bucket = bucket or s3_config.bucket_name
+        self.max_concurrency = max(1, max_concurrency)
+        self.s3 = s3 or get_s3_client(max_pool_connections=max(10, self.max_concurrency))
+        self.part_size = part_size
+        self.content_type = content_type
+        self.metadata = metadata or {}
+        self.resume = resume
+        self.max_attempts = max_attempts
+        self.encoding = encoding
+
+        self.upload_id = None
+        self.result = None
+        self._buffer = bytearray()
+        self._part_number = 0
+        self._bytes_written = 0
+        self._sha256 = hashlib.sha256()
+        self._completed_parts = {}
+        self._skipped_parts = 0
+        self._previous_parts = {}
+        self._in_flight = set()
+        self._executor = None
+        self._closed = False
+
+    # --- API obiektu plikowego ---
+
+    def write(self, data):
+        """Dopisuje dane (str lub bytes); pełne części są wysyłane od razu"""
+        if self._closed:
+            raise ValueError("Zapis do zamkniętego S3MultipartWriter")
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self._buffer.extend(data)
+        self._bytes_written += len(data)
+        self._sha256.update(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        # Części są wysyłane dopiero po zebraniu part_size bajtów
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._fail()
+        return False
+
+    # --- multipart upload ---
+
+    def _start_upload(self):
+        if self.resume:
+            self.upload_id = find_incomplete_upload(self.s3, self.bucket, self.key)
+            if self.upload_id:
+                self._previous_parts = list_uploaded_parts(self.s3, self.bucket, self.key, self.upload_id)
+                print(f"🔁 Wznawianie uploadu s3://{self.bucket}/{self.key} "
+                      f"({len(self._previous_parts)} części już w S3)")
+        if not self.upload_id:
+            response = self.s3.create_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                ContentType=self.content_type,
+                Metadata=self.metadata
+            )
+            self.upload_id = response['UploadId']
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='volt_s3_part')
+
+    def _upload_part(self, part_number, data):
+        """Wysyła jedną część, ponawiając ją przy błędach przejściowych"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self.s3.upload_part(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    PartNumber=part_number,
+                    Body=data
+                )
+                return part_number, response['ETag']
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable_s3_error(e):
+                    raise
+                delay = random.uniform(0, MULTIPART_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                print(f"   ⏳ Część {part_number}: {e} - ponowna próba {attempt}/{self.max_attempts - 1} "
+                      f"za {delay:.1f}s")
+                time.sleep(delay)
+
+    def _collect(self, return_when=FIRST_COMPLETED):
+        """Odbiera zakończone części; błąd części (po wszystkich próbach) przerywa upload"""
+        done, self._in_flight = wait(self._in_flight, return_when=return_when)
+        for future in done:
+            part_number, etag = future.result()
+            self._completed_parts[part_number] = etag
+
+    def _submit_part(self, data):
+        if self.upload_id is None:
+            self._start_upload()
+
+        self._part_number += 1
+        if self._part_number > S3_MAX_PARTS:
+            raise ValueError(f"Przekroczono limit {S3_MAX_PARTS} części - zwiększ part_size")
+
+        # Część wysłana przy poprzednim uruchomieniu (te same bajty) - pomijamy
+        previous = self._previous_parts.get(self._part_number)
+        if previous and previous['size'] == len(data) and previous['etag'] == hashlib.md5(data).hexdigest():
+            self._completed_parts[self._part_number] = f'"{previous["etag"]}"'
+            self._skipped_parts += 1
+            return
+
+        # Ograniczenie liczby części w pamięci
+        while len(self._in_flight) >= self.max_concurrency:
+            self._collect()
+        self._in_flight.add(self._executor.submit(self._upload_part, self._part_number, data))
+
+    def close(self):
+        """Wysyła resztę danych i kończy upload
+
+        Returns:
+            dict: {'key', 'bytes', 'sha256', 'parts', 'skipped_parts', 'multipart'}
+        """
+        if self._closed:
+            return self.result
+        try:
+            if self.upload_id is None:
+                # Całość mniejsza niż jedna część - zwykły put_object
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self._buffer),
+                    ContentType=self.content_type,
+                    Metadata=self.metadata
+                )
+                self._closed = True
+                self.result = {'key': self.key, 'bytes': self._bytes_written, 'sha256': self._sha256.hexdigest(),
+                               'parts': 1, 'skipped_parts': 0, 'multipart': False}
+                if self.resume:
+                    self._abort_stale_upload()
+                return self.result
+
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            if self._in_flight:
+                self._collect(return_when=ALL_COMPLETED)
+
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': self._completed_parts[number]}
+                    for number in sorted(self._completed_parts)
+                ]}
+            )
+        except BaseException:
+            self._fail()
+            raise
+
+        self._closed = True
+        self._shutdown()
+        self.result = {'key': self.key, 'bytes': self._bytes_written, 'sha256': self._sha256.hexdigest(),
+                       'parts': self._part_number, 'skipped_parts': self._skipped_parts, 'multipart': True}
+        return self.result
+
+    def _abort_stale_upload(self):
+        """Usuwa niedokończony upload klucza, jeśli po wznowieniu całość zmieściła się w put_object"""
+        upload_id = find_incomplete_upload(self.s3, self.bucket, self.key)
+        if upload_id:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+
+    def _shutdown(self):
+        if self._executor is not None:
+            for future in self._in_flight:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _fail(self):
+        """Po błędzie: zostaw upload do wznowienia (resume=True) albo go usuń"""
+        if self._closed:
+            return
+        self._closed = True
+        self._shutdown()
+        if self.upload_id is None:
+            return
+        if self.resume:
+            print(f"⚠️  Upload s3://{self.bucket}/{self.key} przerwany - wysłane części "
+                  f"zostaną użyte przy ponownym uruchomieniu z resume")
+            return
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            print(f"⚠️  Nie udało się usunąć multipart uploadu {self.upload_id}: {e}")
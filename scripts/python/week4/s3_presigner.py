@@ -0,0 +1,311 @@
+"""
+Wsadowe podpisywanie presigned URL (SigV4) bez wywołań sieciowych
+
+Presigned URL to czysta kryptografia lokalna. Generowanie przez boto3
+(generate_presigned_url) przechodzi dla każdego klucza przez cały łańcuch
+zdarzeń botocore, więc przy dziesiątkach tysięcy URL to ono jest wąskim
+gardłem. BatchPresigner liczy podpis bezpośrednio:
+
+- klucz podpisujący SigV4 (HMAC data -> region -> s3 -> aws4_request) jest
+  wyliczany raz na dzień / region / usługę i cache'owany
+- cały batch ma wspólny znacznik czasu X-Amz-Date, więc query string i
+  prefiks "string to sign" są stałe - dla każdego klucza zostaje
+  URL-encode ścieżki, jeden SHA-256 i jeden HMAC
+- presign_keys_parallel() rozdziela klucze na procesy (multiprocessing)
+- PresignedUrlCache (LRU + TTL) zwraca ten sam URL, dopóki nie minie
+  refresh_fraction jego ważności; czas podpisu jest wyrównany do okna
+  odświeżania, więc każdy proces generuje w danym oknie identyczny URL
+  (przeglądarka i CDN mają trafienia w cache)
+
+Generowane URL są identyczne z boto3 (signature_version='s3v4', adres
+virtual-hosted: https://{bucket}.s3.amazonaws.com/{key}).
+
+    from s3_presigner import BatchPresigner
+
+    presigner = BatchPresigner.from_s3_config()
+    for s3_key, url in presigner.presign_keys(keys, expires_in=3600):
+        ...
+"""
+import hashlib
+import hmac
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from s3_config import s3_config
+
+SIGV4_ALGORITHM = 'AWS4-HMAC-SHA256'
+S3_SERVICE = 's3'
+# Maksymalny czas ważności presigned URL podpisanego SigV4 (7 dni)
+MAX_EXPIRES_IN = 7 * 24 * 3600
+
+# Cache presigned URL: maksymalna liczba wpisów i część ważności, po której URL jest odświeżany
+PRESIGNED_CACHE_SIZE = int(os.getenv('PRESIGNED_URL_CACHE_SIZE', '10000'))
+PRESIGNED_REFRESH_FRACTION = float(os.getenv('PRESIGNED_URL_REFRESH_FRACTION', '0.5'))
+
+def _hmac_sha256(key, message):
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+def _is_virtual_host_bucket(bucket):
+    """Bucket może być w nazwie hosta (bez kropek - certyfikat *.s3.amazonaws.com)"""
+    return '.' not in bucket and bucket == bucket.lower() and 3 <= len(bucket) <= 63
+
+class BatchPresigner:
+    """Szybki podpis GET presigned URL (SigV4) dla wielu kluczy jednego bucketu"""
+
+    def __init__(self, access_key, secret_key, region, bucket, session_token=None):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.bucket = bucket
+        self.session_token = session_token
+        self._signing_keys = {}
+
+        if _is_virtual_host_bucket(bucket):
+            # Jak boto3: globalny host virtual-hosted, podpis z regionem bucketu
+            self.host = f"{bucket}.s3.amazonaws.com"
+            self._path_prefix = '/'
+        else:
+            self.host = f"s3.{region}.amazonaws.com"
+            self._path_prefix = f"/{quote(bucket, safe='')}/"
+
+    @classmethod
+    def from_s3_config(cls):
+        """Presigner z credentials i bucketem z s3_config"""
+        return cls(s3_config.access_key, s3_config.secret_key, s3_config.region, s3_config.bucket_name,
+                   os.getenv('AWS_SESSION_TOKEN'))
+
+    def signing_key(self, date_stamp):
+        """Klucz podpisujący SigV4 dla dnia YYYYMMDD (liczony raz na dzień)"""
+        key = self._signing_keys.get(date_stamp)
+        if key is None:
+            key = _hmac_sha256(f"AWS4{self.secret_key}".encode('utf-8'), date_stamp)
+            key = _hmac_sha256(key, self.region)
+            key = _hmac_sha256(key, S3_SERVICE)
+            key = _hmac_sha256(key, 'aws4_request')
+            self._signing_keys = {date_stamp: key}
+        return key
+
+    def presign_keys(self, keys, expires_in=3600, signed_at=None):
+        """Generator (klucz, presigned URL) dla kluczy obiektów
+
+        Args:
+            keys: iterowalne klucze obiektów w S3
+            expires_in (int): czas ważności w sekundach (max. 7 dni)
+            signed_at (datetime): czas podpisu (domyślnie teraz, UTC) - wspólny dla całego batcha
+        """
+        if not 1 <= expires_in <= MAX_EXPIRES_IN:
+            raise ValueError(f"expires_in musi być w zakresie 1..{MAX_EXPIRES_IN} sekund")
+
+        signed_at = (signed_at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        amz_date = signed_at.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/{S3_SERVICE}/aws4_request"
+
+        query = [
+            ('X-Amz-Algorithm', SIGV4_ALGORITHM),
+            ('X-Amz-Credential', f"{self.access_key}/{scope}"),
+            ('X-Amz-Date', amz_date),
+            ('X-Amz-Expires', str(expires_in)),
+        ]
+        if self.session_token:
+            query.append(('X-Amz-Security-Token', self.session_token))
+        query.append(('X-Amz-SignedHeaders', 'host'))
+        query_string = '&'.join(f"{name}={quote(value, safe='-_.~')}" for name, value in query)
+
+        # Stałe części canonical request i string to sign - zmienia się tylko ścieżka
+        canonical_suffix = f"\n{query_string}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD".encode('utf-8')
+        string_to_sign_prefix = f"{SIGV4_ALGORITHM}\n{amz_date}\n{scope}\n".encode('utf-8')
+        url_prefix = f"https://{self.host}"
+        signature_prefix = f"?{query_string}&X-Amz-Signature="
+        path_prefix = self._path_prefix
+
+        # Kopia HMAC z już wczytanym kluczem - dla każdego URL tylko copy() + update()
+        base_hmac = hmac.new(self.signing_key(date_stamp), string_to_sign_prefix, hashlib.sha256)
+        sha256 = hashlib.sha256
+
+        for key in keys:
+            path = path_prefix + quote(key, safe='/~')
+            canonical_hash = sha256(b"GET\n" + path.encode('utf-8') + canonical_suffix).hexdigest()
+            signer = base_hmac.copy()
+            signer.update(canonical_hash.encode('ascii'))
+            yield key, f"{url_prefix}{path}{signature_prefix}{signer.hexdigest()}"
+
+    def presign_url(self, key, expires_in=3600):
+        """Jeden presigned URL (wygodny skrót dla presign_keys)"""
+        return next(self.presign_keys([key], expires_in))[1]
+
+def aligned_signing_time(expires_in, refresh_fraction=PRESIGNED_REFRESH_FRACTION, now=None):
+    """Początek bieżącego okna odświeżania (długość okna = refresh_fraction * expires_in)
+
+    URL podpisany w tym momencie jest ważny jeszcze co najmniej
+    (1 - refresh_fraction) * expires_in, a każdy proces wyznacza ten sam czas
+    podpisu, więc i ten sam URL.
+    """
+    window = max(1, int(expires_in * refresh_fraction))
+    now = now or datetime.now(timezone.utc)
+    timestamp = int(now.timestamp())
+    return datetime.fromtimestamp(timestamp - timestamp % window, timezone.utc)
+
+class PresignedUrlCache:
+    """LRU cache presigned URL z TTL (thread-safe, ograniczona liczba wpisów)
+
+    Klucz cache to (s3_key, expires_in). URL jest zwracany bez zmian do końca
+    okna odświeżania (refresh_fraction jego ważności), potem podpisywany od nowa.
+    """
+
+    def __init__(self, presigner=None, max_entries=PRESIGNED_CACHE_SIZE,
+                 refresh_fraction=PRESIGNED_REFRESH_FRACTION):
+        """
+        Args:
+            presigner (BatchPresigner): domyślnie BatchPresigner.from_s3_config() przy pierwszym użyciu
+            max_entries (int): maksymalna liczba URL w cache (najdawniej używane są usuwane)
+            refresh_fraction (float): część ważności URL (0..1), po której URL jest odświeżany
+        """
+        if not 0 < refresh_fraction <= 1:
+            raise ValueError("refresh_fraction musi być w zakresie (0, 1]")
+        self._presigner = presigner
+        self.max_entries = max_entries
+        self.refresh_fraction = refresh_fraction
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    @property
+    def presigner(self):
+        if self._presigner is None:
+            self._presigner = BatchPresigner.from_s3_config()
+        return self._presigner
+
+    def get(self, s3_key, expires_in=3600):
+        """Presigned URL dla klucza - z cache albo nowo podpisany
+
+        Returns:
+            tuple: (url, expires_at) - expires_at to faktyczny koniec ważności URL (UTC)
+        """
+        now = datetime.now(timezone.utc)
+        cache_key = (s3_key, expires_in)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                url, refresh_at, expires_at = entry
+                if now < refresh_at:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return url, expires_at
+                self.refreshes += 1
+            self.misses += 1
+
+            signed_at = aligned_signing_time(expires_in, self.refresh_fraction, now)
+            url = next(self.presigner.presign_keys([s3_key], expires_in, signed_at))[1]
+            window = max(1, int(expires_in * self.refresh_fraction))
+            expires_at = signed_at + timedelta(seconds=expires_in)
+            self._entries[cache_key] = (url, signed_at + timedelta(seconds=window), expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return url, expires_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Metryki cache: trafienia, chybienia, odświeżenia, usunięcia, rozmiar"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+_worker_presigner = None
+
+def _init_worker(presigner_args):
+    global _worker_presigner
+    _worker_presigner = BatchPresigner(*presigner_args)
+
+def _presign_chunk(task):
+    keys, expires_in, signed_at = task
+    return [url for _, url in _worker_presigner.presign_keys(keys, expires_in, signed_at)]
+
+def _presign_chunk_ndjson(task):
+    keys, expires_in, signed_at = task
+    return ''.join(_ndjson_line(key, url, expires_in)
+                   for key, url in _worker_presigner.presign_keys(keys, expires_in, signed_at))
+
+def _chunks(keys, chunk_size):
+    chunk = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _parallel_map(presigner, worker, keys, expires_in, processes, chunk_size, signed_at=None):
+    from multiprocessing import Pool
+
+    # Wspólny znacznik czasu - URL takie same jak z podpisu w jednym procesie
+    signed_at = signed_at or datetime.now(timezone.utc)
+    presigner_args = (presigner.access_key, presigner.secret_key, presigner.region, presigner.bucket,
+                      presigner.session_token)
+    chunks = _chunks(keys, chunk_size)
+    with Pool(processes, initializer=_init_worker, initargs=(presigner_args,)) as pool:
+        tasks = ((chunk, expires_in, signed_at) for chunk in chunks)
+        yield from pool.imap(worker, tasks)
+
+def presign_keys_parallel(presigner, keys, expires_in=3600, processes=None, chunk_size=20000, signed_at=None):
+    """Jak presigner.presign_keys, ale w puli procesów (kolejność wyników zachowana)
+
+    Koszt przesłania wyników między procesami jest porównywalny z samym
+    podpisem, więc pula opłaca się głównie przy write_presigned_ndjson(processes=...),
+    gdzie procesy zwracają gotowe linie NDJSON.
+    """
+    keys = list(keys)
+    chunks = _parallel_map(presigner, _presign_chunk, keys, expires_in, processes, chunk_size, signed_at)
+    urls = (url for chunk in chunks for url in chunk)
+    yield from zip(keys, urls)
+
+def _ndjson_line(key, url, expires_in):
+    # URL zawiera tylko znaki ASCII bez cudzysłowów i backslashy - escapowany jest tylko klucz
+    return f'{{"s3_key": {json.dumps(key, ensure_ascii=False)}, "presigned_url": "{url}", "expires_in": {expires_in}}}\n'
+
+def write_presigned_ndjson(presigner, keys, sink, expires_in=3600, processes=None, chunk_size=20000,
+                           signed_at=None):
+    """Podpisuje klucze i zapisuje je strumieniowo jako NDJSON: {"s3_key", "presigned_url", "expires_in"}
+
+    Args:
+        presigner (BatchPresigner): presigner
+        keys: iterowalne klucze obiektów
+        sink: obiekt z metodą write()
+        processes (int): liczba procesów (None/1 - podpis w bieżącym procesie)
+
+    Returns:
+        int: liczba zapisanych URL
+    """
+    count = 0
+    if processes and processes > 1:
+        for text in _parallel_map(presigner, _presign_chunk_ndjson, keys, expires_in, processes, chunk_size,
+                                  signed_at):
+            sink.write(text)
+            count += text.count('\n')
+        return count
+
+    for key, url in presigner.presign_keys(keys, expires_in, signed_at):
+        sink.write(_ndjson_line(key, url, expires_in))
+        count += 1
+    return count
@@ -4,165 +4,290 @@ Migracja danych komponentów elektrycznych z PostgreSQL do S3
 Data Engineering Roadmap - Week 4: Python + S3 Integration z aplikacją Volt
 """
 import os
-import json
-import psycopg2
+import sys
 from datetime import datetime
 from dotenv import load_dotenv
-from s3_config import get_s3_client, s3_config
+from itertools import chain
+from s3_config import s3_config
+from s3_multipart import MIB, MULTIPART_CONCURRENCY, MULTIPART_PART_SIZE, S3MultipartWriter
+
+# Dodaj ścieżkę do wspólnej konfiguracji (scripts/python/db_config.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from db_config import get_connection, release_connection
+from db_export import DEFAULT_ITERSIZE, iter_query_rows, write_json_stream
+from lake_manifest import make_file_entry, record_partition_files, split_lake_key
+from lake_storage import S3LakeStorage
 
 # Załaduj zmienne środowiskowe
 load_dotenv()
 
 def get_postgres_connection():
-    """Ustanawia połączenie z PostgreSQL"""
+    """Pobiera połączenie z puli PostgreSQL (oddaj przez release_postgres_connection)"""
     try:
-        return psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD'),
-            port=os.getenv('POSTGRES_PORT', '5432')
-        )
+        return get_connection()
     except Exception as e:
         raise ValueError(f"Błąd połączenia z PostgreSQL: {e}")
 
+def release_postgres_connection(conn):
+    """Zwraca połączenie do puli PostgreSQL"""
+    release_connection(conn)
+
+COMPONENTS_EXPORT_QUERY = """
+    SELECT
+        id,
+        name,
+        type,
+        voltage,
+        current,
+        power,
+        description,
+        price,
+        manufacturer,
+        created_at,
+        updated_at
+    FROM electrical_components
+    ORDER BY id
+"""
+
+def _component_record(component):
+    """Konwertuje datetime do string dla JSON"""
+    if component['created_at']:
+        component['created_at'] = component['created_at'].isoformat()
+    if component['updated_at']:
+        component['updated_at'] = component['updated_at'].isoformat()
+    return component
+
+def iter_components(conn, itersize=DEFAULT_ITERSIZE):
+    """Zwraca komponenty jeden po drugim (kursor po stronie serwera, partie po itersize)"""
+    for component in iter_query_rows(conn, COMPONENTS_EXPORT_QUERY, itersize=itersize):
+        yield _component_record(component)
+
 def export_components_to_json():
     """Eksportuje dane komponentów z PostgreSQL do formatu JSON"""
     conn = None
     try:
         conn = get_postgres_connection()
-        cursor = conn.cursor()
 
         # Pobierz wszystkie komponenty elektryczne
-        cursor.execute("""
-            SELECT
-                id,
-                name,
-                type,
-                voltage,
-                current,
-                power,
-                description,
-                price,
-                manufacturer,
-                created_at,
-                updated_at
-            FROM electrical_components
-            ORDER BY id
-        """)
-
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-
-        # Konwertuj do listy słowników
-        components = []
-        for row in rows:
-            component = dict(zip(columns, row))
-            # Konwertuj datetime do string dla JSON
-            if component['created_at']:
-                component['created_at'] = component['created_at'].isoformat()
-            if component['updated_at']:
-                component['updated_at'] = component['updated_at'].isoformat()
-            components.append(component)
-
-        return components
+        return list(iter_components(conn))
 
     except Exception as e:
         print(f"❌ Błąd podczas eksportu danych: {e}")
         return []
     finally:
         if conn:
-            conn.close()
-
-def upload_components_to_s3(components_data, partition_date=None):
-    """Przesyła dane komponentów do S3"""
+            release_postgres_connection(conn)
+
+def export_components_to_file(sink, fmt='json', pretty=True, itersize=DEFAULT_ITERSIZE):
+    """
+    Strumieniowy eksport komponentów do pliku JSON/NDJSON (stała pamięć)
+
+    Args:
+        sink: ścieżka pliku lub obiekt z metodą write()
+        fmt (str): 'json' (tablica) lub 'ndjson' (jeden komponent na linię)
+        pretty (bool): wcięcia jak json.dump(indent=2)
+        itersize (int): liczba wierszy pobieranych z bazy w jednej partii
+
+    Returns:
+        int: liczba wyeksportowanych komponentów
+    """
+    conn = get_postgres_connection()
+    try:
+        return write_json_stream(iter_components(conn, itersize), sink, fmt, pretty)
+    finally:
+        release_postgres_connection(conn)
+
+def _components_key(partition_date=None, extension='json'):
+    """Klucz eksportu w S3: partycja dt=... albo nazwa ze znacznikiem czasu"""
+    if partition_date:
+        return f"raw/components/dt={partition_date}/components.{extension}"
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"raw/components/components_{timestamp}.{extension}"
+
+def _export_metadata(fmt, record_count=None):
+    """Metadata pliku eksportu (record_count tylko, gdy liczba rekordów jest znana z góry)"""
+    metadata = {
+        'source': 'volt_postgresql',
+        'table': 'electrical_components',
+        'export_timestamp': datetime.now().isoformat(),
+        'format': fmt
+    }
+    if record_count is not None:
+        metadata['record_count'] = str(record_count)
+    return metadata
+
+def _nonempty(records):
+    """Iterator rekordów albo None, gdy nie ma ani jednego (nie wysyłamy pustego pliku)"""
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return None
+    return chain([first], records)
+
+def _iter_nonempty_components(conn, itersize):
+    """Iterator komponentów albo None, gdy tabela jest pusta"""
+    return _nonempty(iter_components(conn, itersize))
+
+def _tag_record_count(writer, record_count):
+    """Liczba rekordów strumienia jest znana dopiero po zapisie - zapisujemy ją jako tag obiektu"""
+    writer.s3.put_object_tagging(
+        Bucket=writer.bucket,
+        Key=writer.key,
+        Tagging={'TagSet': [{'Key': 'record_count', 'Value': str(record_count)}]}
+    )
+
+def _record_in_manifest(writer, record_count, fmt):
+    """Rejestruje eksport w manifeście partycji - konsumenci raw/components/ nie muszą listować prefiksu"""
+    dataset, partition, name = split_lake_key(writer.key)
+    entry = make_file_entry(name, writer.result['bytes'], writer.result['sha256'], record_count, fmt)
+    record_partition_files(S3LakeStorage(writer.bucket, s3=writer.s3), dataset, partition, [entry])
+
+def upload_components_to_s3(components_data, partition_date=None, part_size=MULTIPART_PART_SIZE,
+                            max_concurrency=MULTIPART_CONCURRENCY, resume=False):
+    """Przesyła dane komponentów do S3 (strumieniowo, multipart upload)
+
+    Args:
+        components_data: lista lub dowolny iterator słowników komponentów
+        partition_date (str): partycja dt=YYYY-MM-DD (domyślnie nazwa ze znacznikiem czasu)
+        part_size (int): rozmiar części multipart w bajtach
+        max_concurrency (int): liczba części wysyłanych równolegle
+        resume (bool): wznów przerwany upload tego samego klucza
+    """
+    if not hasattr(components_data, '__len__'):
+        # Pusty generator jest "prawdziwy" - sprawdzamy pierwszy element
+        components_data = _nonempty(components_data)
     if not components_data:
         print("⚠️  Brak danych do przesłania")
         return None
 
     try:
-        s3 = get_s3_client()
-        bucket = s3_config.bucket_name
-
         # Ustal ścieżkę w S3
-        if partition_date:
-            s3_key = f"raw/components/dt={partition_date}/components.json"
-        else:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            s3_key = f"raw/components/components_{timestamp}.json"
-
-        # Konwertuj do JSON string
-        json_data = json.dumps(components_data, indent=2, ensure_ascii=False)
-
-        # Metadata dla pliku
-        metadata = {
-            'source': 'volt_postgresql',
-            'table': 'electrical_components',
-            'record_count': str(len(components_data)),
-            'export_timestamp': datetime.now().isoformat(),
-            'format': 'json'
-        }
-
-        # Upload do S3
-        s3.put_object(
-            Bucket=bucket,
-            Key=s3_key,
-            Body=json_data,
-            ContentType='application/json',
-            Metadata=metadata
-        )
-
-        print(f"✅ Przesłano {len(components_data)} komponentów do s3://{bucket}/{s3_key}")
+        s3_key = _components_key(partition_date, 'json')
+        known_count = len(components_data) if hasattr(components_data, '__len__') else None
+
+        # JSON jest serializowany rekord po rekordzie prosto do części uploadu
+        writer = S3MultipartWriter(s3_key, part_size=part_size, max_concurrency=max_concurrency,
+                                   content_type='application/json',
+                                   metadata=_export_metadata('json', known_count), resume=resume)
+        with writer:
+            record_count = write_json_stream(components_data, writer, fmt='json', pretty=True)
+        if known_count is None:
+            _tag_record_count(writer, record_count)
+        _record_in_manifest(writer, record_count, 'json')
+
+        print(f"✅ Przesłano {record_count} komponentów do s3://{writer.bucket}/{s3_key} "
+              f"({writer.result['bytes'] / 1024 / 1024:.1f} MB, części: {writer.result['parts']})")
         return s3_key
 
     except Exception as e:
         print(f"❌ Błąd podczas uploadu do S3: {e}")
         return None
 
-def export_components_csv_to_s3():
-    """Eksportuje dane jako CSV do S3 (alternatywny format)"""
-    import pandas as pd
+def stream_components_to_s3(partition_date=None, fmt='json', part_size=MULTIPART_PART_SIZE,
+                            max_concurrency=MULTIPART_CONCURRENCY, resume=False, itersize=DEFAULT_ITERSIZE):
+    """Eksport komponentów z PostgreSQL prosto do S3 - kursor po stronie serwera + multipart upload
+
+    Pamięć nie zależy od rozmiaru tabeli: w pamięci jest najwyżej itersize
+    wierszy i (max_concurrency + 1) części uploadu.
+
+    Args:
+        fmt (str): 'json' lub 'ndjson'
 
+    Returns:
+        str: klucz S3 (None przy błędzie)
+    """
+    conn = None
     try:
-        components = export_components_to_json()
-        if not components:
+        conn = get_postgres_connection()
+        components = _iter_nonempty_components(conn, itersize)
+        if components is None:
+            print("⚠️  Brak danych do przesłania")
             return None
 
-        # Konwertuj do DataFrame
-        df = pd.DataFrame(components)
+        s3_key = _components_key(partition_date, fmt)
+        content_type = 'application/json' if fmt == 'json' else 'application/x-ndjson'
+        writer = S3MultipartWriter(s3_key, part_size=part_size, max_concurrency=max_concurrency,
+                                   content_type=content_type, metadata=_export_metadata(fmt), resume=resume)
+        with writer:
+            record_count = write_json_stream(components, writer, fmt=fmt, pretty=True)
+        _tag_record_count(writer, record_count)
+        _record_in_manifest(writer, record_count, fmt)
+
+        print(f"✅ Przesłano {record_count} komponentów do s3://{writer.bucket}/{s3_key} "
+              f"({writer.result['bytes'] / 1024 / 1024:.1f} MB, części: {writer.result['parts']}"
+              + (f", pominięte przy wznowieniu: {writer.result['skipped_parts']}" if writer.result['skipped_parts'] else "")
+              + ")")
+        return s3_key
+
+    except Exception as e:
+        print(f"❌ Błąd podczas strumieniowego eksportu do S3: {e}")
+        return None
+    finally:
+        if conn:
+            release_postgres_connection(conn)
+
+def export_components_csv_to_s3(partition_date=None, part_size=MULTIPART_PART_SIZE,
+                                max_concurrency=MULTIPART_CONCURRENCY, resume=False, itersize=DEFAULT_ITERSIZE):
+    """Eksportuje dane jako CSV do S3 (alternatywny format, strumieniowo)"""
+    import csv
+
+    conn = None
+    try:
+        conn = get_postgres_connection()
+        components = _iter_nonempty_components(conn, itersize)
+        if components is None:
+            print("⚠️  Brak danych do przesłania")
+            return None
 
         # Ustal ścieżkę w S3
-        partition_date = datetime.now().strftime('%Y-%m-%d')
-        s3_key = f"raw/components/dt={partition_date}/components.csv"
-
-        # Konwertuj do CSV
-        csv_data = df.to_csv(index=False)
-
-        # Upload do S3
-        s3 = get_s3_client()
-        s3.put_object(
-            Bucket=s3_config.bucket_name,
-            Key=s3_key,
-            Body=csv_data,
-            ContentType='text/csv',
-            Metadata={
-                'source': 'volt_postgresql',
-                'table': 'electrical_components',
-                'record_count': str(len(components)),
-                'export_timestamp': datetime.now().isoformat(),
-                'format': 'csv'
-            }
-        )
-
-        print(f"✅ Przesłano CSV z {len(components)} komponentami do s3://{s3_config.bucket_name}/{s3_key}")
+        partition_date = partition_date or datetime.now().strftime('%Y-%m-%d')
+        s3_key = _components_key(partition_date, 'csv')
+
+        writer = S3MultipartWriter(s3_key, part_size=part_size, max_concurrency=max_concurrency,
+                                   content_type='text/csv', metadata=_export_metadata('csv'), resume=resume)
+        record_count = 0
+        with writer:
+            csv_writer = None
+            for component in components:
+                if csv_writer is None:
+                    # Kolumny w kolejności z COMPONENTS_EXPORT_QUERY
+                    csv_writer = csv.DictWriter(writer, fieldnames=list(component), lineterminator='\n')
+                    csv_writer.writeheader()
+                csv_writer.writerow(component)
+                record_count += 1
+        _tag_record_count(writer, record_count)
+        _record_in_manifest(writer, record_count, 'csv')
+
+        print(f"✅ Przesłano CSV z {record_count} komponentami do s3://{writer.bucket}/{s3_key}")
         return s3_key
 
     except Exception as e:
         print(f"❌ Błąd podczas eksportu CSV: {e}")
         return None
+    finally:
+        if conn:
+            release_postgres_connection(conn)
 
 def main():
     """Główna funkcja migracji"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migracja danych komponentów z PostgreSQL do S3')
+    parser.add_argument('--partition-date', help='Partycja dt=YYYY-MM-DD dla JSON (domyślnie nazwa ze znacznikiem czasu)')
+    parser.add_argument('--part-size-mb', type=float, default=MULTIPART_PART_SIZE / MIB,
+                        help=f'Rozmiar części multipart w MB (min. 5, domyślnie {MULTIPART_PART_SIZE / MIB:g})')
+    parser.add_argument('--concurrency', type=int, default=MULTIPART_CONCURRENCY,
+                        help=f'Liczba części wysyłanych równolegle (domyślnie {MULTIPART_CONCURRENCY})')
+    parser.add_argument('--resume', action='store_true',
+                        help='Wznów przerwany upload tej samej partycji (wymaga --partition-date)')
+    args = parser.parse_args()
+    if args.resume and not args.partition_date:
+        # Bez partycji klucz zawiera znacznik czasu - nowy przy każdym uruchomieniu, nie ma czego wznawiać
+        parser.error('--resume wymaga --partition-date (stały klucz obiektu w S3)')
+    upload_options = {'part_size': int(args.part_size_mb * MIB), 'max_concurrency': args.concurrency,
+                      'resume': args.resume}
+
     print("🚀 Rozpoczynam migrację danych komponentów z PostgreSQL do S3...")
     print(f"Target bucket: {s3_config.bucket_name}")
 
@@ -171,20 +296,11 @@ def main():
         print("❌ Nie można połączyć się z S3. Sprawdź konfigurację.")
         return
 
-    # Eksport danych
-    components = export_components_to_json()
-
-    if not components:
-        print("❌ Nie udało się pobrać danych z PostgreSQL")
-        return
-
-    print(f"📊 Pobrano {len(components)} komponentów z bazy danych")
-
-    # Upload jako JSON
-    json_key = upload_components_to_s3(components)
+    # Eksport danych prosto z kursora bazy do S3 (bez ładowania tabeli do pamięci)
+    json_key = stream_components_to_s3(args.partition_date, **upload_options)
 
     # Upload jako CSV
-    csv_key = export_components_csv_to_s3()
+    csv_key = export_components_csv_to_s3(args.partition_date, **upload_options)
 
     if json_key or csv_key:
         print("\n✅ Migracja zakończona pomyślnie!")
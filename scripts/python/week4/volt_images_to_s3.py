@@ -2,13 +2,62 @@
 """
 Migracja zdjęć komponentów elektrycznych z lokalnego storage do S3
 Data Engineering Roadmap - Week 4: Python + S3 Integration z aplikacją Volt
+
+Upload działa równolegle: ograniczona pula wątków współdzieli jednego
+klienta S3, każdy plik jest ponawiany z wykładniczym odstępem, a postęp
+jest raportowany na bieżąco (pliki/s, MB/s).
+
+Użycie:
+    python volt_images_to_s3.py                    # domyślnie S3_UPLOAD_CONCURRENCY wątków
+    python volt_images_to_s3.py --concurrency 32   # własny limit równoległości
+    python volt_images_to_s3.py --yes              # bez pytania o potwierdzenie
+    python volt_images_to_s3.py --sync             # tylko nowe/zmienione pliki
+    python volt_images_to_s3.py --sync --delete-orphans   # + usuń z S3 zdjęcia, których nie ma lokalnie
+    python volt_images_to_s3.py --derivatives      # + miniatury WebP/AVIF (image_derivatives.py)
+    python volt_images_to_s3.py --dedup            # adresowanie treścią: images/by-hash/{sha256}
+
+Tryb --sync listuje prefiks images/components/ raz (list_objects_v2 ze
+stronicowaniem) i porównuje rozmiar oraz MD5 pliku z ETag obiektu. MD5 jest
+trzymane w lokalnym manifeście (S3_IMAGE_MANIFEST) razem z rozmiarem i mtime,
+więc niezmienione pliki nie są nawet ponownie czytane z dysku.
+
+Z --derivatives przed uploadem budowane są miniatury (pula procesów), które
+trafiają do images/components/{component_id}/{width}.{webp,avif} razem
+z oryginałami, a ich lista do images/derivatives_manifest.json.
+
+Tryb --dedup zapisuje każdy unikalny plik raz pod images/by-hash/{sha256}
+(identyczne zdjęcia różnych komponentów, np. wariantów kabli, to jeden
+obiekt i jeden PUT). Obiekt pod danym hashem nigdy się nie zmienia, więc
+istniejące hashe są pomijane, a obiekty dostają Cache-Control immutable.
+Mapowanie component_id -> sha256 trafia do images/component_hashes.json.
 """
 import os
 import glob
+import hashlib
+import json
 import mimetypes
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from s3_config import get_s3_client, s3_config
+
+from image_derivatives import (build_all_derivatives, is_derivative_filename, summarize_derivatives,
+                               upload_derivatives_manifest)
+from s3_config import (COMPONENT_HASHES_KEY, S3_CONTENT_PREFIX, S3_IMAGES_PREFIX, content_s3_key, get_s3_client,
+                       is_retryable_s3_error, s3_config)
+
+# Równoległość i ponawianie uploadu
+UPLOAD_CONCURRENCY = int(os.getenv('S3_UPLOAD_CONCURRENCY', '16'))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('S3_UPLOAD_MAX_ATTEMPTS', '4'))
+UPLOAD_RETRY_BASE_DELAY = float(os.getenv('S3_UPLOAD_RETRY_BASE_DELAY', '0.5'))
+
+# Lokalny manifest sumy MD5 (tryb --sync); prefiksy i klucze zdjęć w S3 - s3_config
+IMAGE_MANIFEST_PATH = os.getenv('S3_IMAGE_MANIFEST', str(Path(__file__).parent / '.volt_images_manifest.json'))
+
+# Magazyn adresowany treścią (tryb --dedup)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 def get_local_images_path():
     """Zwraca ścieżkę do lokalnych zdjęć komponentów"""
@@ -42,16 +91,37 @@ def find_component_images():
 
     return image_files
 
-def upload_image_to_s3(image_info):
-    """Przesyła pojedyncze zdjęcie do S3"""
+def image_s3_key(image_info):
+    """Klucz zdjęcia w S3: images/components/{component_id}/{filename} (lub image_info['s3_key'])"""
+    if 's3_key' in image_info:
+        return image_info['s3_key']
+    return f"{S3_IMAGES_PREFIX}{image_info['component_id']}/{image_info['filename']}"
+
+def create_upload_client(concurrency=UPLOAD_CONCURRENCY):
+    """Klient S3 współdzielony przez wątki uploadu (pula połączeń HTTP >= liczba wątków)"""
+    return get_s3_client(max_pool_connections=max(10, concurrency))
+
+def upload_image_to_s3(image_info, s3=None, max_attempts=UPLOAD_MAX_ATTEMPTS):
+    """Przesyła pojedyncze zdjęcie do S3 (z ponawianiem przy błędach przejściowych)
+
+    Args:
+        image_info (dict): opis pliku z find_component_images()
+        s3: współdzielony klient S3 (domyślnie nowy klient)
+        max_attempts (int): maksymalna liczba prób
+
+    Opcjonalne pola image_info: 's3_key' (inny klucz niż images/components/...),
+    'sha256' (zapisywane w metadanych), 'cache_control'.
+    """
+    component_id = image_info['component_id']
+    filename = image_info['filename']
+
     try:
-        s3 = get_s3_client()
+        if s3 is None:
+            s3 = get_s3_client()
         bucket = s3_config.bucket_name
 
         # Struktura w S3: images/components/{component_id}/{filename}
-        component_id = image_info['component_id']
-        filename = image_info['filename']
-        s3_key = f"images/components/{component_id}/{filename}"
+        s3_key = image_s3_key(image_info)
 
         # Określ content type
         content_type, _ = mimetypes.guess_type(filename)
@@ -67,57 +137,457 @@ def upload_image_to_s3(image_info):
             'file_size': str(image_info['size']),
             'last_modified': image_info['modified']
         }
-
-        # Odczytaj plik i prześlij do S3
-        with open(image_info['path'], 'rb') as file:
-            s3.put_object(
-                Bucket=bucket,
-                Key=s3_key,
-                Body=file,
-                ContentType=content_type,
-                Metadata=metadata,
-                # Dodaj tagi
-                Tagging=f"component_id={component_id}&source=volt_migration"
-            )
+        extra_args = {}
+        if 'sha256' in image_info:
+            metadata['sha256'] = image_info['sha256']
+        if 'cache_control' in image_info:
+            extra_args['CacheControl'] = image_info['cache_control']
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                # Odczytaj plik i prześlij do S3 (przy ponowieniu plik jest otwierany od nowa)
+                with open(image_info['path'], 'rb') as file:
+                    response = s3.put_object(
+                        Bucket=bucket,
+                        Key=s3_key,
+                        Body=file,
+                        ContentType=content_type,
+                        Metadata=metadata,
+                        # Dodaj tagi
+                        Tagging=f"component_id={component_id}&source=volt_migration",
+                        **extra_args
+                    )
+                break
+            except Exception as e:
+                if attempt >= max_attempts or not is_retryable_s3_error(e):
+                    raise
+                # Wykładniczy odstęp z losowym rozrzutem (full jitter)
+                time.sleep(random.uniform(0, UPLOAD_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
 
         return {
             'success': True,
             's3_key': s3_key,
             's3_url': f"s3://{bucket}/{s3_key}",
-            'component_id': component_id
+            'component_id': component_id,
+            'size': image_info['size'],
+            'etag': response['ETag'].strip('"'),
+            'attempts': attempt
         }
 
     except Exception as e:
         return {
             'success': False,
             'error': str(e),
-            'component_id': image_info['component_id'],
-            'filename': image_info['filename']
+            'component_id': component_id,
+            'filename': filename
         }
 
-def migrate_images_batch(image_files, batch_size=10):
-    """Migracja zdjęć w partiach"""
+class UploadProgress:
+    """Thread-safe licznik postępu uploadu z raportem przepustowości"""
+
+    def __init__(self, total_files, total_bytes, report_interval=1.0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.report_interval = report_interval
+        self.done_files = 0
+        self.done_bytes = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def update(self, result):
+        with self._lock:
+            self.done_files += 1
+            if result['success']:
+                self.done_bytes += result['size']
+            else:
+                self.failed += 1
+            now = time.perf_counter()
+            if now - self._last_report >= self.report_interval or self.done_files == self.total_files:
+                self._last_report = now
+                print(f"  📊 {self.summary()}")
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def summary(self):
+        elapsed = max(self.elapsed(), 1e-9)
+        return (f"{self.done_files}/{self.total_files} plików "
+                f"({self.done_bytes / 1024 / 1024:.1f}/{self.total_bytes / 1024 / 1024:.1f} MB) | "
+                f"{self.done_files / elapsed:.1f} plików/s | {self.done_bytes / 1024 / 1024 / elapsed:.2f} MB/s | "
+                f"błędy: {self.failed}")
+
+def migrate_images_batch(image_files, concurrency=UPLOAD_CONCURRENCY, s3=None, verbose=True):
+    """Równoległa migracja zdjęć - ograniczona pula wątków ze wspólnym klientem S3
+
+    Do puli trafia naraz co najwyżej 2 * concurrency zadań, więc pamięć nie
+    rośnie z liczbą plików.
+
+    Args:
+        image_files (list): pliki z find_component_images()
+        concurrency (int): maksymalna liczba równoległych uploadów
+        s3: klient S3 (domyślnie create_upload_client(concurrency))
+        verbose (bool): wypisuj wynik każdego pliku
+    """
     results = {
         'successful': [],
         'failed': [],
         'total_processed': 0
     }
+    if not image_files:
+        return results
+
+    concurrency = max(1, concurrency)
+    s3 = s3 or create_upload_client(concurrency)
+    progress = UploadProgress(len(image_files), sum(image['size'] for image in image_files))
+    print(f"📦 Upload {len(image_files)} plików, równolegle: {concurrency}")
+
+    pending_images = iter(image_files)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='volt_s3_upload') as executor:
+        in_flight = set()
+        while True:
+            for image_info in pending_images:
+                in_flight.add(executor.submit(upload_image_to_s3, image_info, s3))
+                if len(in_flight) >= 2 * concurrency:
+                    break
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results['total_processed'] += 1
+                if result['success']:
+                    results['successful'].append(result)
+                    if verbose:
+                        print(f"  ✅ {result['component_id']}: {result['s3_key']}")
+                else:
+                    results['failed'].append(result)
+                    print(f"  ❌ {result['component_id']}: {result['error']}")
+                progress.update(result)
+
+    results['elapsed_seconds'] = progress.elapsed()
+    results['bytes_uploaded'] = progress.done_bytes
+    results['files_per_second'] = results['total_processed'] / max(results['elapsed_seconds'], 1e-9)
+    results['mb_per_second'] = progress.done_bytes / 1024 / 1024 / max(results['elapsed_seconds'], 1e-9)
+    return results
 
-    for i in range(0, len(image_files), batch_size):
-        batch = image_files[i:i + batch_size]
-        print(f"📦 Przetwarzam partię {i//batch_size + 1}/{(len(image_files) + batch_size - 1)//batch_size} ({len(batch)} plików)...")
-
-        for image_info in batch:
-            result = upload_image_to_s3(image_info)
-            results['total_processed'] += 1
-
-            if result['success']:
-                results['successful'].append(result)
-                print(f"  ✅ {result['component_id']}: {result['s3_key']}")
-            else:
-                results['failed'].append(result)
-                print(f"  ❌ {result['component_id']}: {result['error']}")
+def add_image_derivatives(image_files, processes=None):
+    """Buduje miniatury zdjęć i zwraca listę do uploadu: oryginały + miniatury
+
+    Returns:
+        tuple: (pliki do uploadu, manifest miniatur)
+    """
+    start = time.perf_counter()
+    derivatives, manifest, failed = build_all_derivatives(image_files, processes=processes)
+    print(f"🖼️  Miniatury: {len(derivatives)} plików dla {len(manifest)} zdjęć "
+          f"w {time.perf_counter() - start:.2f}s" + (f", błędy: {len(failed)}" if failed else ""))
+    summarize_derivatives(image_files, derivatives)
+    return image_files + derivatives, manifest
+
+def migrate_images_to_s3(concurrency=UPLOAD_CONCURRENCY, image_files=None, verbose=False, derivatives=False,
+                         dedup=False):
+    """Znajdź lokalne zdjęcia i prześlij je równolegle do S3 (np. z DAG Airflow)
+
+    Args:
+        derivatives (bool): zbuduj i prześlij też miniatury WebP/AVIF
+        dedup (bool): zapisz zdjęcia w images/by-hash/ (migrate_images_deduplicated, bez miniatur)
+
+    Returns:
+        dict: raport z generate_migration_report()
+    """
+    if image_files is None:
+        image_files = find_component_images()
+    if dedup:
+        results = migrate_images_deduplicated(image_files, concurrency=concurrency, verbose=verbose)
+        return generate_migration_report(results)
+    derivatives_manifest = None
+    if derivatives:
+        image_files, derivatives_manifest = add_image_derivatives(image_files)
+    s3 = create_upload_client(concurrency)
+    results = migrate_images_batch(image_files, concurrency=concurrency, s3=s3, verbose=verbose)
+    if derivatives_manifest is not None:
+        upload_derivatives_manifest(s3, s3_config.bucket_name, derivatives_manifest)
+    return generate_migration_report(results)
+
+def list_remote_images(s3, prefix=S3_IMAGES_PREFIX):
+    """Wszystkie obiekty pod prefiksem (list_objects_v2 ze stronicowaniem, 1000 kluczy na stronę)
+
+    Returns:
+        dict: klucz -> {'size', 'etag'}
+    """
+    remote = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=s3_config.bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', ()):
+            remote[obj['Key']] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+    return remote
+
+def load_image_manifest(path=IMAGE_MANIFEST_PATH):
+    """Manifest ostatniej synchronizacji: ścieżka pliku -> {'size', 'modified', 'md5', 'etag'}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Nie można odczytać manifestu {path} ({e}) - sumy MD5 zostaną policzone od nowa")
+        return {}
+
+def save_image_manifest(manifest, path=IMAGE_MANIFEST_PATH):
+    """Zapisuje manifest atomowo (plik tymczasowy + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def file_digests(path, chunk_size=1024 * 1024):
+    """MD5 i SHA-256 pliku (hex) - jeden odczyt w kawałkach
+
+    Returns:
+        tuple: (md5, sha256)
+    """
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+            sha256.update(chunk)
+    return md5.hexdigest(), sha256.hexdigest()
+
+def _manifest_entry(image_info, manifest):
+    """Wpis manifestu dla pliku - sumy liczone tylko, gdy zmienił się rozmiar lub mtime"""
+    entry = manifest.get(image_info['path'])
+    if entry and entry['size'] == image_info['size'] and entry['modified'] == image_info['modified']:
+        if 'sha256' not in entry:
+            # Manifest sprzed trybu --dedup
+            entry['md5'], entry['sha256'] = file_digests(image_info['path'])
+        return entry
+    md5, sha256 = file_digests(image_info['path'])
+    entry = {'size': image_info['size'], 'modified': image_info['modified'], 'md5': md5, 'sha256': sha256}
+    manifest[image_info['path']] = entry
+    return entry
+
+def plan_image_sync(image_files, remote, manifest):
+    """Dzieli lokalne zdjęcia na do wysłania / niezmienione i wyznacza osierocone klucze w S3
+
+    Plik jest niezmieniony, gdy obiekt istnieje, ma ten sam rozmiar, a ETag
+    równa się MD5 pliku. ETag obiektu multipart (z '-') nie jest MD5 - wtedy
+    porównywany jest z ETag zapisanym w manifeście przy ostatnim uploadzie.
+
+    Miniatury ({width}.webp/.avif) zdjęć, które nadal istnieją lokalnie, nie są
+    osierocone, jeśli lista nie zawiera miniatur (synchronizacja bez --derivatives).
+
+    Returns:
+        tuple: (do_wyslania, liczba_niezmienionych, osierocone_klucze)
+    """
+    to_upload = []
+    unchanged = 0
+    local_keys = set()
+    for image_info in image_files:
+        key = image_s3_key(image_info)
+        local_keys.add(key)
+        obj = remote.get(key)
+        if obj is None or obj['size'] != image_info['size']:
+            to_upload.append(image_info)
+            continue
+
+        entry = _manifest_entry(image_info, manifest)
+        if '-' in obj['etag']:
+            same = entry.get('etag') == obj['etag']
+        else:
+            same = entry['md5'] == obj['etag']
+        if same:
+            entry['etag'] = obj['etag']
+            unchanged += 1
+        else:
+            to_upload.append(image_info)
+
+    with_derivatives = any('width' in image_info for image_info in image_files)
+    local_components = {image_info['component_id'] for image_info in image_files}
+
+    def is_orphan(key):
+        if key in local_keys:
+            return False
+        component_id, _, filename = key[len(S3_IMAGES_PREFIX):].rpartition('/')
+        return with_derivatives or not is_derivative_filename(filename) or component_id not in local_components
+
+    orphans = sorted(key for key in remote if is_orphan(key))
+    return to_upload, unchanged, orphans
+
+def delete_s3_objects(s3, keys):
+    """Usuwa obiekty partiami po 1000 kluczy (limit delete_objects)
+
+    Returns:
+        list: klucze, których nie udało się usunąć
+    """
+    failed = []
+    for start in range(0, len(keys), 1000):
+        batch = keys[start:start + 1000]
+        response = s3.delete_objects(
+            Bucket=s3_config.bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        failed.extend(error['Key'] for error in response.get('Errors', ()))
+    return failed
+
+def sync_images_to_s3(image_files=None, concurrency=UPLOAD_CONCURRENCY, delete_orphans=False,
+                      manifest_path=IMAGE_MANIFEST_PATH, dry_run=False, verbose=True):
+    """Przyrostowa synchronizacja zdjęć - jedno listowanie S3 i upload tylko nowych/zmienionych plików
+
+    Args:
+        image_files (list): pliki z find_component_images() (domyślnie skan katalogu)
+        concurrency (int): maksymalna liczba równoległych uploadów
+        delete_orphans (bool): usuń z S3 zdjęcia, których nie ma lokalnie
+        manifest_path (str): ścieżka manifestu MD5 (None - bez manifestu, MD5 zawsze liczone)
+        dry_run (bool): tylko pokaż plan, nic nie wysyłaj ani nie usuwaj
+
+    Returns:
+        dict: wyniki jak migrate_images_batch() + 'unchanged', 'orphans', 'deleted'
+    """
+    if image_files is None:
+        image_files = find_component_images()
+    s3 = create_upload_client(concurrency)
+    manifest = load_image_manifest(manifest_path) if manifest_path else {}
+
+    start = time.perf_counter()
+    remote = list_remote_images(s3)
+    to_upload, unchanged, orphans = plan_image_sync(image_files, remote, manifest)
+    print(f"🔍 S3: {len(remote)} obiektów, lokalnie: {len(image_files)} zdjęć "
+          f"(porównanie w {time.perf_counter() - start:.2f}s)")
+    print(f"   Do wysłania: {len(to_upload)}, bez zmian: {unchanged}, osierocone w S3: {len(orphans)}")
+
+    if dry_run:
+        for image_info in to_upload:
+            print(f"   ⬆️  {image_s3_key(image_info)}")
+        for key in orphans:
+            print(f"   🗑️  {key}" + ("" if delete_orphans else " (pozostaje - brak --delete-orphans)"))
+        results = {'successful': [], 'failed': [], 'total_processed': 0}
+    else:
+        results = migrate_images_batch(to_upload, concurrency=concurrency, s3=s3, verbose=verbose)
+        uploaded = {image_s3_key(image_info): image_info for image_info in to_upload}
+        for result in results['successful']:
+            _manifest_entry(uploaded[result['s3_key']], manifest)['etag'] = result['etag']
+
+    results['unchanged'] = unchanged
+    results['orphans'] = orphans
+    results['deleted'] = []
+    if delete_orphans and orphans and not dry_run:
+        failed = delete_s3_objects(s3, orphans)
+        results['deleted'] = [key for key in orphans if key not in set(failed)]
+        print(f"🗑️  Usunięto osierocone obiekty: {len(results['deleted'])}"
+              + (f", błędy: {len(failed)}" if failed else ""))
+
+    if manifest_path and not dry_run:
+        # Usuń wpisy plików, których już nie ma lokalnie
+        local_paths = {image_info['path'] for image_info in image_files}
+        for path in [path for path in manifest if path not in local_paths]:
+            del manifest[path]
+        save_image_manifest(manifest, manifest_path)
+    return results
 
+def group_images_by_hash(image_files, manifest):
+    """Grupuje zdjęcia po SHA-256 treści (sumy z manifestu, jeśli plik się nie zmienił)
+
+    Returns:
+        dict: sha256 -> lista image_info z identyczną treścią
+    """
+    groups = {}
+    for image_info in image_files:
+        groups.setdefault(_manifest_entry(image_info, manifest)['sha256'], []).append(image_info)
+    return groups
+
+def build_component_hashes(groups):
+    """Mapowanie component_id -> obiekt adresowany treścią (zawartość COMPONENT_HASHES_KEY)"""
+    mapping = {}
+    for sha256, files in groups.items():
+        for image_info in files:
+            mapping[image_info['component_id']] = {
+                'sha256': sha256,
+                'key': content_s3_key(sha256),
+                'filename': image_info['filename'],
+                'size': image_info['size'],
+                'content_type': mimetypes.guess_type(image_info['filename'])[0] or 'image/jpeg',
+            }
+    return mapping
+
+def upload_component_hashes(s3, mapping):
+    """Zapisuje mapowanie component_id -> sha256 w S3 (COMPONENT_HASHES_KEY)"""
+    body = json.dumps({'generated_at': datetime.now().isoformat(), 'components': mapping},
+                      indent=2, ensure_ascii=False, sort_keys=True)
+    s3.put_object(
+        Bucket=s3_config.bucket_name,
+        Key=COMPONENT_HASHES_KEY,
+        Body=body.encode('utf-8'),
+        ContentType='application/json',
+        CacheControl='no-cache'
+    )
+    return COMPONENT_HASHES_KEY
+
+def migrate_images_deduplicated(image_files=None, concurrency=UPLOAD_CONCURRENCY, manifest_path=IMAGE_MANIFEST_PATH,
+                                dry_run=False, verbose=True):
+    """Migracja adresowana treścią - każdy unikalny plik raz pod images/by-hash/{sha256}
+
+    Obiekt pod hashem jest niezmienny, więc hashe już obecne w S3 (jedno
+    listowanie prefiksu) są pomijane bez porównywania treści.
+
+    Args:
+        image_files (list): pliki z find_component_images() (domyślnie skan katalogu)
+        concurrency (int): maksymalna liczba równoległych uploadów
+        manifest_path (str): manifest sum kontrolnych (None - sumy liczone dla każdego pliku)
+        dry_run (bool): tylko pokaż plan, nic nie wysyłaj
+
+    Returns:
+        dict: wyniki jak migrate_images_batch() + 'deduplication'
+    """
+    if image_files is None:
+        image_files = find_component_images()
+    s3 = create_upload_client(concurrency)
+    manifest = load_image_manifest(manifest_path) if manifest_path else {}
+
+    groups = group_images_by_hash(image_files, manifest)
+    remote = list_remote_images(s3, S3_CONTENT_PREFIX)
+    to_upload = [
+        dict(files[0], s3_key=content_s3_key(sha256), sha256=sha256, cache_control=IMMUTABLE_CACHE_CONTROL)
+        for sha256, files in groups.items()
+        if content_s3_key(sha256) not in remote
+    ]
+    duplicate_groups = {
+        sha256: sorted(image_info['component_id'] for image_info in files)
+        for sha256, files in groups.items() if len(files) > 1
+    }
+    duplicate_files = len(image_files) - len(groups)
+    bytes_deduplicated = sum(image_info['size'] for files in groups.values() for image_info in files[1:])
+    print(f"🧬 Zdjęcia: {len(image_files)}, unikalne: {len(groups)}, duplikaty: {duplicate_files} "
+          f"({bytes_deduplicated / 1024:.1f} KB), już w S3: {len(groups) - len(to_upload)}, "
+          f"do wysłania: {len(to_upload)}")
+    for sha256, component_ids in duplicate_groups.items():
+        print(f"   = {sha256[:12]}: {', '.join(component_ids)}")
+
+    if dry_run:
+        for image_info in to_upload:
+            print(f"   ⬆️  {image_info['s3_key']} ({image_info['component_id']})")
+        results = {'successful': [], 'failed': [], 'total_processed': 0}
+    else:
+        results = migrate_images_batch(to_upload, concurrency=concurrency, s3=s3, verbose=verbose)
+        # Mapowanie tylko dla komponentów, których obiekt jest w S3
+        failed_keys = {content_s3_key(image_info['sha256']) for image_info in to_upload} - {
+            result['s3_key'] for result in results['successful']}
+        stored = {sha256: files for sha256, files in groups.items() if content_s3_key(sha256) not in failed_keys}
+        upload_component_hashes(s3, build_component_hashes(stored))
+        if manifest_path:
+            save_image_manifest(manifest, manifest_path)
+
+    results['deduplication'] = {
+        'total_files': len(image_files),
+        'unique_images': len(groups),
+        'duplicate_files': duplicate_files,
+        'bytes_deduplicated': bytes_deduplicated,
+        'already_in_s3': len(groups) - len(to_upload),
+        'duplicate_groups': duplicate_groups,
+        'mapping_key': COMPONENT_HASHES_KEY,
+    }
     return results
 
 def generate_migration_report(results):
@@ -128,9 +598,20 @@ def generate_migration_report(results):
         'successful_uploads': len(results['successful']),
         'failed_uploads': len(results['failed']),
         'success_rate': f"{len(results['successful'])/max(1, results['total_processed'])*100:.1f}%" if results['total_processed'] > 0 else "0%",
+        'elapsed_seconds': round(results.get('elapsed_seconds', 0), 3),
+        'files_per_second': round(results.get('files_per_second', 0), 2),
+        'mb_per_second': round(results.get('mb_per_second', 0), 3),
         'successful_components': [r['component_id'] for r in results['successful']],
         'failed_components': [r['component_id'] for r in results['failed']]
     }
+    if 'unchanged' in results:
+        # Tryb --sync
+        report['unchanged_files'] = results['unchanged']
+        report['orphaned_keys'] = results['orphans']
+        report['deleted_keys'] = results['deleted']
+    if 'deduplication' in results:
+        # Tryb --dedup
+        report['deduplication'] = results['deduplication']
 
     return report
 
@@ -146,6 +627,34 @@ def save_migration_report(report):
 
 def main():
     """Główna funkcja migracji zdjęć"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Migracja zdjęć komponentów Volt do S3')
+    parser.add_argument('--concurrency', type=int, default=UPLOAD_CONCURRENCY,
+                        help=f'Maksymalna liczba równoległych uploadów (domyślnie {UPLOAD_CONCURRENCY})')
+    parser.add_argument('--yes', action='store_true', help='Nie pytaj o potwierdzenie')
+    parser.add_argument('--sync', action='store_true',
+                        help='Wysyłaj tylko nowe i zmienione pliki (porównanie z listingiem S3)')
+    parser.add_argument('--delete-orphans', action='store_true',
+                        help='Z --sync: usuń z S3 zdjęcia, których nie ma lokalnie')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help='Z --sync/--dedup: nie używaj lokalnego manifestu sum (liczone dla każdego pliku)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Z --sync/--dedup: tylko pokaż, co zostałoby zrobione')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Zbuduj i prześlij miniatury WebP/AVIF (images/components/{id}/{width}.{format})')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Z --derivatives: liczba procesów budujących miniatury (domyślnie liczba CPU)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Każdy unikalny plik raz pod images/by-hash/{sha256} + mapowanie komponent -> hash')
+    args = parser.parse_args()
+    if args.dedup and (args.sync or args.derivatives):
+        parser.error('--dedup nie łączy się z --sync ani --derivatives')
+    if args.delete_orphans and not args.sync:
+        parser.error('--delete-orphans wymaga --sync')
+    if (args.no_manifest or args.dry_run) and not (args.sync or args.dedup):
+        parser.error('--no-manifest i --dry-run wymagają --sync lub --dedup')
+
     print("🚀 Rozpoczynam migrację zdjęć komponentów do S3...")
     print(f"Target bucket: {s3_config.bucket_name}")
 
@@ -174,30 +683,68 @@ def main():
     if len(image_files) > 3:
         print(f"   ... i {len(image_files) - 3} więcej")
 
-    # Potwierdzenie migracji
-    response = input(f"\nCzy chcesz przesłać {len(image_files)} zdjęć do S3? (y/N): ")
-    if response.lower() not in ['y', 'yes']:
-        print("❌ Migracja anulowana przez użytkownika")
-        return
+    derivatives_manifest = None
+    if args.derivatives:
+        print("\n🖼️  Budowanie miniatur...")
+        image_files, derivatives_manifest = add_image_derivatives(image_files, processes=args.processes)
+
+    # Potwierdzenie migracji (sync bez usuwania i dedup niczego nie nadpisują bez potrzeby)
+    if not args.yes and not args.dedup and not (args.sync and (args.dry_run or not args.delete_orphans)):
+        response = input(f"\nCzy chcesz przesłać {len(image_files)} zdjęć do S3? (y/N): ")
+        if response.lower() not in ['y', 'yes']:
+            print("❌ Migracja anulowana przez użytkownika")
+            return
 
     # Wykonaj migrację
-    print("\n📤 Rozpoczynam upload zdjęć...")
-    results = migrate_images_batch(image_files)
+    if args.sync:
+        print("\n🔄 Synchronizacja zdjęć z S3...")
+        results = sync_images_to_s3(image_files, concurrency=args.concurrency,
+                                    delete_orphans=args.delete_orphans,
+                                    manifest_path=None if args.no_manifest else IMAGE_MANIFEST_PATH,
+                                    dry_run=args.dry_run)
+        if args.dry_run:
+            return
+    elif args.dedup:
+        print("\n🧬 Upload adresowany treścią (images/by-hash/)...")
+        results = migrate_images_deduplicated(image_files, concurrency=args.concurrency,
+                                              manifest_path=None if args.no_manifest else IMAGE_MANIFEST_PATH,
+                                              dry_run=args.dry_run)
+        if args.dry_run:
+            return
+    else:
+        print("\n📤 Rozpoczynam upload zdjęć...")
+        results = migrate_images_batch(image_files, concurrency=args.concurrency)
+
+    if derivatives_manifest is not None:
+        manifest_key = upload_derivatives_manifest(create_upload_client(args.concurrency), s3_config.bucket_name,
+                                                   derivatives_manifest)
+        print(f"🗂️  Manifest miniatur: s3://{s3_config.bucket_name}/{manifest_key}")
 
     # Generuj i zapisz raport
     report = generate_migration_report(results)
     report_file = save_migration_report(report)
 
     # Podsumowanie
-    print("
-🎯 PODSUMOWANIE MIGRACJI:"    print(f"   Przetworzono plików: {results['total_processed']}")
+    print("\n🎯 PODSUMOWANIE MIGRACJI:")
+    print(f"   Przetworzono plików: {results['total_processed']}")
     print(f"   Pomyślnych uploadów: {len(results['successful'])}")
     print(f"   Błędnych uploadów: {len(results['failed'])}")
     print(f"   Skuteczność: {report['success_rate']}")
+    if args.sync:
+        print(f"   Bez zmian (pominięte): {report['unchanged_files']}")
+        print(f"   Osierocone w S3: {len(report['orphaned_keys'])}, usunięte: {len(report['deleted_keys'])}")
+    if args.dedup:
+        dedup = report['deduplication']
+        print(f"   Unikalne zdjęcia: {dedup['unique_images']}/{dedup['total_files']}, "
+              f"duplikaty: {dedup['duplicate_files']} ({dedup['bytes_deduplicated'] / 1024:.1f} KB), "
+              f"już w S3: {dedup['already_in_s3']}")
+        print(f"   Mapowanie komponent -> hash: s3://{s3_config.bucket_name}/{dedup['mapping_key']}")
+    print(f"   Czas: {report['elapsed_seconds']:.2f}s ({report['files_per_second']:.1f} plików/s, "
+          f"{report['mb_per_second']:.2f} MB/s)")
 
     if results['failed']:
-        print("
-❌ PLIKI Z BŁĘDAMI:"        for failed in results['failed'][:5]:  # Pokaż pierwsze 5 błędów
+        print("\n❌ PLIKI Z BŁĘDAMI:")
+        for failed in results['failed'][:5]:  # Pokaż pierwsze 5 błędów
             print(f"   - {failed['component_id']}: {failed['error']}")
         if len(results['failed']) > 5:
             print(f"   ... i {len(results['failed']) - 5} więcej")
@@ -205,4 +752,4 @@ def main():
     print(f"\n📄 Szczegółowy raport: {report_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,14 +2,32 @@
 """
 AWS Lambda function do automatycznej konwersji CSV → Parquet
 Data Engineering Roadmap - Week 5: Zaawansowane S3 + Pipeline'y
+
+Każdy zapisany plik Parquet jest rejestrowany w manifeście partycji
+(lake_manifest), więc paczka Lambdy musi zawierać też lake_manifest.py
+i lake_storage.py.
+
+Eventy S3 uruchamiają wywołania równolegle - manifest i indeks partycji są
+aktualizowane zapisem warunkowym (If-Match na ETag, ponowienie przy 412),
+więc jednoczesne pliki CSV nie nadpisują sobie wpisów. Wymaga S3 z
+obsługą zapisów warunkowych (AWS od 2024; starsze emulatory S3 - ustaw
+reserved concurrency funkcji na 1).
 """
 import boto3
+import hashlib
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from io import BytesIO
 from urllib.parse import unquote_plus
 import os
+import sys
+
+# Wspólne moduły data lake (scripts/python/lake_manifest.py)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from lake_manifest import make_file_entry, record_partition_files, split_lake_key
+from lake_storage import S3LakeStorage
 
 def lambda_handler(event, context):
     """
@@ -77,14 +95,21 @@ def lambda_handler(event, context):
             }
 
             # Zapisz Parquet do S3
+            parquet_body = buffer.getvalue()
             s3.put_object(
                 Bucket=bucket,
                 Key=parquet_key,
-                Body=buffer.getvalue(),
+                Body=parquet_body,
                 ContentType='application/octet-stream',
                 Metadata=metadata
             )
 
+            # Zarejestruj plik w manifeście partycji staging/
+            dataset, partition, name = split_lake_key(parquet_key)
+            entry = make_file_entry(name, len(parquet_body), hashlib.sha256(parquet_body).hexdigest(),
+                                    len(df), 'parquet')
+            record_partition_files(S3LakeStorage(bucket, s3=s3), dataset, partition, [entry])
+
             print(f"✅ Successfully converted and saved: s3://{bucket}/{parquet_key}")
 
             # Opcjonalnie: usuń oryginalny plik CSV po konwersji
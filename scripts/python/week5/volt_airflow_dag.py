@@ -15,7 +15,7 @@ import sys
 # Dodaj ścieżkę do skryptów Volt
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from week4.volt_data_to_s3 import export_components_to_json, upload_components_to_s3
+from week4.volt_data_to_s3 import export_components_to_file, upload_components_to_s3
 from week4.volt_images_to_s3 import migrate_images_to_s3
 from week4.presigned_urls import batch_generate_presigned_urls
 
@@ -45,12 +45,14 @@ dag = DAG(
 def check_volt_database():
     """Sprawdź połączenie z bazą danych Volt"""
     try:
-        from week4.volt_data_to_s3 import get_postgres_connection
+        from week4.volt_data_to_s3 import get_postgres_connection, release_postgres_connection
         conn = get_postgres_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM electrical_components")
-        count = cursor.fetchone()[0]
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM electrical_components")
+            count = cursor.fetchone()[0]
+        finally:
+            release_postgres_connection(conn)
         print(f"✅ Baza danych Volt dostępna: {count} komponentów")
         return 'extract_volt_data'
     except Exception as e:
@@ -62,18 +64,14 @@ def extract_volt_data():
     print("📊 Rozpoczynam ekstrakcję danych z aplikacji Volt...")
 
     try:
-        components = export_components_to_json()
+        # Zapisz strumieniowo do pliku tymczasowego (Airflow może tego użyć)
+        temp_file = '/tmp/volt_components_raw.json'
+        count = export_components_to_file(temp_file)
 
-        if not components:
+        if not count:
             raise ValueError("Brak danych komponentów do przetworzenia")
 
-        # Zapisz do pliku tymczasowego (Airflow może tego użyć)
-        temp_file = '/tmp/volt_components_raw.json'
-        import json
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(components, f, indent=2, ensure_ascii=False)
-
-        print(f"✅ Wyekstrahowano {len(components)} komponentów do {temp_file}")
+        print(f"✅ Wyekstrahowano {count} komponentów do {temp_file}")
         return temp_file
 
     except Exception as e:
@@ -155,13 +153,15 @@ def generate_image_urls():
 
     try:
         # Pobierz wszystkie ID komponentów z bazy
-        from week4.volt_data_to_s3 import get_postgres_connection
+        from week4.volt_data_to_s3 import get_postgres_connection, release_postgres_connection
 
         conn = get_postgres_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT id FROM electrical_components")
-        component_ids = [str(row[0]) for row in cursor.fetchall()]
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT DISTINCT id FROM electrical_components")
+            component_ids = [str(row[0]) for row in cursor.fetchall()]
+        finally:
+            release_postgres_connection(conn)
 
         if not component_ids:
             print("⚠️  Brak komponentów w bazie danych")